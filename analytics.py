@@ -0,0 +1,421 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import database
+
+COUNT_FIELDS = ("views", "likes", "comments", "shares", "saves")
+OUTLIER_Z = 3.0 # |z| above this (on log views within an owner, or on engagement overall) is flagged
+PERCENTILES = (50, 75, 90, 95, 99)
+
+
+def _to_float_array(values):
+    # None -> NaN is done by NumPy's float conversion
+    return np.array(values, dtype=np.float64)
+
+
+def _factorize(values):
+    """Maps each distinct value to a dense integer code (first-seen order). Returns (codes, uniques)."""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int64, count=len(values))
+    return codes, np.array(list(lookup), dtype=object)
+
+
+_cache_lock = threading.Lock()
+_array_cache = {}
+
+
+def _cached(kind, db_file, loader):
+    """Reuses arrays loaded from `db_file` until the file changes (mtime/size), so repeat views cost nothing."""
+    path = db_file or database.DB_FILE
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+    with _cache_lock:
+        hit = _array_cache.get((kind, path))
+        if hit and stamp is not None and hit[0] == stamp:
+            return hit[1]
+    arrays = loader(path)
+    with _cache_lock:
+        _array_cache[(kind, path)] = (stamp, arrays)
+    return arrays
+
+
+def load_post_arrays(db_file=None) -> dict:
+    """
+    Loads tiktok_posts into column arrays: video_id (object), owner_code (int64, indexes owner_names),
+    and float64 arrays (NaN = missing) for the counts and post_date (epoch seconds).
+    Numeric conversion happens in SQLite; results are cached until the database file changes.
+    """
+    return _cached("posts", db_file, _load_post_arrays)
+
+
+def _load_post_arrays(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute(f"""
+            SELECT video_id, owner,
+                   {', '.join(database._num_sql(c) for c in COUNT_FIELDS)},
+                   CAST(strftime('%s', substr(post_date, 1, 19)) AS INTEGER)
+            FROM tiktok_posts
+        """).fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        empty = np.array([], dtype=np.float64)
+        arrays = {c: empty for c in COUNT_FIELDS}
+        arrays.update(video_id=np.array([], dtype=object), owner_code=np.array([], dtype=np.int64),
+                      owner_names=np.array([], dtype=object), post_ts=empty)
+        return arrays
+
+    columns = list(zip(*rows))
+    # Missing owners (NULL or 'N/A') are grouped together under ""
+    owner_code, owner_names = _factorize(["" if o in (None, "N/A") else o for o in columns[1]])
+    arrays = {
+        "video_id": np.array(columns[0], dtype=object),
+        "owner_code": owner_code,
+        "owner_names": owner_names,
+    }
+    for i, field in enumerate(COUNT_FIELDS, start=2):
+        arrays[field] = _to_float_array(columns[i])
+    arrays["post_ts"] = _to_float_array(columns[7])
+    return arrays
+
+
+def load_snapshot_arrays(db_file=None) -> dict:
+    """Loads post_snapshots ordered by (video_id, recorded_at) as arrays; recorded_at as epoch seconds."""
+    return _cached("snapshots", db_file, _load_snapshot_arrays)
+
+
+def _load_snapshot_arrays(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute(f"""
+            SELECT video_id, CAST(strftime('%s', substr(recorded_at, 1, 19)) AS INTEGER),
+                   {', '.join(COUNT_FIELDS)}
+            FROM post_snapshots
+            ORDER BY video_id, recorded_at
+        """).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        empty = np.array([], dtype=np.float64)
+        arrays = {c: empty for c in COUNT_FIELDS}
+        arrays.update(video_id=np.array([], dtype=object), ts=empty)
+        return arrays
+    columns = list(zip(*rows))
+    arrays = {"video_id": np.array(columns[0], dtype=object), "ts": _to_float_array(columns[1])}
+    for i, field in enumerate(COUNT_FIELDS, start=2):
+        arrays[field] = _to_float_array(columns[i])
+    return arrays
+
+
+def engagement_metrics(posts: dict) -> dict:
+    """Per-post engagement variants in percent (NaN where views are missing or zero)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        views = np.where(posts["views"] > 0, posts["views"], np.nan)
+        likes, comments = posts["likes"], posts["comments"]
+        shares, saves = posts["shares"], posts["saves"]
+        return {
+            # Same definition scrape_post_data uses: (likes + comments) / views
+            "engagement_rate": (likes + comments) / views * 100,
+            "engagement_rate_full": (likes + comments + np.nan_to_num(shares) + np.nan_to_num(saves)) / views * 100,
+            "like_rate": likes / views * 100,
+            "comment_rate": comments / views * 100,
+            "share_rate": shares / views * 100,
+            "save_rate": saves / views * 100,
+        }
+
+
+def _group_mean(values, inverse, n_groups):
+    """NaN-aware per-group mean via bincount."""
+    valid = ~np.isnan(values)
+    sums = np.bincount(inverse[valid], weights=values[valid], minlength=n_groups)
+    counts = np.bincount(inverse[valid], minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan), sums, counts
+
+
+def owner_aggregates(posts: dict, engagement: dict = None) -> dict:
+    """Per-owner post count, views/likes sums and means, mean engagement rate and max views."""
+    engagement = engagement or engagement_metrics(posts)
+    owners, inverse = posts["owner_names"], posts["owner_code"]
+    n = len(owners)
+    mean_views, sum_views, _ = _group_mean(posts["views"], inverse, n)
+    mean_likes, sum_likes, _ = _group_mean(posts["likes"], inverse, n)
+    mean_er, _, _ = _group_mean(engagement["engagement_rate"], inverse, n)
+    mean_er_full, _, _ = _group_mean(engagement["engagement_rate_full"], inverse, n)
+    max_views = np.full(n, -np.inf)
+    valid = ~np.isnan(posts["views"])
+    np.maximum.at(max_views, inverse[valid], posts["views"][valid])
+    max_views[np.isinf(max_views)] = np.nan
+    return {
+        "owner": owners,
+        "post_count": np.bincount(inverse, minlength=n),
+        "sum_views": sum_views,
+        "avg_views": mean_views,
+        "max_views": max_views,
+        "sum_likes": sum_likes,
+        "avg_likes": mean_likes,
+        "avg_engagement_rate": mean_er,
+        "avg_engagement_rate_full": mean_er_full,
+        "_inverse": inverse,
+    }
+
+
+def percentiles(values, pcts=PERCENTILES) -> dict:
+    """NaN-ignoring percentiles of one array; empty dict when there are no valid values."""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {}
+    return dict(zip(pcts, np.percentile(values, pcts)))
+
+
+def growth_rates(snapshots: dict) -> dict:
+    """
+    Growth between each video's last two snapshots: per-hour deltas for every count field.
+    Returns arrays keyed by video_id order (one entry per video that has at least two snapshots).
+    """
+    vids = snapshots["video_id"]
+    if vids.size < 2:
+        return {"video_id": np.array([], dtype=object), "hours": np.array([])}
+    # Rows are sorted by (video_id, ts); the last row of each video is where the next video starts
+    is_last = np.append(vids[1:] != vids[:-1], True)
+    last_idx = np.nonzero(is_last)[0]
+    prev_idx = last_idx - 1
+    has_prev = (prev_idx >= 0) & (vids[np.maximum(prev_idx, 0)] == vids[last_idx])
+    last_idx, prev_idx = last_idx[has_prev], prev_idx[has_prev]
+    hours = (snapshots["ts"][last_idx] - snapshots["ts"][prev_idx]) / 3600.0
+    result = {"video_id": vids[last_idx], "hours": hours}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for field in COUNT_FIELDS:
+            delta = snapshots[field][last_idx] - snapshots[field][prev_idx]
+            result[f"{field}_per_hour"] = np.where(hours > 0, delta / hours, np.nan)
+            result[f"{field}_growth_pct"] = np.where(
+                snapshots[field][prev_idx] > 0, delta / snapshots[field][prev_idx] * 100, np.nan
+            )
+    return result
+
+
+def outlier_flags(posts: dict, engagement: dict, aggregates: dict) -> dict:
+    """
+    Flags posts whose log views are > OUTLIER_Z standard deviations from their owner's mean,
+    and posts whose engagement rate is a robust (median/MAD) outlier across the whole dataset.
+    """
+    inverse = aggregates["_inverse"]
+    n = len(aggregates["owner"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_views = np.log1p(posts["views"])
+        mean, _, counts = _group_mean(log_views, inverse, n)
+        mean_sq, _, _ = _group_mean(log_views ** 2, inverse, n)
+        std = np.sqrt(np.maximum(mean_sq - mean ** 2, 0))
+        z_views = (log_views - mean[inverse]) / std[inverse]
+        z_views[(counts[inverse] < 3) | (std[inverse] == 0)] = np.nan
+
+        er = engagement["engagement_rate"]
+        median = np.nanmedian(er) if np.any(~np.isnan(er)) else np.nan
+        mad = np.nanmedian(np.abs(er - median)) if not np.isnan(median) else np.nan
+        z_er = 0.6745 * (er - median) / mad if mad and not np.isnan(mad) else np.full(er.shape, np.nan)
+    return {
+        "views_z_in_owner": z_views,
+        "engagement_robust_z": z_er,
+        "views_outlier": np.abs(np.nan_to_num(z_views)) > OUTLIER_Z,
+        "engagement_outlier": np.abs(np.nan_to_num(z_er)) > OUTLIER_Z,
+    }
+
+
+def compute_all(db_file=None) -> dict:
+    """Loads posts and snapshots and runs every metric; the result feeds the UI analytics view and exports."""
+    start = datetime.now()
+    posts = load_post_arrays(db_file)
+    engagement = engagement_metrics(posts)
+    aggregates = owner_aggregates(posts, engagement)
+    result = {
+        "posts": posts,
+        "engagement": engagement,
+        "owners": aggregates,
+        "percentiles": {
+            "views": percentiles(posts["views"]),
+            "engagement_rate": percentiles(engagement["engagement_rate"]),
+            "engagement_rate_full": percentiles(engagement["engagement_rate_full"]),
+        },
+        "growth": growth_rates(load_snapshot_arrays(db_file)),
+        "outliers": outlier_flags(posts, engagement, aggregates),
+    }
+    logging.info(f"Analytics computed for {posts['video_id'].size} posts in {(datetime.now() - start).total_seconds():.3f}s.")
+    return result
+
+
+def cached_compute_all(db_file=None, refresh=False) -> dict:
+    """
+    compute_all, reused until the database file changes (same mtime/size stamp as the array cache), so
+    reopening the analytics view does not rerun the O(posts) pass. `refresh` forces a recompute.
+    """
+    if refresh:
+        with _cache_lock:
+            _array_cache.pop(("compute_all", db_file or database.DB_FILE), None)
+    return _cached("compute_all", db_file, compute_all)
+
+
+def owner_summary_rows(result: dict, sort_by="sum_views", descending=True) -> list:
+    """Per-owner aggregates as a list of dicts (for the UI table and CSV export)."""
+    owners = result["owners"]
+    order = np.argsort(np.nan_to_num(owners[sort_by], nan=-np.inf))
+    if descending:
+        order = order[::-1]
+    views_outliers = np.bincount(owners["_inverse"], weights=result["outliers"]["views_outlier"],
+                                 minlength=len(owners["owner"]))
+    rows = []
+    for i in order:
+        rows.append({
+            "owner": owners["owner"][i] or "N/A",
+            "post_count": int(owners["post_count"][i]),
+            "sum_views": owners["sum_views"][i],
+            "avg_views": owners["avg_views"][i],
+            "max_views": owners["max_views"][i],
+            "avg_likes": owners["avg_likes"][i],
+            "avg_engagement_rate": owners["avg_engagement_rate"][i],
+            "avg_engagement_rate_full": owners["avg_engagement_rate_full"][i],
+            "views_outliers": int(views_outliers[i]),
+        })
+    return rows
+
+
+# --- Time series for charts ---
+
+SERIES_METRICS = ("views", "likes", "engagement_rate")
+SERIES_CACHE_SIZE = 64
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling: picks `threshold` points of (x, y) that keep the visual shape.
+    x must be sorted; NaN points should be removed beforehand. Returns (x, y) unchanged when already small enough.
+    """
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64) # threshold - 2 inner buckets
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's average is the third triangle vertex (the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < edges.size else n
+        next_start = end if i + 2 < edges.size else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+
+def snapshot_stamp(db_file=None):
+    """Cheap change marker for post_snapshots: (max id, row count). Charts recompute only when it changes."""
+    conn = sqlite3.connect(db_file or database.DB_FILE)
+    try:
+        return tuple(conn.execute("SELECT MAX(id), COUNT(*) FROM post_snapshots").fetchone())
+    finally:
+        conn.close()
+
+
+def _load_selection_snapshots(db_file, video_ids, owners):
+    clauses, params = [], []
+    if video_ids:
+        clauses.append(f"video_id IN ({', '.join('?' * len(video_ids))})")
+        params.extend(video_ids)
+    if owners:
+        clauses.append(f"video_id IN (SELECT video_id FROM tiktok_posts WHERE COALESCE(owner, 'N/A') IN ({', '.join('?' * len(owners))}))")
+        params.extend(owners)
+    where = f"WHERE {' OR '.join(clauses)}" if clauses else ""
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(f"""
+            SELECT video_id, CAST(strftime('%s', substr(recorded_at, 1, 19)) AS INTEGER), views, likes, comments
+            FROM post_snapshots {where}
+            ORDER BY video_id, recorded_at
+        """, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _carried_total(vids, ts, values, order):
+    """
+    Sum over videos of each video's latest value as of every snapshot time. Rows are sorted by (video, ts);
+    each row contributes its change from the same video's previous row, and a cumulative sum in time order
+    turns those deltas into the running total.
+    """
+    valid = ~np.isnan(values)
+    first = np.append(True, vids[1:] != vids[:-1])
+    filled = values
+    if not valid.all(): # Carry the previous valid value of the same video over gaps (0 before the first one)
+        idx = np.where(valid | first, np.arange(values.size), 0)
+        np.maximum.accumulate(idx, out=idx)
+        filled = np.where(valid[idx], values[idx], 0)
+    delta = np.where(first, filled, filled - np.roll(filled, 1))
+    return np.cumsum(delta[order])
+
+
+def aggregate_series(video_ids=None, owners=None, db_file=None) -> dict:
+    """
+    Full-resolution time series for a selection of posts and/or owners (everything when both are empty):
+    ts (epoch seconds) plus summed views and likes, and engagement rate ((likes + comments) / views, in %).
+    """
+    rows = _load_selection_snapshots(db_file or database.DB_FILE, list(video_ids or ()), list(owners or ()))
+    if not rows:
+        empty = np.array([], dtype=np.float64)
+        return {"ts": empty, **{m: empty for m in SERIES_METRICS}}
+    columns = list(zip(*rows))
+    vids = np.array(columns[0], dtype=object)
+    ts = _to_float_array(columns[1])
+    order = np.argsort(ts, kind="stable")
+    views, likes, comments = (_carried_total(vids, ts, _to_float_array(c), order) for c in columns[2:5])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        engagement = np.where(views > 0, (likes + comments) / views * 100, np.nan)
+    # Several snapshots at the same second collapse to the last running total
+    ts = ts[order]
+    keep = np.append(ts[1:] != ts[:-1], True)
+    return {"ts": ts[keep], "views": views[keep], "likes": likes[keep], "engagement_rate": engagement[keep]}
+
+
+_series_lock = threading.Lock()
+_series_cache = {} # (db_file, video_ids, owners) -> (snapshot_stamp, full series, {(metric, width): points})
+
+
+def chart_series(metric, width, video_ids=None, owners=None, db_file=None):
+    """
+    Downsampled (LTTB) series of `metric` for a selection, at most `width` points, as (ts, values) arrays.
+    Full series and downsampled results are cached until post_snapshots changes.
+    """
+    if metric not in SERIES_METRICS:
+        raise ValueError(f"Unsupported chart metric: {metric}")
+    path = db_file or database.DB_FILE
+    key = (path, tuple(sorted(video_ids or ())), tuple(sorted(owners or ())))
+    stamp = snapshot_stamp(path)
+    with _series_lock:
+        entry = _series_cache.get(key)
+        if entry and entry[0] == stamp and (metric, width) in entry[2]:
+            return entry[2][(metric, width)]
+    if entry and entry[0] == stamp:
+        series = entry[1]
+    else:
+        series = aggregate_series(key[1], key[2], path)
+        entry = (stamp, series, {})
+    values = series[metric]
+    valid = ~np.isnan(values)
+    points = lttb(series["ts"][valid], values[valid], max(int(width), 3))
+    with _series_lock:
+        entry[2][(metric, width)] = points
+        _series_cache[key] = entry
+        while len(_series_cache) > SERIES_CACHE_SIZE:
+            _series_cache.pop(next(iter(_series_cache)))
+    return points
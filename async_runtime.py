@@ -0,0 +1,150 @@
+import queue
+import asyncio
+import logging
+import threading
+
+PUMP_INTERVAL_MS = 100 # How often queued callbacks are handed to Tk; one after() per tick, however many are queued
+MAX_CALLBACKS_PER_TICK = 500 # Bounds the work done in one tick; the rest waits for the next one
+
+
+class AsyncRuntime:
+    """
+    One asyncio event loop on a daemon thread for the lifetime of the app. Callers on any thread submit
+    coroutines and get concurrent.futures.Future objects back, so state created on the loop (Playwright,
+    browsers) can outlive a single scrape.
+    """
+
+    def __init__(self, name="AsyncRuntime"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stop_callbacks = []
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+            logging.info(f"{self.name} event loop closed.")
+
+    def submit(self, coro):
+        """Schedules `coro` on the loop from any thread; returns a concurrent.futures.Future."""
+        if self.loop is None:
+            raise RuntimeError(f"{self.name} is not running.")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Runs `coro` on the loop and blocks the calling (non-loop) thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def on_stop(self, callback):
+        """Registers an async callable that stop() awaits on the loop once pending tasks are cancelled (e.g. closing browsers)."""
+        self._stop_callbacks.append(callback)
+
+    def stop(self, timeout=10):
+        """Cancels pending tasks, runs the on_stop callbacks, stops the loop and waits for its thread."""
+        if self.loop is None or self._thread is None:
+            return
+
+        async def _cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for callback in self._stop_callbacks: # Cancelled scrapes have handed their resources back by now
+                try:
+                    await callback()
+                except Exception as e:
+                    logging.warning(f"{self.name}: error in shutdown callback {callback!r}: {e}")
+
+        try:
+            self.submit(_cancel_pending()).result(timeout)
+        except Exception as e:
+            logging.warning(f"{self.name}: error cancelling pending tasks on shutdown: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class MainThreadPump:
+    """
+    Thread-safe hand-off of callbacks to the Tk main thread. Any thread may post(); the main thread drains
+    the queue every PUMP_INTERVAL_MS through a single root.after chain instead of one after() per call.
+    post_latest() coalesces: only the newest call per key runs, once per tick (status text, table flushes).
+    """
+
+    def __init__(self, root, interval_ms=PUMP_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+        return self
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def post(self, callback, *args):
+        self._queue.put((callback, args))
+
+    def post_latest(self, key, callback, *args):
+        """Like post(), but replaces any call still pending under `key`; it runs after the tick's regular callbacks."""
+        with self._latest_lock:
+            self._latest[key] = (callback, args)
+
+    def post_future_result(self, future, callback):
+        """Calls callback(result, error) on the main thread once `future` completes."""
+        def _done(f):
+            try:
+                self.post(callback, f.result(), None)
+            except BaseException as e: # Includes CancelledError
+                self.post(callback, None, e)
+        future.add_done_callback(_done)
+
+    @staticmethod
+    def _call(callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.error(f"Error in UI callback {getattr(callback, '__name__', callback)}: {e}", exc_info=True)
+
+    def _drain(self):
+        self._after_id = None
+        for _ in range(MAX_CALLBACKS_PER_TICK):
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._call(callback, args)
+        with self._latest_lock:
+            latest, self._latest = self._latest, {}
+        for callback, args in latest.values():
+            self._call(callback, args)
+        try:
+            if self.root.winfo_exists():
+                self._after_id = self.root.after(self.interval_ms, self._drain)
+        except Exception: # Root destroyed between checks
+            pass
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+CONTROL_POLL_SECONDS = 0.2 # How quickly a waiting batch worker notices pause/cancel
+CANCEL_TEARDOWN_TIMEOUT_SECONDS = 30 # Upper bound on waiting for a cancelled scrape to close its browser
+
+PENDING = "pending"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+FINISHED = "finished"
+
+
+class BatchCancelled(Exception):
+    """Raised inside the batch worker when the operator cancels the job."""
+
+
+class BatchJob:
+    """
+    Control handle shared by the UI (pause/resume/cancel from the Tk thread) and the batch worker thread.
+    The worker calls checkpoint() between URLs, sleep() for inter-scrape delays and run() for each scrape;
+    all three return promptly once the job is cancelled, and run() cancels the in-flight coroutine on the
+    asyncio runtime and waits for its teardown (browser close) before raising BatchCancelled.
+    """
+
+    def __init__(self, total=0, description="Batch"):
+        self.total = total
+        self.description = description
+        self.job_id = None # batch_jobs row checkpointing this run (see database.create_batch_job)
+        self.done = 0
+        self.failed = 0
+        self.state = PENDING
+        self._cancel = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    def pause(self):
+        if self.state in (PENDING, RUNNING):
+            self._resume.clear()
+            self.state = PAUSED
+            logging.info(f"{self.description}: paused after {self.done}/{self.total}.")
+
+    def resume(self):
+        if self.state == PAUSED:
+            self.state = RUNNING
+            self._resume.set()
+            logging.info(f"{self.description}: resumed at {self.done}/{self.total}.")
+
+    def cancel(self):
+        if self.state in (CANCELLED, FINISHED):
+            return
+        self.state = CANCELLED
+        self._cancel.set()
+        self._resume.set() # Wake a paused worker so it can exit
+        logging.info(f"{self.description}: cancel requested after {self.done}/{self.total}.")
+
+    def checkpoint(self):
+        """Blocks while paused; raises BatchCancelled once cancelled. Call between units of work."""
+        while not self._resume.wait(CONTROL_POLL_SECONDS):
+            pass
+        if self.cancelled:
+            raise BatchCancelled()
+        self.state = RUNNING
+
+    def sleep(self, seconds):
+        """time.sleep that is cut short (raising BatchCancelled) by cancel."""
+        if self._cancel.wait(seconds):
+            raise BatchCancelled()
+
+    def run(self, runtime, coro):
+        """Runs `coro` on `runtime` (an AsyncRuntime), cancelling it if the job is cancelled meanwhile."""
+        finished = threading.Event()
+        claim = threading.Lock() # Taken by whichever side owns `coro`: _guarded awaits it, or run() closes it unstarted
+
+        async def _guarded():
+            if not claim.acquire(blocking=False):
+                return None # run() gave up before the task got here and has already closed coro
+            try:
+                return await coro
+            finally:
+                finished.set()
+
+        future = runtime.submit(_guarded())
+        while True:
+            try:
+                return future.result(CONTROL_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if not self.cancelled:
+                    continue
+            except (concurrent.futures.CancelledError, asyncio.CancelledError):
+                self._abandon(coro, claim, finished)
+                raise BatchCancelled()
+            future.cancel()
+            self._abandon(coro, claim, finished)
+            raise BatchCancelled()
+
+    def _abandon(self, coro, claim, finished):
+        """Closes `coro` if it never started, otherwise waits for its teardown (browser close) to finish."""
+        if claim.acquire(blocking=False):
+            coro.close() # Never awaited, so nothing to tear down; closing it avoids a 'never awaited' warning
+            return
+        cancelled_at = time.monotonic()
+        if finished.wait(CANCEL_TEARDOWN_TIMEOUT_SECONDS):
+            logging.info(f"{self.description}: in-flight scrape cancelled and torn down in {time.monotonic() - cancelled_at:.1f}s.")
+        else:
+            logging.warning(f"{self.description}: cancelled scrape did not finish teardown within {CANCEL_TEARDOWN_TIMEOUT_SECONDS}s.")
+
+    def finish(self):
+        if self.state != CANCELLED:
+            self.state = FINISHED
@@ -0,0 +1,321 @@
+"""
+Micro-benchmarks and load generator for database.py.
+
+Fills a scratch copy of the schema with synthetic rows (10k to 10M), then times save_to_database,
+load_data_from_db, delete_data_from_db, typical sort/filter queries, concurrent writers and, when a
+display is available, the startup load into TikTokScraperApp. Results are written as JSON so schema,
+index or connection changes can be compared run against run.
+
+Run from the repository root:
+    python -m benchmarks.bench_database --rows 10000,100000 --writers 1,4,8
+    python -m benchmarks.bench_database --rows 1000000 --skip-ui --keep-db /tmp/posts_1m.db
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import database
+from metrics import registry, percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+FILL_CHUNK_ROWS = 50_000
+OWNER_POOL = 5_000 # Distinct synthetic creators
+
+
+def _synthetic_post(rng, index, today):
+    video_id = str(7_000_000_000_000_000_000 + index)
+    owner = f"creator_{rng.randrange(OWNER_POOL)}"
+    views = rng.randint(100, 50_000_000)
+    likes = int(views * rng.uniform(0.01, 0.15))
+    comments = int(likes * rng.uniform(0.005, 0.05))
+    shares = int(likes * rng.uniform(0.001, 0.03))
+    saves = int(likes * rng.uniform(0.005, 0.08))
+    posted = today - timedelta(days=rng.randint(0, 900))
+    failed = rng.random() < 0.03
+    return {
+        "video_id": video_id,
+        "link": f"https://www.tiktok.com/@{owner}/video/{video_id}",
+        "post_date": posted.strftime("%Y-%m-%d %H:%M:%S (UTC)"),
+        "last_record": (today - timedelta(days=rng.randint(0, 30))).strftime("%Y-%m-%d"),
+        "owner": owner,
+        "likes": "N/A" if failed else str(likes),
+        "comments": "N/A" if failed else str(comments),
+        "shares": "N/A" if failed else str(shares),
+        "saves": "N/A" if failed else str(saves),
+        "views": "N/A" if failed else str(views),
+        "engagement_rate": "N/A" if failed else f"{(likes + comments) / views * 100:.2f}%",
+        "error": " Missing data points: views." if failed else None,
+    }
+
+
+def _fill_tiktok_posts(conn, rows, rng, start_index=0):
+    today = datetime.now()
+    columns = ["video_id", "link", "post_date", "last_record", "owner", "likes", "comments",
+               "shares", "saves", "views", "engagement_rate", "error"]
+    sql = f"INSERT OR REPLACE INTO tiktok_posts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for chunk_start in range(start_index, start_index + rows, FILL_CHUNK_ROWS):
+        chunk_end = min(chunk_start + FILL_CHUNK_ROWS, start_index + rows)
+        batch = []
+        for i in range(chunk_start, chunk_end):
+            post = _synthetic_post(rng, i, today)
+            batch.append(tuple(post[c] for c in columns))
+        conn.executemany(sql, batch)
+        conn.commit()
+
+
+def _fill_post_snapshots(conn, rows, rng, snapshots_per_post=3):
+    """Adds `rows` snapshot rows: `snapshots_per_post` growing samples for each of the first rows // n posts."""
+    now = datetime.now()
+    sql = """INSERT INTO post_snapshots (video_id, recorded_at, views, likes, comments, shares, saves)
+             VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    batch = []
+    for i in range(max(rows // snapshots_per_post, 1)):
+        video_id = str(7_000_000_000_000_000_000 + i)
+        views = rng.randint(100, 1_000_000)
+        recorded = now - timedelta(days=snapshots_per_post)
+        for _ in range(snapshots_per_post):
+            views = int(views * rng.uniform(1.0, 1.5))
+            likes = int(views * 0.08)
+            batch.append((video_id, recorded.strftime("%Y-%m-%dT%H:%M:%S+00:00"), views, likes,
+                          likes // 20, likes // 50, likes // 15))
+            recorded += timedelta(hours=rng.randint(6, 24))
+        if len(batch) >= FILL_CHUNK_ROWS:
+            conn.executemany(sql, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        conn.commit()
+
+
+# Table name -> filler(conn, rows, rng). Tables added to the schema later register a filler here.
+SYNTHETIC_TABLE_FILLERS = {
+    "tiktok_posts": _fill_tiktok_posts,
+    "post_snapshots": _fill_post_snapshots,
+}
+
+
+def populate(rows, seed=1234):
+    """Fills every registered table in database.DB_FILE with `rows` synthetic rows. Returns seconds taken."""
+    rng = random.Random(seed)
+    conn = database.sqlite3.connect(database.DB_FILE)
+    try:
+        conn.execute("PRAGMA synchronous=OFF") # Bulk fill only; the timed operations use database.py's own connections
+        start = time.perf_counter()
+        for table, filler in SYNTHETIC_TABLE_FILLERS.items():
+            filler(conn, rows, rng)
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def _time_calls(fn, calls):
+    samples = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _summary(samples):
+    return {
+        "calls": len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples) if samples else None,
+        "total": sum(samples),
+    }
+
+
+def _time_query(sql, params=(), repeat=3):
+    samples = []
+    for _ in range(repeat):
+        conn = database.sqlite3.connect(database.DB_FILE)
+        try:
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append(time.perf_counter() - start)
+        finally:
+            conn.close()
+    return _summary(samples)
+
+
+QUERIES = {
+    "sort_views_desc": "SELECT * FROM tiktok_posts ORDER BY CAST(views AS INTEGER) DESC LIMIT 500",
+    "sort_last_record": "SELECT * FROM tiktok_posts ORDER BY last_record DESC LIMIT 500",
+    "filter_owner": "SELECT * FROM tiktok_posts WHERE owner = ?",
+    "filter_post_date_range": "SELECT * FROM tiktok_posts WHERE post_date BETWEEN ? AND ?",
+    "filter_failed": "SELECT video_id FROM tiktok_posts WHERE error IS NOT NULL AND error != ''",
+    "owner_totals": "SELECT owner, COUNT(*), SUM(CAST(views AS INTEGER)) FROM tiktok_posts GROUP BY owner",
+    "owner_aggregates": "SELECT * FROM owner_aggregates ORDER BY sum_views DESC LIMIT 500",
+}
+
+
+def _query_params(name):
+    if name == "filter_owner":
+        return ("creator_42",)
+    if name == "filter_post_date_range":
+        return ("2024-01-01", "2024-03-31")
+    return ()
+
+
+def _concurrent_writers(writers, writes_per_writer, seed):
+    """Runs `writers` threads, each calling save_to_database `writes_per_writer` times on fresh video IDs."""
+    errors_before = registry.counter_value("db_errors_total")
+    samples = []
+    samples_lock = threading.Lock()
+    today = datetime.now()
+
+    def worker(worker_index):
+        rng = random.Random(seed + worker_index)
+        local = []
+        base = 9_000_000_000_000_000_000 + worker_index * 10_000_000
+        for i in range(writes_per_writer):
+            post = _synthetic_post(rng, 0, today)
+            video_id = str(base + i)
+            start = time.perf_counter()
+            database.save_to_database(post, video_id)
+            local.append(time.perf_counter() - start)
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    result = _summary(samples)
+    result.update({
+        "writers": writers,
+        "wall_seconds": wall,
+        "writes_per_second": len(samples) / wall if wall else None,
+        "errors": registry.counter_value("db_errors_total") - errors_before,
+    })
+    return result
+
+
+def _time_ui_startup():
+    """Times TikTokScraperApp construction plus an explicit reload, as tiktok_post_analytics.py does at startup."""
+    try:
+        import tkinter as tk
+        from ui import TikTokScraperApp
+        root = tk.Tk()
+    except Exception as e:
+        return {"skipped": f"UI not available: {e}"}
+    try:
+        root.withdraw()
+        start = time.perf_counter()
+        app = TikTokScraperApp(root)
+        constructed = time.perf_counter() - start
+        start = time.perf_counter()
+        app._load_data_from_db_into_ui()
+        root.update_idletasks()
+        reload_seconds = time.perf_counter() - start
+        return {"construct_seconds": constructed, "reload_seconds": reload_seconds}
+    finally:
+        root.destroy()
+
+
+def run_size(rows, args):
+    database.DB_FILE = os.path.join(args.work_dir, f"bench_{rows}.db")
+    if os.path.exists(database.DB_FILE):
+        os.remove(database.DB_FILE)
+    database.setup_database()
+    fill_seconds = populate(rows, args.seed)
+    result = {
+        "rows": rows,
+        "fill_seconds": fill_seconds,
+        "db_size_bytes": os.path.getsize(database.DB_FILE),
+    }
+
+    rng = random.Random(args.seed)
+    today = datetime.now()
+    existing = [str(7_000_000_000_000_000_000 + rng.randrange(rows)) for _ in range(args.ops)]
+    result["save_update"] = _time_calls(
+        database.save_to_database,
+        [(_synthetic_post(rng, 0, today), vid) for vid in existing],
+    )
+    result["save_insert"] = _time_calls(
+        database.save_to_database,
+        [(_synthetic_post(rng, 0, today), str(8_000_000_000_000_000_000 + i)) for i in range(args.ops)],
+    )
+    result["load_data_from_db"] = _time_calls(database.load_data_from_db, [()] * args.load_repeat)
+    result["delete_data_from_db"] = _time_calls(
+        database.delete_data_from_db,
+        [(f"https://www.tiktok.com/@creator/video/{vid}",) for vid in existing],
+    )
+    result["queries"] = {name: _time_query(sql, _query_params(name)) for name, sql in QUERIES.items()}
+    result["concurrent_writers"] = [
+        _concurrent_writers(w, args.writes_per_writer, args.seed) for w in args.writer_levels
+    ]
+    if not args.skip_ui:
+        result["ui_startup"] = _time_ui_startup()
+
+    if args.keep_db:
+        shutil.copyfile(database.DB_FILE, args.keep_db)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for database.py on synthetic data.")
+    parser.add_argument("--rows", default="10000,100000", help="Comma-separated table sizes (10000 to 10000000)")
+    parser.add_argument("--ops", type=int, default=200, help="Timed save/delete calls per size")
+    parser.add_argument("--load-repeat", type=int, default=3, help="Timed load_data_from_db calls per size")
+    parser.add_argument("--writers", default="1,4,8", help="Comma-separated concurrent writer thread counts")
+    parser.add_argument("--writes-per-writer", type=int, default=100)
+    parser.add_argument("--skip-ui", action="store_true", help="Do not time the TikTokScraperApp startup load")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--keep-db", help="Copy the last populated database here (for manual inspection)")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/db_<timestamp>.json)")
+    args = parser.parse_args(argv)
+    args.writer_levels = [int(w) for w in args.writers.split(",") if w.strip()]
+
+    logging.getLogger().setLevel(logging.WARNING)
+    original_db = database.DB_FILE
+    args.work_dir = tempfile.mkdtemp(prefix="tiktok_db_bench_")
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": database.sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "sizes": [],
+    }
+    try:
+        for rows in [int(r) for r in args.rows.split(",") if r.strip()]:
+            print(f"Populating {rows:,} rows...")
+            size_result = run_size(rows, args)
+            results["sizes"].append(size_result)
+            print(f"  fill {size_result['fill_seconds']:.1f}s, "
+                  f"load p50 {size_result['load_data_from_db']['p50']:.3f}s, "
+                  f"save p50 {size_result['save_update']['p50'] * 1000:.2f}ms, "
+                  f"delete p50 {size_result['delete_data_from_db']['p50'] * 1000:.2f}ms")
+    finally:
+        database.DB_FILE = original_db
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"db_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Offline benchmark for the scrape pipeline.
+
+Serves fixture TikTok pages from a local HTTP server (benchmarks/fixture_server.py), routes the scraper's
+browser contexts to it, and runs scrape_post_data plus the batch path (scrape + save_to_database per URL)
+at several concurrency levels. Reports throughput, latency percentiles, per-phase p50/p95, memory and
+browser launches, and writes everything to a JSON file.
+
+Run from the repository root:
+    python -m benchmarks.bench_scrape --posts 20 --grid-share 0.2 --concurrency 1,2,4
+    python -m benchmarks.bench_scrape --baseline benchmarks/results/previous.json  # exit 1 on regression
+
+Requires Playwright with Chromium installed. --time-scale shrinks the scraper's human-like sleeps so runs
+finish quickly; keep it fixed across runs you want to compare.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+import scraper
+import database
+import tracing
+import cookie_store
+from metrics import registry, percentile
+from benchmarks.fixture_server import FixtureServer, make_post_urls, make_video_id
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+_collected_traces = [] # Trace records from every scrape in this process (see _install_trace_collector)
+
+
+def _scaled_asyncio(scale):
+    """A stand-in for the scraper's `asyncio` module whose sleep() is multiplied by `scale`."""
+    proxy = types.SimpleNamespace(**{name: getattr(asyncio, name) for name in dir(asyncio) if not name.startswith("__")})
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, result=None):
+        return await real_sleep(delay * scale, result)
+
+    proxy.sleep = sleep
+    return proxy
+
+
+def _peak_rss_kb():
+    """Peak resident memory of this process and of its reaped children (Chromium), in KiB, where available."""
+    if resource is None:
+        return None, None
+    factor = 1 if sys.platform != "darwin" else 1 / 1024 # macOS reports bytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * factor
+    return int(own), int(children)
+
+
+def _latency_summary(values):
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+async def _run_level(urls, concurrency, mode):
+    """Scrapes `urls` with at most `concurrency` in flight. mode='batch' also saves each result like the UI does."""
+    semaphore = asyncio.Semaphore(concurrency)
+    scraper.browser_pool.size = concurrency # Every in-flight scrape gets its own pooled browser
+    latencies = []
+    traces_before = len(_collected_traces)
+    outcomes = {}
+
+    async def one(url):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await scraper.scrape_post_data(url)
+            if mode == "batch":
+                database.save_to_database(result, result.get("video_id") or "unknown_post")
+            latencies.append(time.perf_counter() - start)
+            key = "error" if result.get("error") else "success"
+            outcomes[key] = outcomes.get(key, 0) + 1
+
+    launches_before = registry.counter_value("browser_launches_total")
+    start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    wall = time.perf_counter() - start
+    await scraper.browser_pool.close() # The pool is bound to this asyncio.run loop
+
+    traces = _collected_traces[traces_before:]
+    phases = {}
+    for trace in traces:
+        for phase, ms in trace["phases"].items():
+            phases.setdefault(phase, []).append(ms / 1000.0)
+    paths = {}
+    for trace in traces:
+        paths[trace["path"] or "none"] = paths.get(trace["path"] or "none", 0) + 1
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "posts": len(urls),
+        "wall_seconds": wall,
+        "throughput_posts_per_min": len(urls) / wall * 60.0 if wall else None,
+        "latency_seconds": _latency_summary(latencies),
+        "phase_seconds": {p: {"p50": percentile(v, 50), "p95": percentile(v, 95)} for p, v in sorted(phases.items())},
+        "outcomes": outcomes,
+        "paths": paths,
+        "browser_launches": registry.counter_value("browser_launches_total") - launches_before,
+        "bytes_transferred": sum(t["bytes_transferred"] for t in traces),
+    }
+
+
+async def _captcha_detection_probe(server):
+    """Times is_captcha_present against the CAPTCHA fixture without triggering the headed relaunch path."""
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await server.route_context(context)
+        page = await context.new_page()
+        await page.goto(f"https://www.tiktok.com/@bench_creator_a/video/{make_video_id('captcha', 0)}")
+        start = time.perf_counter()
+        detected = await scraper.is_captcha_present(page)
+        elapsed = time.perf_counter() - start
+        await browser.close()
+    return {"detected": detected, "seconds": elapsed}
+
+
+def _install_trace_collector():
+    real_finish = tracing.ScrapeTrace.finish
+
+    async def finish(self, error=None, error_code=None):
+        record = await real_finish(self, error, error_code)
+        _collected_traces.append(record)
+        return record
+
+    tracing.ScrapeTrace.finish = finish
+
+
+def _compare(results, baseline, max_regression):
+    """Returns human-readable regression messages for matching (mode, concurrency) runs."""
+    problems = []
+    previous = {(r["mode"], r["concurrency"]): r for r in baseline.get("runs", [])}
+    for run in results["runs"]:
+        old = previous.get((run["mode"], run["concurrency"]))
+        if not old:
+            continue
+        label = f"{run['mode']} @ concurrency {run['concurrency']}"
+        if old["throughput_posts_per_min"] and run["throughput_posts_per_min"] is not None:
+            if run["throughput_posts_per_min"] < old["throughput_posts_per_min"] * (1 - max_regression):
+                problems.append(f"{label}: throughput {run['throughput_posts_per_min']:.2f}/min vs {old['throughput_posts_per_min']:.2f}/min")
+        old_p95 = old["latency_seconds"]["p95"]
+        new_p95 = run["latency_seconds"]["p95"]
+        if old_p95 and new_p95 is not None and new_p95 > old_p95 * (1 + max_regression):
+            problems.append(f"{label}: p95 latency {new_p95:.2f}s vs {old_p95:.2f}s")
+        if run["browser_launches"] > old["browser_launches"]:
+            problems.append(f"{label}: browser launches {run['browser_launches']} vs {old['browser_launches']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for scrape_post_data and the batch path.")
+    parser.add_argument("--posts", type=int, default=20, help="URLs per concurrency level")
+    parser.add_argument("--grid-share", type=float, default=0.2, help="Fraction of posts that need the profile grid fallback")
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--modes", default="scrape,batch", help="Comma-separated: scrape, batch")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplier for the scraper's asyncio.sleep calls (1 = real timing)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/scrape_<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against; exits 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    # Keep the benchmark away from the real database, cookies and trace log
+    work_dir = tempfile.mkdtemp(prefix="tiktok_bench_")
+    database.DB_FILE = os.path.join(work_dir, "bench.db")
+    tracing.TRACE_FILE = os.path.join(work_dir, "bench_traces.jsonl")
+    cookie_store.cookie_store.path = cookie_store.Path(work_dir) / "bench_cookies.json"
+    database.setup_database()
+
+    scraper.asyncio = _scaled_asyncio(args.time_scale)
+    _install_trace_collector()
+
+    grid_posts = int(round(args.posts * args.grid_share))
+    urls = make_post_urls({"direct": args.posts - grid_posts, "grid": grid_posts})
+    random.shuffle(urls)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    tracemalloc.start()
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "posts": args.posts,
+            "grid_share": args.grid_share,
+            "time_scale": args.time_scale,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+
+    with FixtureServer() as server:
+        scraper.CONTEXT_SETUP_HOOKS.append(server.route_context)
+        try:
+            for mode in modes:
+                for level in levels:
+                    logging.warning(f"Benchmark: mode={mode} concurrency={level} posts={len(urls)}")
+                    run = asyncio.run(_run_level(urls, level, mode))
+                    run["python_heap_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+                    run["peak_rss_kb"], run["children_peak_rss_kb"] = _peak_rss_kb()
+                    tracemalloc.reset_peak()
+                    results["runs"].append(run)
+                    print(f"{mode:>6} c={level:<3} {run['throughput_posts_per_min']:8.2f} posts/min  "
+                          f"p50={run['latency_seconds']['p50']:.2f}s p95={run['latency_seconds']['p95']:.2f}s  "
+                          f"launches={run['browser_launches']:.0f}")
+            results["captcha_probe"] = asyncio.run(_captcha_detection_probe(server))
+        finally:
+            scraper.CONTEXT_SETUP_HOOKS.remove(server.route_context)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"scrape_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = _compare(results, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Local HTTP server that replays TikTok-shaped post, profile and CAPTCHA pages from benchmarks/fixtures.
+Which page a video URL gets is decided by the video ID prefix (see VIDEO_KIND_PREFIXES), so a
+benchmark can mix direct scrapes, grid fallbacks and CAPTCHA hits deterministically.
+"""
+import os
+import re
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+VIDEO_KIND_PREFIXES = {
+    "direct": "71",
+    "grid": "72",
+    "captcha": "79",
+}
+GRID_ITEMS_PER_PROFILE = 200  # Keep >= the largest per-kind URL count a benchmark requests
+
+_VIDEO_PATH_RE = re.compile(r'^/@([^/]+)/video/(\d+)')
+_PROFILE_PATH_RE = re.compile(r'^/@([^/?#]+)/?$')
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def video_kind(video_id: str) -> str:
+    for kind, prefix in VIDEO_KIND_PREFIXES.items():
+        if video_id.startswith(prefix):
+            return kind
+    return "direct"
+
+
+def make_video_id(kind: str, index: int) -> str:
+    """Builds a 19-digit TikTok-style video ID that the fixture server maps to `kind`."""
+    return f"{VIDEO_KIND_PREFIXES[kind]}{index:017d}"
+
+
+def make_post_urls(counts: dict, owners=("bench_creator_a", "bench_creator_b")) -> list:
+    """Builds post URLs, e.g. counts={"direct": 8, "grid": 2}, spread round-robin over `owners`."""
+    urls = []
+    for kind, count in counts.items():
+        for i in range(count):
+            owner = owners[i % len(owners)]
+            urls.append(f"https://www.tiktok.com/@{owner}/video/{make_video_id(kind, i)}")
+    return urls
+
+
+class FixtureSite:
+    """Renders fixture pages. Numbers are derived from the video ID, so every run sees identical pages."""
+
+    def __init__(self):
+        self.templates = {
+            "direct": _load_fixture("post_direct.html"),
+            "grid": _load_fixture("post_no_views.html"),
+            "captcha": _load_fixture("captcha.html"),
+            "profile": _load_fixture("profile.html"),
+            "grid_item": _load_fixture("profile_grid_item.html"),
+        }
+
+    @staticmethod
+    def _numbers(video_id):
+        rng = random.Random(int(video_id))
+        return {
+            "views": f"{rng.randint(10, 999) / 10:.1f}K",
+            "likes": f"{rng.randint(100, 9999)}",
+            "comments": f"{rng.randint(1, 999)}",
+            "shares": f"{rng.randint(1, 500)}",
+            "saves": f"{rng.randint(1, 900)}",
+            "post_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+
+    def render_post(self, owner, video_id):
+        kind = video_kind(video_id)
+        return self.templates[kind].format(owner=owner, video_id=video_id, **self._numbers(video_id))
+
+    def render_profile(self, owner):
+        items = []
+        for kind in ("direct", "grid"):
+            for i in range(GRID_ITEMS_PER_PROFILE):
+                video_id = make_video_id(kind, i)
+                items.append(self.templates["grid_item"].format(
+                    owner=owner, video_id=video_id, views=self._numbers(video_id)["views"]
+                ))
+        return self.templates["profile"].format(owner=owner, grid_items="".join(items))
+
+    def render(self, path):
+        """Returns (status, html) for a request path."""
+        path = path.split("?", 1)[0]
+        match = _VIDEO_PATH_RE.match(path)
+        if match:
+            return 200, self.render_post(*match.groups())
+        match = _PROFILE_PATH_RE.match(path)
+        if match:
+            return 200, self.render_profile(match.group(1))
+        return 404, "<html><body>Not found</body></html>"
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    site = None
+
+    def do_GET(self):
+        status, html = self.site.render(self.path)
+        body = html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Fixture server: {format % args}")
+
+
+class FixtureServer:
+    """Runs the fixture site on 127.0.0.1 in a daemon thread. Use as a context manager."""
+
+    def __init__(self, port=0):
+        handler = type("FixtureHandler", (_FixtureHandler,), {"site": FixtureSite()})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="FixtureServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def route_context(self, context):
+        """Serves every www.tiktok.com request made by a Playwright context from this server instead."""
+        async def _handle(route):
+            local_url = self.base_url + re.sub(r'^https?://[^/]+', '', route.request.url)
+            response = await context.request.get(local_url)
+            await route.fulfill(response=response)
+
+        await context.route(re.compile(r'^https?://(www\.)?tiktok\.com/'), _handle)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+
+from playwright.async_api import async_playwright
+
+from headed_session import SharedHeadedBrowser
+from metrics import registry
+
+DEFAULT_POOL_SIZE = 2 # Headless browsers lent out at once; further scrapes wait for one to come back
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+
+class BrowserPool:
+    """
+    Chromium shared by every scrape on one event loop: a single Playwright driver and up to `size`
+    headless browsers lent out with acquire()/release(), plus the process's one visible browser as
+    `headed` (a SharedHeadedBrowser). Each scrape still opens its own context (stealth, cookies), so only
+    the browser process is reused. Browsers stay warm until close(), which shuts down both kinds; call it
+    on the loop that uses the pool (the UI registers it with AsyncRuntime.on_stop).
+    `setup_context(browser, trace)` creates a configured context for the headed browser.
+    """
+
+    def __init__(self, setup_context, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self.headed = SharedHeadedBrowser(setup_context)
+        self._loop = None
+        self._slots = None
+        self._driver_lock = None
+        self._playwright = None
+        self._idle = []
+        self._leased = set()
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new event loop (e.g. a second asyncio.run) cannot use objects created on the old one
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.size)
+            self._driver_lock = asyncio.Lock()
+            self._playwright = None
+            self._idle, self._leased = [], set()
+
+    async def acquire(self, trace):
+        """Waits for a free slot and returns a connected headless browser, reusing an idle one if possible."""
+        self._bind_loop()
+        with trace.span("browser_wait"): # Non-zero only while every pooled browser is lent out
+            await self._slots.acquire()
+        try:
+            browser = None
+            while self._idle and browser is None:
+                candidate = self._idle.pop()
+                if candidate.is_connected(): # A crashed browser is dropped, not lent out again
+                    browser = candidate
+            if browser is None:
+                browser = await self._launch(trace)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._leased.add(browser)
+        registry.set_gauge("browser_pool_leased", len(self._leased))
+        return browser
+
+    def release(self, browser):
+        """Returns a browser from acquire() (close its contexts first). Releasing it twice is a no-op."""
+        if browser not in self._leased:
+            return
+        self._leased.discard(browser)
+        if browser.is_connected():
+            self._idle.append(browser)
+        self._slots.release()
+        registry.set_gauge("browser_pool_leased", len(self._leased))
+
+    async def _launch(self, trace):
+        async with self._driver_lock:
+            if self._playwright is None:
+                with trace.span("playwright_start"):
+                    self._playwright = await async_playwright().start()
+        with trace.span("browser_launch", headless=True):
+            browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        trace.browser_launches += 1
+        registry.inc("browser_launches_total", mode="headless")
+        registry.add_gauge("browsers_open", 1)
+        browser.on("disconnected", lambda _: registry.add_gauge("browsers_open", -1))
+        return browser
+
+    async def close(self):
+        """Closes the headed browser and every pooled one, and stops the Playwright driver (app shutdown)."""
+        await self.headed.close() # No-op unless it was opened on this loop
+        if self._loop is not asyncio.get_running_loop():
+            return
+        browsers = self._idle + list(self._leased)
+        self._idle, self._leased = [], set()
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logging.warning(f"Error closing pooled browser: {e}")
+        if self._playwright:
+            try:
+                # Stopping the driver also kills any browser whose launch was cut short by a cancel
+                await self._playwright.stop()
+            except Exception as e:
+                logging.warning(f"Error stopping the browser pool's Playwright driver: {e}")
+            self._playwright = None
+        self._loop = None # The next acquire() starts a fresh pool
+        registry.set_gauge("browser_pool_leased", 0)
+        if browsers:
+            logging.info(f"Browser pool closed ({len(browsers)} browsers).")
@@ -0,0 +1,168 @@
+import os
+import json
+import atexit
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+COOKIE_FILE = SCRIPT_DIR / "tiktok_cookies.json"
+DEFAULT_DEBOUNCE_SECONDS = 10.0
+
+
+def _cookie_key(cookie: dict) -> tuple:
+    """Identity of a cookie as seen by the browser (name + domain + path)."""
+    return (cookie.get("name"), cookie.get("domain"), cookie.get("path", "/"))
+
+
+def _cookie_fingerprint(cookies: list[dict]) -> dict:
+    """Reduces a cookie jar to the fields that matter when deciding whether to persist it."""
+    fingerprint = {}
+    for cookie in cookies:
+        expires = cookie.get("expires")
+        fingerprint[_cookie_key(cookie)] = (
+            cookie.get("value"),
+            int(expires) if isinstance(expires, (int, float)) else expires,
+        )
+    return fingerprint
+
+
+class CookieStore:
+    """
+    Process-wide, in-memory cookie jar backed by tiktok_cookies.json.
+    The file is read once, shared by every browser context, and only rewritten
+    (atomically, debounced) when the cookie jar actually changed.
+    """
+
+    def __init__(self, path=COOKIE_FILE, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS):
+        self.path = Path(path)
+        self.debounce_seconds = debounce_seconds
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock() # Serialises file writes; never held by update()
+        self._cookies = None
+        self._fingerprint = {}
+        self._dirty = False
+        self._last_write = 0.0
+        self._flush_timer = None
+
+    def _ensure_loaded(self):
+        if self._cookies is not None:
+            return
+        self._cookies = []
+        if not self.path.exists():
+            logging.info("Cookie file not found. Starting with fresh session.")
+            return
+        try:
+            with open(self.path, 'r') as f:
+                cookies = json.load(f)
+            if isinstance(cookies, list):
+                self._cookies = cookies
+                self._fingerprint = _cookie_fingerprint(cookies)
+                logging.info(f"Cookies loaded from {self.path} ({len(cookies)} cookies)")
+            else:
+                logging.warning(f"Unexpected cookie file format in {self.path}. Session will start fresh.")
+        except Exception as e:
+            logging.warning(f"Failed to read cookie file {self.path}: {e}. Session will start fresh.")
+
+    def get(self) -> list[dict]:
+        """Returns a copy of the current cookie jar (loading it from disk on first use)."""
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(c) for c in self._cookies]
+
+    def update(self, cookies: list[dict]) -> bool:
+        """
+        Replaces the in-memory jar with `cookies` if they differ from what is stored.
+        Returns True when a change was detected and a write has been scheduled.
+        """
+        fingerprint = _cookie_fingerprint(cookies)
+        with self._lock:
+            self._ensure_loaded()
+            if fingerprint == self._fingerprint:
+                logging.debug("Cookies unchanged; skipping write.")
+                return False
+            self._cookies = [dict(c) for c in cookies]
+            self._fingerprint = fingerprint
+            self._dirty = True
+            self._schedule_flush()
+            return True
+
+    def _schedule_flush(self):
+        """
+        Arms a single timer thread for the write (immediately if the debounce window has elapsed), so the
+        caller - usually the asyncio loop inside a scrape - never waits on the file write and fsync.
+        """
+        if self._flush_timer is None:
+            elapsed = time.monotonic() - self._last_write
+            self._flush_timer = threading.Timer(max(self.debounce_seconds - elapsed, 0.0), self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Writes pending changes to disk immediately."""
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty:
+                    return
+                cookies = self._cookies # update() replaces the list, so this snapshot stays intact
+                self._dirty = False
+            # Written outside self._lock so update() on the scrape loop never waits for the fsync
+            saved = self._write(cookies)
+            with self._lock:
+                if saved:
+                    self._last_write = time.monotonic()
+                else:
+                    self._dirty = True
+
+    def _write(self, cookies) -> bool:
+        tmp_path = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tiktok_cookies.", suffix=".tmp", dir=self.path.parent)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cookies, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            tmp_path = None
+            logging.info(f"Cookies saved to {self.path}")
+            return True
+        except Exception as e:
+            logging.warning(f"Failed to save cookies: {e}")
+            return False
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    async def apply_to_context(self, context) -> bool:
+        """Adds the stored cookies to a Playwright browser context."""
+        cookies = self.get()
+        if not cookies:
+            return False
+        try:
+            await context.add_cookies(cookies)
+            return True
+        except Exception as e:
+            logging.warning(f"Failed to load cookies: {e}. Session will start fresh.")
+            return False
+
+    async def capture_from_context(self, context) -> bool:
+        """Reads cookies back from a Playwright browser context and stores them if they changed."""
+        try:
+            cookies = await context.cookies()
+        except Exception as e:
+            logging.warning(f"Failed to read cookies from browser context: {e}")
+            return False
+        return self.update(cookies)
+
+
+cookie_store = CookieStore()
+atexit.register(cookie_store.flush)
@@ -1,14 +1,102 @@
 import sqlite3
 import os
 import logging
-from datetime import datetime
-import re
+from datetime import datetime, timedelta, timezone
+import json
+import time
+
+from metrics import registry, DB_BUCKETS
+import scrape_errors
+from tiktok_urls import canonicalize, short_code
 
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Corrected DB_FILE name for TikTok
 DB_FILE = os.path.join(SCRIPT_DIR, "tiktok_analytics.db")
 
+# --- Batch job checkpoints ---
+BATCH_LEASE_SECONDS = 15 * 60 # An in-flight item whose worker died is re-queued once its lease expires
+BATCH_ITEM_MAX_ATTEMPTS = 3 # Claims of one item (crash loops included) before it is marked failed
+
+# --- Per-owner aggregates (maintained by triggers on tiktok_posts) ---
+
+def _num_sql(column):
+    """SQL for a stored count ('12345' / 'N/A' / NULL) as INTEGER or NULL."""
+    return f"(CASE WHEN {column} GLOB '[0-9]*' THEN CAST({column} AS INTEGER) END)"
+
+def _rate_sql(column):
+    """SQL for a stored engagement rate ('3.25%' / 'N/A' / NULL) as REAL or NULL."""
+    return f"(CASE WHEN {column} GLOB '[0-9]*' THEN CAST(rtrim({column}, '%') AS REAL) END)"
+
+def _owner_sql(row):
+    return f"COALESCE({row}.owner, 'N/A')"
+
+def _owner_aggregate_delta_sql(row, sign):
+    """UPDATE that adds (sign='+') or removes (sign='-') one tiktok_posts row's contribution to its owner."""
+    views, likes, rate = _num_sql(f"{row}.views"), _num_sql(f"{row}.likes"), _rate_sql(f"{row}.engagement_rate")
+    if sign == "+":
+        last_scraped = f"MAX(last_scraped, COALESCE({row}.last_record, ''))"
+    else: # The row is already gone (AFTER DELETE/UPDATE), so the owner's latest record is recomputed
+        last_scraped = f"COALESCE((SELECT MAX(last_record) FROM tiktok_posts WHERE owner = {_owner_sql(row)}), '')"
+    return f"""
+        UPDATE owner_aggregates SET
+            post_count = post_count {sign} 1,
+            sum_views = sum_views {sign} COALESCE({views}, 0),
+            views_count = views_count {sign} ({views} IS NOT NULL),
+            sum_likes = sum_likes {sign} COALESCE({likes}, 0),
+            likes_count = likes_count {sign} ({likes} IS NOT NULL),
+            sum_engagement = sum_engagement {sign} COALESCE({rate}, 0),
+            engagement_count = engagement_count {sign} ({rate} IS NOT NULL),
+            last_scraped = {last_scraped}
+        WHERE owner = {_owner_sql(row)};
+    """
+
+def _owner_aggregate_ensure_sql(row):
+    # Not INSERT OR IGNORE: an upsert's conflict handling would override the OR clause inside the trigger
+    owner = _owner_sql(row)
+    return f"""
+        INSERT INTO owner_aggregates (owner)
+        SELECT {owner} WHERE NOT EXISTS (SELECT 1 FROM owner_aggregates WHERE owner = {owner});
+    """
+
+OWNER_AGGREGATE_TRIGGERS = {
+    "trg_owner_aggregates_insert": f"""
+        AFTER INSERT ON tiktok_posts BEGIN
+            {_owner_aggregate_ensure_sql("NEW")}
+            {_owner_aggregate_delta_sql("NEW", "+")}
+        END
+    """,
+    "trg_owner_aggregates_delete": f"""
+        AFTER DELETE ON tiktok_posts BEGIN
+            {_owner_aggregate_delta_sql("OLD", "-")}
+            DELETE FROM owner_aggregates WHERE owner = {_owner_sql("OLD")} AND post_count <= 0;
+        END
+    """,
+    "trg_owner_aggregates_update": f"""
+        AFTER UPDATE OF owner, views, likes, engagement_rate, last_record ON tiktok_posts BEGIN
+            {_owner_aggregate_delta_sql("OLD", "-")}
+            DELETE FROM owner_aggregates WHERE owner = {_owner_sql("OLD")} AND post_count <= 0;
+            {_owner_aggregate_ensure_sql("NEW")}
+            {_owner_aggregate_delta_sql("NEW", "+")}
+        END
+    """,
+}
+
+def rebuild_owner_aggregates(conn):
+    """Recomputes owner_aggregates from scratch (used once to backfill existing databases)."""
+    conn.execute("DELETE FROM owner_aggregates")
+    conn.execute(f"""
+        INSERT INTO owner_aggregates
+            (owner, post_count, sum_views, views_count, sum_likes, likes_count, sum_engagement, engagement_count, last_scraped)
+        SELECT {_owner_sql("p")}, COUNT(*),
+               COALESCE(SUM({_num_sql("p.views")}), 0), COUNT({_num_sql("p.views")}),
+               COALESCE(SUM({_num_sql("p.likes")}), 0), COUNT({_num_sql("p.likes")}),
+               COALESCE(SUM({_rate_sql("p.engagement_rate")}), 0), COUNT({_rate_sql("p.engagement_rate")}),
+               COALESCE(MAX(p.last_record), '')
+        FROM tiktok_posts p
+        GROUP BY {_owner_sql("p")}
+    """)
+
 def setup_database():
     """Sets up the SQLite database and creates the tiktok_posts table if it doesn't exist."""
     conn = sqlite3.connect(DB_FILE)
@@ -32,6 +120,134 @@ def setup_database():
                 error TEXT
             )
         """)
+        # Per-scrape timing breakdown written by tracing.ScrapeTrace
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trace_id TEXT UNIQUE,
+                video_id TEXT,
+                url TEXT,
+                started_at TEXT,
+                total_ms REAL,
+                path TEXT, -- direct, grid_cache, grid or headed_grid
+                outcome TEXT,
+                captcha INTEGER,
+                browser_launches INTEGER,
+                headed_launches INTEGER,
+                bytes_transferred INTEGER,
+                phases TEXT, -- JSON object: phase name -> total ms
+                error TEXT,
+                error_code TEXT -- scrape_errors class of the error (NULL on success)
+            )
+        """)
+        # Databases created before error_code was traced get the column added in place
+        trace_columns = {row[1] for row in cursor.execute("PRAGMA table_info(scrape_traces)")}
+        if "error_code" not in trace_columns:
+            cursor.execute("ALTER TABLE scrape_traces ADD COLUMN error_code TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_traces_video_id ON scrape_traces (video_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_traces_started_at ON scrape_traces (started_at)")
+        # Metric history: one row per successful save, so growth over time can be analysed and charted
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS post_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT NOT NULL,
+                recorded_at TEXT NOT NULL, -- ISO 8601 UTC timestamp
+                views INTEGER,
+                likes INTEGER,
+                comments INTEGER,
+                shares INTEGER,
+                saves INTEGER
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_post_snapshots_video_time ON post_snapshots (video_id, recorded_at)")
+        # Materialized per-owner totals; averages are sum / count at read time (see load_owner_aggregates)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS owner_aggregates (
+                owner TEXT PRIMARY KEY,
+                post_count INTEGER NOT NULL DEFAULT 0,
+                sum_views INTEGER NOT NULL DEFAULT 0,
+                views_count INTEGER NOT NULL DEFAULT 0, -- posts with numeric views
+                sum_likes INTEGER NOT NULL DEFAULT 0,
+                likes_count INTEGER NOT NULL DEFAULT 0,
+                sum_engagement REAL NOT NULL DEFAULT 0,
+                engagement_count INTEGER NOT NULL DEFAULT 0,
+                last_scraped TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tiktok_posts_owner ON tiktok_posts (owner)")
+        # Auto-refresh queue (see scheduler.py): when each tracked post is next due and how urgent it is
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS refresh_schedule (
+                video_id TEXT PRIMARY KEY,
+                link TEXT,
+                next_due TEXT NOT NULL, -- ISO 8601 UTC timestamp
+                priority REAL NOT NULL DEFAULT 0, -- views gained per hour between the last two snapshots
+                interval_seconds INTEGER,
+                last_snapshot_id INTEGER -- newest post_snapshots.id the schedule was computed from
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_refresh_schedule_next_due ON refresh_schedule (next_due)")
+        # Short-link code (vm.tiktok.com/<code>, tiktok.com/t/<code>) -> canonical post URL (see short_links.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS short_links (
+                code TEXT PRIMARY KEY,
+                canonical_url TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                resolved_at TEXT NOT NULL
+            )
+        """)
+        # Consecutive scrape failures per post and the retry policy's verdict (see scrape_errors.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_failures (
+                video_id TEXT PRIMARY KEY,
+                link TEXT,
+                error_code TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_failed_at TEXT,
+                last_failed_at TEXT,
+                next_retry_at TEXT, -- NULL once tombstoned
+                tombstoned INTEGER NOT NULL DEFAULT 0 -- 1 = permanently dead, skipped by batches and auto-refresh
+            )
+        """)
+        # Partial data used to count as a failure; clear those records so the posts are scheduled again
+        cursor.execute(
+            f"DELETE FROM scrape_failures WHERE error_code IN ({', '.join('?' * len(scrape_errors.NON_FAILURE_CODES))})",
+            tuple(scrape_errors.NON_FAILURE_CODES)
+        )
+        # Checkpointed batches: one row per run, one per URL; survive crashes so a restart resumes the run
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                description TEXT,
+                status TEXT NOT NULL DEFAULT 'running', -- running | paused (stopped by an error) | finished | cancelled
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batch_job_items (
+                job_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending', -- pending | in_flight | done | failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_expires_at TEXT,
+                video_id TEXT,
+                error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, position)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_batch_job_items_status ON batch_job_items (job_id, status)")
+        triggers_existed = cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_owner_aggregates_insert'"
+        ).fetchone()[0] > 0
+        for name, body in OWNER_AGGREGATE_TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        if not triggers_existed:
+            rebuild_owner_aggregates(conn)
+            logging.info("Owner aggregates backfilled from existing posts.")
         conn.commit()
         logging.info("Database setup/check complete for TikTok analytics.")
     except Exception as e:
@@ -39,8 +255,23 @@ def setup_database():
     finally:
         conn.close()
 
-def save_to_database(post_data_dict, video_id):
-    """Saves or updates a scraped TikTok post's data in the database."""
+def _to_int_or_none(value):
+    """Count values arrive as ints, numeric strings or 'N/A'; snapshots store them as INTEGER or NULL."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value))
+    except (ValueError, TypeError):
+        return None
+
+def save_to_database(post_data_dict, video_id, batch_item=None):
+    """
+    Saves or updates a scraped TikTok post's data in the database. With batch_item=(job_id, position) the
+    batch checkpoint for that URL is marked done/failed in the same transaction as the post row.
+    """
+    write_start = time.perf_counter()
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     try:
@@ -64,16 +295,138 @@ def save_to_database(post_data_dict, video_id):
             "engagement_rate": formatted_engagement_rate,
             "error": post_data_dict.get("error", None)
         }
+        # Upsert (not INSERT OR REPLACE) so the row is updated in place and the owner_aggregates UPDATE trigger fires
         cursor.execute("""
-            INSERT OR REPLACE INTO tiktok_posts
+            INSERT INTO tiktok_posts
             (video_id, link, post_date, last_record, owner, likes, comments, shares, saves, views, engagement_rate, error)
             VALUES (:video_id, :link, :post_date, :last_record, :owner, :likes, :comments, :shares, :saves, :views, :engagement_rate, :error)
+            ON CONFLICT(video_id) DO UPDATE SET
+                link = excluded.link, post_date = excluded.post_date, last_record = excluded.last_record,
+                owner = excluded.owner, likes = excluded.likes, comments = excluded.comments,
+                shares = excluded.shares, saves = excluded.saves, views = excluded.views,
+                engagement_rate = excluded.engagement_rate, error = excluded.error
         """, db_row)
+        snapshot = {k: _to_int_or_none(post_data_dict.get(k)) for k in ("views", "likes", "comments", "shares", "saves")}
+        if any(v is not None for v in snapshot.values()):
+            snapshot["video_id"] = video_id
+            snapshot["recorded_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            cursor.execute("""
+                INSERT INTO post_snapshots (video_id, recorded_at, views, likes, comments, shares, saves)
+                VALUES (:video_id, :recorded_at, :views, :likes, :comments, :shares, :saves)
+            """, snapshot)
+        if batch_item:
+            _complete_batch_item(cursor, batch_item, video_id, db_row["error"])
         conn.commit()
         logging.info(f"Data for {video_id} saved to database.")
     except sqlite3.Error as e:
         log_msg = f"Database error for {video_id}: {e}"
         logging.error(log_msg, exc_info=True)
+        registry.inc("db_errors_total", op="save_post")
+    finally:
+        conn.close()
+        registry.observe("db_write_seconds", time.perf_counter() - write_start, buckets=DB_BUCKETS, op="save_post")
+
+# Columns of tiktok_posts that can be read/exported by name (whitelist for dynamic SELECTs)
+POST_COLUMNS = [
+    "video_id", "link", "post_date", "last_record",
+    "owner", "likes", "comments", "shares", "saves", "views", "engagement_rate", "error"
+]
+
+def _post_filter_clause(owners=None, date_from=None, date_to=None, date_column="post_date"):
+    """Builds a WHERE clause (and its parameters) for owner and date-range filters on tiktok_posts."""
+    if date_column not in ("post_date", "last_record"):
+        raise ValueError(f"Unsupported date column for filtering: {date_column}")
+    conditions = []
+    params = []
+    if owners:
+        conditions.append(f"owner IN ({', '.join('?' * len(owners))})")
+        params.extend(owners)
+    # Dates are stored as 'YYYY-MM-DD...' strings, so lexical comparison on the date prefix is a date comparison
+    if date_from:
+        conditions.append(f"substr({date_column}, 1, 10) >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"substr({date_column}, 1, 10) <= ?")
+        params.append(date_to)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def count_post_rows(owners=None, date_from=None, date_to=None, date_column="post_date"):
+    """Counts tiktok_posts rows matching the given filters."""
+    where, params = _post_filter_clause(owners, date_from, date_to, date_column)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM tiktok_posts{where}", params).fetchone()[0]
+    except sqlite3.Error as e:
+        logging.error(f"Database error counting rows: {e}", exc_info=True)
+        return 0
+    finally:
+        conn.close()
+
+def iter_post_rows(columns=None, owners=None, date_from=None, date_to=None, date_column="post_date", chunk_size=5000):
+    """
+    Yields lists of up to `chunk_size` row tuples (in `columns` order) from tiktok_posts,
+    so callers can stream large tables without loading them into memory.
+    """
+    columns = list(columns or POST_COLUMNS)
+    unknown = [c for c in columns if c not in POST_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown tiktok_posts columns: {', '.join(unknown)}")
+    where, params = _post_filter_clause(owners, date_from, date_to, date_column)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM tiktok_posts{where} ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+SNAPSHOT_COLUMNS = ["video_id", "recorded_at", "views", "likes", "comments", "shares", "saves"]
+
+def _snapshot_filter_clause(owners=None, date_from=None, date_to=None):
+    """Builds a WHERE clause for post_snapshots: owners via tiktok_posts, date range on recorded_at."""
+    conditions = []
+    params = []
+    if owners:
+        conditions.append(f"video_id IN (SELECT video_id FROM tiktok_posts WHERE owner IN ({', '.join('?' * len(owners))}))")
+        params.extend(owners)
+    if date_from:
+        conditions.append("substr(recorded_at, 1, 10) >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("substr(recorded_at, 1, 10) <= ?")
+        params.append(date_to)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def count_snapshot_rows(owners=None, date_from=None, date_to=None):
+    """Counts post_snapshots rows matching the given filters."""
+    where, params = _snapshot_filter_clause(owners, date_from, date_to)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM post_snapshots{where}", params).fetchone()[0]
+    except sqlite3.Error as e:
+        logging.error(f"Database error counting snapshots: {e}", exc_info=True)
+        return 0
+    finally:
+        conn.close()
+
+def iter_snapshot_rows(owners=None, date_from=None, date_to=None, chunk_size=5000):
+    """Yields lists of up to `chunk_size` post_snapshots rows (SNAPSHOT_COLUMNS order), each post's history in time order."""
+    where, params = _snapshot_filter_clause(owners, date_from, date_to)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM post_snapshots{where} ORDER BY video_id, recorded_at, id", params
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
     finally:
         conn.close()
 
@@ -99,18 +452,105 @@ def load_data_from_db():
     finally:
         conn.close()
 
+OWNER_AGGREGATE_SORT_KEYS = {
+    "owner": "owner",
+    "post_count": "post_count",
+    "sum_views": "sum_views",
+    "avg_views": "CAST(sum_views AS REAL) / NULLIF(views_count, 0)",
+    "sum_likes": "sum_likes",
+    "avg_likes": "CAST(sum_likes AS REAL) / NULLIF(likes_count, 0)",
+    "avg_engagement_rate": "sum_engagement / NULLIF(engagement_count, 0)",
+    "last_scraped": "last_scraped",
+}
+
+def load_owner_aggregates(order_by="sum_views", descending=True, limit=None):
+    """
+    Reads the materialized per-owner aggregates (O(owners), no scan of tiktok_posts).
+    Returns a list of dicts with post_count, sum/avg views and likes, avg engagement rate and last_scraped.
+    """
+    if order_by not in OWNER_AGGREGATE_SORT_KEYS:
+        raise ValueError(f"Unsupported sort key: {order_by}")
+    select = ", ".join(f"{expr} AS {name}" for name, expr in OWNER_AGGREGATE_SORT_KEYS.items())
+    query = (
+        f"SELECT {select} FROM owner_aggregates "
+        f"ORDER BY {OWNER_AGGREGATE_SORT_KEYS[order_by]} {'DESC' if descending else 'ASC'} NULLS LAST"
+    )
+    params = ()
+    if limit:
+        query += " LIMIT ?"
+        params = (int(limit),)
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = [dict(r) for r in conn.execute(query, params).fetchall()]
+        for row in rows:
+            row["last_scraped"] = row["last_scraped"] or None
+        return rows
+    except sqlite3.Error as e:
+        logging.error(f"Database error loading owner aggregates: {e}", exc_info=True)
+        return []
+    finally:
+        conn.close()
+
+def load_short_links(codes):
+    """Cached short-link resolutions: {code: (canonical_url, video_id)} for the codes that are known."""
+    codes = list(codes)
+    if not codes:
+        return {}
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        found = {}
+        for start in range(0, len(codes), 500): # Stay under SQLite's bound-parameter limit
+            chunk = codes[start:start + 500]
+            rows = conn.execute(
+                f"SELECT code, canonical_url, video_id FROM short_links WHERE code IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update({code: (url, video_id) for code, url, video_id in rows})
+        return found
+    except sqlite3.Error as e:
+        logging.error(f"Database error loading short links: {e}", exc_info=True)
+        return {}
+    finally:
+        conn.close()
+
+def save_short_links(resolutions):
+    """Stores {code: (canonical_url, video_id)} short-link resolutions."""
+    if not resolutions:
+        return
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.executemany(
+            "INSERT OR REPLACE INTO short_links (code, canonical_url, video_id, resolved_at) VALUES (?, ?, ?, ?)",
+            [(code, url, video_id, now) for code, (url, video_id) in resolutions.items()]
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Database error saving short links: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="save_short_links")
+    finally:
+        conn.close()
+
 def delete_data_from_db(link):
     """Deletes a record from the database based on its link (extracting video_id)."""
+    write_start = time.perf_counter()
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
     try:
-        # Corrected: Use TikTok specific video ID extraction
-        match = re.search(r'(?:tiktok\.com/@[\w.]+/video/|vm\.tiktok\.com/|tiktok\.com/t/)([0-9]+)', link)
-        if match:
-            video_id = match.group(1)
+        # Short links carry an opaque code, not the video ID; use the resolved ID when we have one
+        video_id = canonicalize(link)[0]
+        if not video_id:
+            code = short_code(link)
+            resolved = load_short_links([code]) if code else {}
+            video_id = resolved[code][1] if resolved else None
+        if video_id:
             cursor.execute("DELETE FROM tiktok_posts WHERE video_id = ?", (video_id,))
+            deleted = cursor.rowcount
+            cursor.execute("DELETE FROM post_snapshots WHERE video_id = ?", (video_id,))
+            cursor.execute("DELETE FROM refresh_schedule WHERE video_id = ?", (video_id,))
+            cursor.execute("DELETE FROM scrape_failures WHERE video_id = ?", (video_id,))
             conn.commit()
-            if cursor.rowcount > 0:
+            if deleted > 0:
                 logging.info(f"Successfully deleted record for video_id: {video_id}")
             else:
                 logging.warning(f"No record found for video_id: {video_id} (link: {link})")
@@ -118,5 +558,296 @@ def delete_data_from_db(link):
             logging.warning(f"Could not extract video ID from link: {link}. Cannot delete.")
     except sqlite3.Error as e:
         logging.error(f"Database error deleting data for link {link}: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="delete_post")
+    finally:
+        conn.close()
+        registry.observe("db_write_seconds", time.perf_counter() - write_start, buckets=DB_BUCKETS, op="delete_post")
+
+def save_scrape_trace(trace_record):
+    """Stores one scrape timing trace (see tracing.ScrapeTrace.to_dict) in the scrape_traces table."""
+    write_start = time.perf_counter()
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT OR REPLACE INTO scrape_traces
+            (trace_id, video_id, url, started_at, total_ms, path, outcome, captcha,
+             browser_launches, headed_launches, bytes_transferred, phases, error, error_code)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            trace_record.get("trace_id"),
+            trace_record.get("video_id"),
+            trace_record.get("url"),
+            trace_record.get("started_at"),
+            trace_record.get("total_ms"),
+            trace_record.get("path"),
+            trace_record.get("outcome"),
+            int(bool(trace_record.get("captcha"))),
+            trace_record.get("browser_launches", 0),
+            trace_record.get("headed_launches", 0),
+            trace_record.get("bytes_transferred", 0),
+            json.dumps(trace_record.get("phases", {})),
+            trace_record.get("error"),
+            trace_record.get("error_code"),
+        ))
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Database error saving scrape trace {trace_record.get('trace_id')}: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="save_trace")
+    finally:
+        conn.close()
+        registry.observe("db_write_seconds", time.perf_counter() - write_start, buckets=DB_BUCKETS, op="save_trace")
+
+def record_scrape_outcome(video_id, link, error_code=None, error=None):
+    """
+    Applies the retry policy to one scrape result. Success (including partial data, see
+    scrape_errors.NON_FAILURE_CODES) clears the post's failure record; a failure bumps its attempt count and
+    sets next_retry_at (exponential backoff per error class) or tombstones the post.
+    Returns the failure record as a dict, or None after a success.
+    """
+    if not video_id or video_id == "unknown_post":
+        return None
+    if error and not error_code:
+        error_code = scrape_errors.classify_error(error)
+    now = datetime.now(timezone.utc)
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    try:
+        if not error_code or error_code in scrape_errors.NON_FAILURE_CODES:
+            cursor.execute("DELETE FROM scrape_failures WHERE video_id = ?", (video_id,))
+            conn.commit()
+            return None
+        row = cursor.execute(
+            "SELECT attempts, error_code, first_failed_at FROM scrape_failures WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        # Backoff restarts when the failure changes class (e.g. a timeout streak turns into a CAPTCHA)
+        attempts = row[0] + 1 if row and row[1] == error_code else 1
+        first_failed_at = row[2] if row else now.isoformat(timespec="seconds")
+        next_retry, tombstone = scrape_errors.retry_decision(error_code, attempts, now)
+        record = {
+            "video_id": video_id,
+            "link": link,
+            "error_code": error_code,
+            "error": error,
+            "attempts": attempts,
+            "first_failed_at": first_failed_at,
+            "last_failed_at": now.isoformat(timespec="seconds"),
+            "next_retry_at": next_retry.isoformat(timespec="seconds") if next_retry else None,
+            "tombstoned": int(tombstone),
+        }
+        cursor.execute("""
+            INSERT OR REPLACE INTO scrape_failures
+            (video_id, link, error_code, error, attempts, first_failed_at, last_failed_at, next_retry_at, tombstoned)
+            VALUES (:video_id, :link, :error_code, :error, :attempts, :first_failed_at, :last_failed_at, :next_retry_at, :tombstoned)
+        """, record)
+        # Keep the auto-refresh queue in step: retry at the backoff time, or never for tombstones
+        if tombstone:
+            cursor.execute("DELETE FROM refresh_schedule WHERE video_id = ?", (video_id,))
+        else:
+            cursor.execute("UPDATE refresh_schedule SET next_due = ? WHERE video_id = ?", (record["next_retry_at"], video_id))
+        conn.commit()
+        registry.inc("scrape_failures_recorded_total", code=error_code, tombstoned=str(bool(tombstone)).lower())
+        if tombstone:
+            logging.warning(f"Tombstoned {video_id} after {attempts} attempt(s): {error_code}.")
+        else:
+            logging.info(f"Scrape of {video_id} failed ({error_code}, attempt {attempts}); next retry at {record['next_retry_at']}.")
+        return record
+    except sqlite3.Error as e:
+        logging.error(f"Database error recording scrape outcome for {video_id}: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="record_outcome")
+        return None
+    finally:
+        conn.close()
+
+def load_blocked_video_ids(include_backoff=True):
+    """
+    Video IDs a batch should not spend browser time on: tombstoned posts and, with include_backoff,
+    posts whose retry backoff has not expired yet. Returns {video_id: reason}.
+    """
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        query = "SELECT video_id, error_code, tombstoned FROM scrape_failures WHERE tombstoned = 1"
+        params = ()
+        if include_backoff:
+            query += " OR next_retry_at > ?"
+            params = (now,)
+        return {
+            video_id: f"tombstoned ({code})" if tombstoned else f"backing off ({code})"
+            for video_id, code, tombstoned in conn.execute(query, params).fetchall()
+        }
+    except sqlite3.Error as e:
+        logging.error(f"Database error loading blocked video IDs: {e}", exc_info=True)
+        return {}
+    finally:
+        conn.close()
+
+
+def _complete_batch_item(cursor, batch_item, video_id, error=None):
+    job_id, position = batch_item
+    cursor.execute("""
+        UPDATE batch_job_items SET status = ?, video_id = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+        WHERE job_id = ? AND position = ?
+    """, ("failed" if error else "done", video_id, error, _utc_now_iso(), job_id, position))
+
+def _utc_now_iso(offset_seconds=0):
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat(timespec="seconds")
+
+def create_batch_job(description, urls):
+    """Checkpoints a new batch run with every URL pending. Returns its job_id, or None on a database error."""
+    now = _utc_now_iso()
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO batch_jobs (description, status, created_at, updated_at) VALUES (?, 'running', ?, ?)",
+            (description, now, now)
+        )
+        job_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO batch_job_items (job_id, position, url, updated_at) VALUES (?, ?, ?, ?)",
+            [(job_id, position, url, now) for position, url in enumerate(urls)]
+        )
+        conn.commit()
+        logging.info(f"Batch job {job_id} checkpointed with {len(urls)} URLs.")
+        return job_id
+    except sqlite3.Error as e:
+        logging.error(f"Database error creating batch job: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="batch_create")
+        return None
+    finally:
+        conn.close()
+
+def claim_batch_item(job_id, lease_seconds=BATCH_LEASE_SECONDS):
+    """
+    Leases the next URL of a batch: the first pending item, or an in-flight one whose lease expired (its
+    worker crashed). Items claimed BATCH_ITEM_MAX_ATTEMPTS times without finishing are marked failed.
+    Returns (position, url), or None when nothing is claimable right now.
+    """
+    now = _utc_now_iso()
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE") # Claims from concurrent workers serialize here
+        conn.execute("""
+            UPDATE batch_job_items SET status = 'failed', error = 'Gave up after repeated interrupted attempts.',
+                lease_expires_at = NULL, updated_at = ?
+            WHERE job_id = ? AND status = 'in_flight' AND lease_expires_at <= ? AND attempts >= ?
+        """, (now, job_id, now, BATCH_ITEM_MAX_ATTEMPTS))
+        row = conn.execute("""
+            SELECT position, url FROM batch_job_items
+            WHERE job_id = ? AND (status = 'pending' OR (status = 'in_flight' AND lease_expires_at <= ?))
+            ORDER BY position LIMIT 1
+        """, (job_id, now)).fetchone()
+        if row:
+            conn.execute("""
+                UPDATE batch_job_items SET status = 'in_flight', attempts = attempts + 1, lease_expires_at = ?, updated_at = ?
+                WHERE job_id = ? AND position = ?
+            """, (_utc_now_iso(lease_seconds), now, job_id, row[0]))
+        conn.execute("COMMIT")
+        return tuple(row) if row else None
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        logging.error(f"Database error claiming batch item of job {job_id}: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="batch_claim")
+        return None
+    finally:
+        conn.close()
+
+def release_batch_item(job_id, position):
+    """Puts an in-flight item back to pending without counting the attempt (cancelled mid-scrape)."""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("""
+            UPDATE batch_job_items SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_expires_at = NULL, updated_at = ?
+            WHERE job_id = ? AND position = ? AND status = 'in_flight'
+        """, (_utc_now_iso(), job_id, position))
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Database error releasing batch item {job_id}/{position}: {e}", exc_info=True)
+    finally:
+        conn.close()
+
+def requeue_batch_job_leases(job_id):
+    """
+    Resume: puts every in-flight item of a job back to pending right away instead of waiting for the leases
+    of the run that crashed to expire. Items already claimed BATCH_ITEM_MAX_ATTEMPTS times are marked failed.
+    Returns the number of items requeued.
+    """
+    now = _utc_now_iso()
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("""
+            UPDATE batch_job_items SET status = 'failed', error = 'Gave up after repeated interrupted attempts.',
+                lease_expires_at = NULL, updated_at = ?
+            WHERE job_id = ? AND status = 'in_flight' AND attempts >= ?
+        """, (now, job_id, BATCH_ITEM_MAX_ATTEMPTS))
+        requeued = conn.execute("""
+            UPDATE batch_job_items SET status = 'pending', lease_expires_at = NULL, updated_at = ?
+            WHERE job_id = ? AND status = 'in_flight'
+        """, (now, job_id)).rowcount
+        conn.commit()
+        if requeued:
+            logging.info(f"Batch job {job_id}: requeued {requeued} item(s) left in flight by the previous run.")
+        return requeued
+    except sqlite3.Error as e:
+        logging.error(f"Database error requeueing leases of batch job {job_id}: {e}", exc_info=True)
+        registry.inc("db_errors_total", op="batch_requeue")
+        return 0
+    finally:
+        conn.close()
+
+def set_batch_job_status(job_id, status):
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("UPDATE batch_jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, _utc_now_iso(), job_id))
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Database error updating batch job {job_id}: {e}", exc_info=True)
+    finally:
+        conn.close()
+
+def batch_job_progress(job_id):
+    """Item counts per status plus next_lease_expiry (earliest in-flight lease, or None)."""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        progress = {"pending": 0, "in_flight": 0, "done": 0, "failed": 0}
+        progress.update(conn.execute(
+            "SELECT status, COUNT(*) FROM batch_job_items WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        progress["next_lease_expiry"] = conn.execute(
+            "SELECT MIN(lease_expires_at) FROM batch_job_items WHERE job_id = ? AND status = 'in_flight'", (job_id,)
+        ).fetchone()[0]
+        return progress
+    except sqlite3.Error as e:
+        logging.error(f"Database error reading progress of batch job {job_id}: {e}", exc_info=True)
+        return None
+    finally:
+        conn.close()
+
+def load_resumable_batch_jobs():
+    """
+    Batch runs left 'running' by a crash or exit, or 'paused' by an error, oldest first, with their outstanding
+    and finished item counts.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("""
+            SELECT j.job_id, j.description, j.created_at,
+                   SUM(i.status IN ('pending', 'in_flight')) AS remaining,
+                   SUM(i.status = 'done') AS done,
+                   SUM(i.status = 'failed') AS failed,
+                   COUNT(i.position) AS total
+            FROM batch_jobs j JOIN batch_job_items i ON i.job_id = j.job_id
+            WHERE j.status IN ('running', 'paused')
+            GROUP BY j.job_id
+            HAVING remaining > 0
+            ORDER BY j.job_id
+        """).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        logging.error(f"Database error loading resumable batch jobs: {e}", exc_info=True)
+        return []
     finally:
         conn.close()
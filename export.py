@@ -0,0 +1,298 @@
+import os
+import csv
+import gzip
+import logging
+from datetime import datetime, timezone
+
+from database import (
+    POST_COLUMNS, SNAPSHOT_COLUMNS, count_post_rows, iter_post_rows, count_snapshot_rows, iter_snapshot_rows
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as pa_ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = pa_ipc = None
+    PYARROW_AVAILABLE = False
+
+# Default CSV column order (matches the original in-memory export)
+DEFAULT_EXPORT_COLUMNS = [
+    "link", "video_id", "post_date", "last_record",
+    "owner", "likes", "comments", "shares", "saves", "views", "engagement_rate", "error"
+]
+DATE_COLUMNS = ("post_date", "last_record")
+EXPORT_CHUNK_ROWS = 5000
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is stopped through its cancel event."""
+    pass
+
+
+def _date_only(value):
+    """'YYYY-MM-DD HH:MM:SS (UTC)' -> 'YYYY-MM-DD', leaving anything else untouched (as the table display does)."""
+    if isinstance(value, str) and len(value) >= 10 and value[4:5] == "-" and value[7:8] == "-":
+        return value[:10]
+    return value
+
+
+def export_posts_csv(filepath, columns=None, owners=None, date_from=None, date_to=None,
+                     date_column="post_date", compress=None, progress_callback=None, cancel_event=None,
+                     chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Streams tiktok_posts straight from SQLite into a CSV file, chunk by chunk, so memory use does not
+    grow with the table. Writes gzip when `compress` is True (or None and the path ends in .gz).
+    progress_callback(rows_written, total_rows) is called after every chunk. Returns rows written.
+    """
+    columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in POST_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    if compress is None:
+        compress = str(filepath).lower().endswith(".gz")
+
+    total = count_post_rows(owners, date_from, date_to, date_column)
+    chunks = iter_post_rows(columns, owners, date_from, date_to, date_column, chunk_size)
+    written = _write_csv(filepath, columns, chunks, total, compress, progress_callback, cancel_event)
+    logging.info(f"Exported {written} rows to {filepath}{' (gzip)' if compress else ''}.")
+    return written
+
+
+def _remove_partial(filepath):
+    """Deletes what a cancelled export had written so far, so no truncated file is left behind."""
+    try:
+        os.remove(filepath)
+    except OSError as e:
+        logging.warning(f"Could not remove partial export {filepath}: {e}")
+
+
+def _write_csv(filepath, columns, chunks, total, compress, progress_callback, cancel_event):
+    date_indexes = [i for i, c in enumerate(columns) if c in DATE_COLUMNS]
+    opener = gzip.open if compress else open
+    written = 0
+
+    try:
+        with opener(filepath, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled(f"Export cancelled after {written} rows.")
+                if date_indexes:
+                    rows = [list(row) for row in rows]
+                    for row in rows:
+                        for i in date_indexes:
+                            row[i] = _date_only(row[i])
+                writer.writerows(rows)
+                written += len(rows)
+                if progress_callback:
+                    progress_callback(written, total)
+    except ExportCancelled:
+        _remove_partial(filepath)
+        raise
+    return written
+
+
+def export_snapshots_csv(filepath, owners=None, date_from=None, date_to=None, compress=None,
+                         progress_callback=None, cancel_event=None, chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Streams the post_snapshots history (one row per recorded scrape) into a CSV file, optionally gzipped;
+    `owners` and the recorded_at date range filter it. Returns rows written.
+    """
+    if compress is None:
+        compress = str(filepath).lower().endswith(".gz")
+    total = count_snapshot_rows(owners, date_from, date_to)
+    chunks = iter_snapshot_rows(owners, date_from, date_to, chunk_size)
+    written = _write_csv(filepath, SNAPSHOT_COLUMNS, chunks, total, compress, progress_callback, cancel_event)
+    logging.info(f"Exported {written} snapshot rows to {filepath}{' (gzip)' if compress else ''}.")
+    return written
+
+
+# --- Typed (columnar) export ---
+
+COUNT_COLUMNS = ("likes", "comments", "shares", "saves", "views")
+TIMESTAMP_COLUMNS = DATE_COLUMNS + ("recorded_at",)
+COLUMNAR_ROW_GROUP_ROWS = 100_000
+
+
+def parse_stored_int(value):
+    """Stored count text ('12345', 'N/A', None) -> int or None."""
+    if value is None or value == "N/A" or value == "":
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        try:
+            return int(float(value))
+        except (ValueError, TypeError):
+            return None
+
+
+def parse_stored_rate(value):
+    """Stored engagement rate text ('3.25%', 'N/A', None) -> float percentage or None."""
+    if value is None or value == "N/A" or value == "":
+        return None
+    try:
+        return float(str(value).rstrip("%"))
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_stored_datetime(value):
+    """Stored 'YYYY-MM-DD HH:MM:SS (UTC)', ISO 'YYYY-MM-DDTHH:MM:SS+00:00' or 'YYYY-MM-DD' -> aware UTC datetime, else None."""
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    try:
+        if len(value) >= 19 and value[10] in " T":
+            return datetime.strptime(f"{value[:10]} {value[11:19]}", "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        return datetime.strptime(value[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _arrow_schema(columns):
+    fields = []
+    for col in columns:
+        if col in COUNT_COLUMNS:
+            fields.append(pa.field(col, pa.int64()))
+        elif col == "engagement_rate":
+            fields.append(pa.field(col, pa.float64()))
+        elif col in TIMESTAMP_COLUMNS:
+            fields.append(pa.field(col, pa.timestamp("s", tz="UTC")))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def _typed_columns(rows, columns):
+    """Transposes row tuples into per-column Python lists with proper types."""
+    converters = []
+    for col in columns:
+        if col in COUNT_COLUMNS:
+            converters.append(parse_stored_int)
+        elif col == "engagement_rate":
+            converters.append(parse_stored_rate)
+        elif col in TIMESTAMP_COLUMNS:
+            converters.append(parse_stored_datetime)
+        else:
+            converters.append(None)
+    out = []
+    for i, convert in enumerate(converters):
+        values = [row[i] for row in rows]
+        out.append([convert(v) for v in values] if convert else values)
+    return out
+
+
+def export_posts_columnar(filepath, columns=None, owners=None, date_from=None, date_to=None,
+                          date_column="post_date", progress_callback=None, cancel_event=None,
+                          row_group_rows=COLUMNAR_ROW_GROUP_ROWS):
+    """
+    Exports tiktok_posts to Parquet (default) or Arrow IPC (.arrow/.feather) with typed columns:
+    int64 counts, float64 engagement rate and UTC timestamps, one row group per `row_group_rows` batch.
+    Without pyarrow it falls back to a gzipped CSV next to `filepath`.
+    Returns (path_written, format, rows_written).
+    """
+    columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in POST_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+
+    if not PYARROW_AVAILABLE:
+        fallback_path = os.path.splitext(str(filepath))[0] + ".csv.gz"
+        logging.warning(f"pyarrow is not installed; exporting gzipped CSV to {fallback_path} instead of {filepath}.")
+        written = export_posts_csv(fallback_path, columns, owners, date_from, date_to, date_column,
+                                   compress=True, progress_callback=progress_callback, cancel_event=cancel_event)
+        return fallback_path, "csv.gz", written
+
+    total = count_post_rows(owners, date_from, date_to, date_column)
+    chunks = iter_post_rows(columns, owners, date_from, date_to, date_column, row_group_rows)
+    fmt, written = _write_columnar(filepath, columns, chunks, total, row_group_rows, progress_callback, cancel_event)
+    logging.info(f"Exported {written} rows to {filepath} ({fmt}).")
+    return str(filepath), fmt, written
+
+
+def _write_columnar(filepath, columns, chunks, total, row_group_rows, progress_callback, cancel_event):
+    """Writes typed record batches to Parquet, or Arrow IPC for .arrow/.feather/.ipc paths. Returns (format, rows)."""
+    use_ipc = str(filepath).lower().endswith((".arrow", ".feather", ".ipc"))
+    schema = _arrow_schema(columns)
+    written = 0
+
+    if use_ipc:
+        sink = pa.OSFile(str(filepath), "wb")
+        writer = pa_ipc.new_file(sink, schema)
+    else:
+        sink = None
+        writer = pq.ParquetWriter(str(filepath), schema, compression="zstd")
+    cancelled = False
+    try:
+        for rows in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                raise ExportCancelled(f"Export cancelled after {written} rows.")
+            batch = pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(_typed_columns(rows, columns), schema)],
+                schema=schema,
+            )
+            if use_ipc:
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_rows)
+            written += len(rows)
+            if progress_callback:
+                progress_callback(written, total)
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+        if cancelled:
+            _remove_partial(filepath)
+    return ("arrow" if use_ipc else "parquet"), written
+
+
+def export_snapshots_columnar(filepath, owners=None, date_from=None, date_to=None, progress_callback=None,
+                              cancel_event=None, row_group_rows=COLUMNAR_ROW_GROUP_ROWS):
+    """
+    Exports the post_snapshots history to Parquet or Arrow IPC with int64 counts and a UTC recorded_at
+    timestamp; like export_posts_columnar it falls back to gzipped CSV without pyarrow.
+    Returns (path_written, format, rows_written).
+    """
+    if not PYARROW_AVAILABLE:
+        fallback_path = os.path.splitext(str(filepath))[0] + ".csv.gz"
+        logging.warning(f"pyarrow is not installed; exporting gzipped CSV to {fallback_path} instead of {filepath}.")
+        written = export_snapshots_csv(fallback_path, owners, date_from, date_to, compress=True,
+                                       progress_callback=progress_callback, cancel_event=cancel_event)
+        return fallback_path, "csv.gz", written
+
+    total = count_snapshot_rows(owners, date_from, date_to)
+    chunks = iter_snapshot_rows(owners, date_from, date_to, row_group_rows)
+    fmt, written = _write_columnar(filepath, SNAPSHOT_COLUMNS, chunks, total, row_group_rows, progress_callback, cancel_event)
+    logging.info(f"Exported {written} snapshot rows to {filepath} ({fmt}).")
+    return str(filepath), fmt, written
+
+
+OWNER_SUMMARY_COLUMNS = [
+    "owner", "post_count", "sum_views", "avg_views", "max_views", "avg_likes",
+    "avg_engagement_rate", "avg_engagement_rate_full", "views_outliers"
+]
+
+
+def _format_summary_cell(value):
+    if isinstance(value, float):
+        return "" if value != value else f"{value:.2f}" # NaN -> empty cell
+    return value
+
+
+def export_owner_summary_csv(filepath, analytics_result=None):
+    """Writes the per-owner aggregates from analytics.compute_all to CSV. Returns rows written."""
+    import analytics # NumPy is only needed for analytics-backed exports
+    result = analytics_result or analytics.compute_all()
+    rows = analytics.owner_summary_rows(result)
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(OWNER_SUMMARY_COLUMNS)
+        for row in rows:
+            writer.writerow([_format_summary_cell(row[c]) for c in OWNER_SUMMARY_COLUMNS])
+    logging.info(f"Exported owner summary ({len(rows)} owners) to {filepath}.")
+    return len(rows)
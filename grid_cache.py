@@ -0,0 +1,107 @@
+import time
+import logging
+import threading
+
+from metrics import registry
+from tiktok_urls import canonicalize
+
+DEFAULT_TTL_SECONDS = 10 * 60 # Grid view counts are coarse ("1.2M") and only used as a fallback; keep them briefly
+MAX_DEPTH_POINTS_PER_OWNER = 64
+
+
+def video_timestamp(video_id):
+    """Unix time a post was created: TikTok video IDs carry it in their upper 32 bits, so they sort by age."""
+    try:
+        return int(video_id) >> 32
+    except (TypeError, ValueError):
+        return None
+
+
+class GridHarvestCache:
+    """
+    Short-lived, process-wide video_id -> views map per owner, filled from every profile grid the scraper
+    loads. A later grid fallback for the same owner is answered from here instead of loading and scrolling
+    the profile again. It also remembers how far down each owner's grid a given post age was found
+    (depth memory), which does not expire: it only steers scrolling.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {} # owner -> {video_id: (harvested_at monotonic, views)}
+        self._depths = {} # owner -> sorted [(oldest video_id loaded as int, scroll offset px)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(owner):
+        return owner.lower() if owner else None
+
+    def store(self, owner, views_by_video_id):
+        """Merges one harvest into the owner's entry; each row expires ttl_seconds after it was last harvested."""
+        key = self._key(owner)
+        if not key or not views_by_video_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            known = {vid: row for vid, row in self._entries.get(key, {}).items() if now - row[0] <= self.ttl_seconds}
+            known.update((vid, (now, views)) for vid, views in views_by_video_id.items())
+            self._entries[key] = known
+            size = len(known)
+        logging.info(f"Grid cache: {len(views_by_video_id)} posts harvested for @{owner} ({size} cached).")
+
+    def lookup(self, owner, video_id):
+        """Views of `video_id` from a fresh harvest of `owner`'s grid, or None."""
+        key = self._key(owner)
+        with self._lock:
+            rows = self._entries.get(key, {})
+            row = rows.get(video_id)
+            if row and time.monotonic() - row[0] > self.ttl_seconds:
+                del rows[video_id]
+                row = None
+            views = row[1] if row else None
+        registry.inc("grid_cache_lookups_total", result="hit" if views is not None else "miss")
+        return views
+
+    def remember_depth(self, owner, oldest_video_id, scroll_y):
+        """Records that scrolling `owner`'s grid to `scroll_y` px had loaded posts back to `oldest_video_id`."""
+        key = self._key(owner)
+        if not key or oldest_video_id is None:
+            return
+        with self._lock:
+            points = [p for p in self._depths.get(key, []) if p[0] != int(oldest_video_id)]
+            points.append((int(oldest_video_id), int(scroll_y)))
+            points.sort(reverse=True) # Newest first, i.e. by increasing depth
+            if len(points) > MAX_DEPTH_POINTS_PER_OWNER:
+                step = len(points) / MAX_DEPTH_POINTS_PER_OWNER
+                points = [points[int(i * step)] for i in range(MAX_DEPTH_POINTS_PER_OWNER - 1)] + [points[-1]]
+            self._depths[key] = points
+
+    def known_depth(self, owner, video_id):
+        """Smallest remembered scroll offset at which the grid already reached back to `video_id`'s age, or None."""
+        key = self._key(owner)
+        try:
+            target = int(video_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            return next((y for oldest, y in self._depths.get(key, []) if oldest <= target), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._depths.clear()
+
+
+def group_by_owner(urls):
+    """
+    Batch planner: reorders URLs so each owner's posts are consecutive (owners in order of first appearance,
+    posts in their original order). Grid fallbacks for one creator then run back to back and share a single
+    profile load through grid_cache.
+    """
+    groups = {}
+    for url in urls:
+        owner = canonicalize(url)[1]
+        groups.setdefault(owner.lower() if owner else None, []).append(url)
+    return [url for group in groups.values() for url in group]
+
+
+grid_cache = GridHarvestCache()
@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from playwright.async_api import async_playwright
+
+from metrics import registry
+
+DEFAULT_ESCALATIONS_PER_HOUR = 4
+ESCALATIONS_ENV_VAR = "TIKTOK_HEADED_ESCALATIONS_PER_HOUR"
+HEADED_IDLE_CLOSE_SECONDS = 10 * 60 # The shared window closes after this long unused
+
+
+def escalations_from_env():
+    value = os.environ.get(ESCALATIONS_ENV_VAR)
+    if not value:
+        return DEFAULT_ESCALATIONS_PER_HOUR
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logging.warning(f"Ignoring invalid {ESCALATIONS_ENV_VAR}={value!r}; using {DEFAULT_ESCALATIONS_PER_HOUR}.")
+        return DEFAULT_ESCALATIONS_PER_HOUR
+
+
+class EscalationBudget:
+    """At most `per_hour` headed escalations in any rolling hour (CAPTCHA solving and headed grid retries)."""
+
+    def __init__(self, per_hour=None):
+        self.per_hour = escalations_from_env() if per_hour is None else per_hour
+        self._granted = deque() # monotonic times of granted escalations
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._granted and now - self._granted[0] >= 3600:
+            self._granted.popleft()
+
+    def remaining(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(self.per_hour - len(self._granted), 0)
+
+    def try_acquire(self, reason):
+        """Consumes one escalation if the budget allows; False means stay headless."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            granted = len(self._granted) < self.per_hour
+            if granted:
+                self._granted.append(now)
+        registry.inc("headed_escalations_total", reason=reason, result="granted" if granted else "denied")
+        if not granted:
+            logging.warning(f"Headed escalation for {reason} denied: {self.per_hour}/hour budget used up.")
+        return granted
+
+
+class SharedHeadedBrowser:
+    """
+    The one visible browser of the process. Scrapes that need headed mode borrow a page from it
+    (acquire/release, one borrower at a time) instead of launching their own window; the browser is
+    launched on first use, reused across posts and closed after HEADED_IDLE_CLOSE_SECONDS unused.
+    `setup_context(browser, trace)` creates a configured context (stealth, cookies, hooks).
+    """
+
+    def __init__(self, setup_context, idle_close_seconds=HEADED_IDLE_CLOSE_SECONDS):
+        self.setup_context = setup_context
+        self.idle_close_seconds = idle_close_seconds
+        self._loop = None
+        self._lock = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._idle_task = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new event loop (e.g. a second asyncio.run) cannot use objects created on the old one
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._playwright = self._browser = self._context = self._idle_task = None
+
+    @property
+    def is_open(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    async def acquire(self, url, trace):
+        """Waits for the shared browser, opens `url` in a new page and returns (context, page)."""
+        self._bind_loop()
+        await self._lock.acquire()
+        try:
+            if self._idle_task:
+                self._idle_task.cancel()
+                self._idle_task = None
+            if not self.is_open:
+                await self._launch(trace)
+            page = await self._context.new_page()
+            trace.attach_page(page)
+            logging.info(f"Navigating shared headed browser to: {url}")
+            with trace.span("goto", headless=False):
+                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            return self._context, page
+        except BaseException:
+            self._lock.release()
+            raise
+
+    async def release(self, page):
+        """Closes the borrowed page; the browser stays open for the next escalation."""
+        try:
+            if page and not page.is_closed():
+                await page.close()
+        except Exception as e:
+            logging.warning(f"Error closing shared headed page: {e}")
+        finally:
+            self._idle_task = asyncio.ensure_future(self._close_when_idle())
+            self._lock.release()
+
+    async def _launch(self, trace):
+        await self._close_browser()
+        with trace.span("browser_launch", headless=False):
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=False, args=["--disable-blink-features=AutomationControlled"]
+            )
+        trace.browser_launches += 1
+        trace.headed_launches += 1
+        registry.inc("browser_launches_total", mode="headed")
+        registry.add_gauge("browsers_open", 1)
+        self._browser.on("disconnected", lambda _: registry.add_gauge("browsers_open", -1))
+        self._context = await self.setup_context(self._browser, trace)
+        logging.info("Shared headed browser launched.")
+
+    async def _close_when_idle(self):
+        await asyncio.sleep(self.idle_close_seconds)
+        if self._lock.locked():
+            return
+        async with self._lock: # A borrower arriving now waits for the close, then relaunches
+            self._idle_task = None
+            await self._close_browser()
+        logging.info("Shared headed browser closed after being idle.")
+
+    async def _close_browser(self):
+        try:
+            if self._context:
+                await self._context.close()
+            if self._browser:
+                await self._browser.close()
+            if self._playwright:
+                await self._playwright.stop()
+        except Exception as e:
+            logging.warning(f"Error closing shared headed browser: {e}")
+        self._playwright = self._browser = self._context = None
+
+    async def close(self):
+        """Closes the shared browser (app shutdown); call on the loop that uses it."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self._idle_task:
+            self._idle_task.cancel()
+            self._idle_task = None
+        await self._close_browser()
@@ -0,0 +1,187 @@
+import math
+import time
+import threading
+from collections import deque
+
+# Histogram buckets in seconds, wide enough for everything from a selector lookup to a 120s CAPTCHA wait
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+# Finer buckets for SQLite operations, which normally complete in milliseconds
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SAMPLE_WINDOW = 2000  # Recent observations kept per histogram series for percentiles and rates
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted sequence; None for an empty sequence."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Histogram:
+    """Cumulative bucket counts (for exposition) plus a bounded window of recent (timestamp, value) samples."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value, now):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.bucket_counts[i] += 1
+        self.samples.append((now, value))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, in-process registry of counters, gauges and histograms.
+    Recording is a dict update under a lock; all aggregation happens in the readers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        """Attaches a one-line description to a metric name (used by exporters)."""
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        now = time.time()
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value, now)
+
+    def counter_value(self, name, **labels) -> float:
+        """Sum of a counter across every label set that contains `labels`."""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(v for (n, key), v in self._counters.items() if n == name and wanted <= set(key))
+
+    def gauge_value(self, name, default=None, **labels):
+        with self._lock:
+            return self._gauges.get((name, _label_key(labels)), default)
+
+    def recent_samples(self, name, since=None, with_times=False, **labels) -> list:
+        """
+        Values observed for a histogram series, optionally only those recorded after `since` (epoch seconds).
+        With with_times=True the result holds (timestamp, value) pairs instead.
+        """
+        with self._lock:
+            hist = self._histograms.get((name, _label_key(labels)))
+            if hist is None:
+                return []
+            samples = [(t, v) for t, v in hist.samples if since is None or t >= since]
+        return samples if with_times else [v for _, v in samples]
+
+    def label_values(self, name, label) -> list:
+        """Distinct values of `label` seen on any series of the metric `name`."""
+        with self._lock:
+            keys = [key for (n, key) in list(self._counters) + list(self._gauges) + list(self._histograms) if n == name]
+        values = []
+        for key in keys:
+            value = dict(key).get(label)
+            if value is not None and value not in values:
+                values.append(value)
+        return values
+
+    def collect(self) -> dict:
+        """Consistent copy of every series, for exporters."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {
+                    key: (h.buckets, list(h.bucket_counts), h.count, h.sum)
+                    for key, h in self._histograms.items()
+                },
+                "help": dict(self._help),
+            }
+
+
+registry = MetricsRegistry()
+registry.describe("scrapes_total", "Completed scrape_post_data calls by outcome.")
+registry.describe("scrape_path_total", "Completed scrapes by the path that produced the views (direct, grid, headed_grid, none).")
+registry.describe("scrape_captcha_total", "Scrapes that hit a CAPTCHA.")
+registry.describe("scrape_duration_seconds", "End-to-end scrape_post_data duration.")
+registry.describe("scrape_phase_seconds", "Time spent per scrape phase.")
+registry.describe("browser_launches_total", "Chromium launches by mode.")
+registry.describe("batch_queue_depth", "URLs still waiting in the current batch.")
+registry.describe("browsers_open", "Chromium instances currently running (browser pool utilisation).")
+registry.describe("browser_pool_leased", "Pooled headless browsers currently lent to a scrape.")
+registry.describe("db_write_seconds", "SQLite write latency by operation.")
+registry.describe("db_errors_total", "SQLite errors by operation.")
+
+
+def throughput_summary(window_seconds=300) -> dict:
+    """
+    Rolls the registry up into the figures shown on the UI metrics panel:
+    posts/minute over the window, success/fallback/CAPTCHA rates, queue depth and ETA.
+    """
+    now = time.time()
+    recent = registry.recent_samples("scrape_duration_seconds", since=now - window_seconds, with_times=True)
+    posts_per_minute = 0.0
+    if recent:
+        # Measure from the start of the first scrape in the window so a fresh run is not diluted by idle time
+        first_start = min(t - v for t, v in recent)
+        elapsed = max(min(now - first_start, window_seconds), 1.0)
+        posts_per_minute = len(recent) / elapsed * 60.0
+
+    total = registry.counter_value("scrapes_total")
+    success = registry.counter_value("scrapes_total", outcome="success")
+    # Every path other than the direct page read is a fallback (grid, grid_cache, headed_grid, ...)
+    fallback = sum(registry.counter_value("scrape_path_total", path=path)
+                   for path in registry.label_values("scrape_path_total", "path") if path not in ("direct", "none"))
+    captcha = registry.counter_value("scrape_captcha_total")
+
+    queue_depth = registry.gauge_value("batch_queue_depth", default=0) or 0
+    eta_seconds = None
+    if queue_depth and posts_per_minute > 0:
+        eta_seconds = queue_depth / posts_per_minute * 60.0
+
+    phases = {}
+    for phase in registry.label_values("scrape_phase_seconds", "phase"):
+        values = registry.recent_samples("scrape_phase_seconds", phase=phase)
+        phases[phase] = (percentile(values, 50), percentile(values, 95))
+
+    return {
+        "posts_per_minute": posts_per_minute,
+        "total": total,
+        "success_rate": success / total if total else None,
+        "fallback_rate": fallback / total if total else None,
+        "captcha_rate": captcha / total if total else None,
+        "queue_depth": queue_depth,
+        "eta_seconds": eta_seconds,
+        "phases": phases,
+    }
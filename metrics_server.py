@@ -0,0 +1,129 @@
+import os
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import registry
+
+METRICS_PORT_ENV = "TIKTOK_METRICS_PORT"
+METRICS_HOST_ENV = "TIKTOK_METRICS_HOST"
+METRIC_PREFIX = "tiktok_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_items, extra=()) -> str:
+    items = list(label_items) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """Renders every registry series in the Prometheus text exposition format (version 0.0.4)."""
+    snapshot = registry.collect()
+    help_texts = snapshot["help"]
+    lines = []
+
+    def header(name, metric_type):
+        full_name = METRIC_PREFIX + name
+        if name in help_texts:
+            lines.append(f"# HELP {full_name} {help_texts[name]}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        return full_name
+
+    def grouped(series):
+        by_name = {}
+        for (name, labels), value in series.items():
+            by_name.setdefault(name, []).append((labels, value))
+        return sorted(by_name.items())
+
+    for name, entries in grouped(snapshot["counters"]):
+        full_name = header(name, "counter")
+        for labels, value in sorted(entries):
+            lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, entries in grouped(snapshot["gauges"]):
+        full_name = header(name, "gauge")
+        for labels, value in sorted(entries):
+            lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, entries in grouped(snapshot["histograms"]):
+        full_name = header(name, "histogram")
+        for labels, (buckets, bucket_counts, count, total) in sorted(entries, key=lambda e: e[0]):
+            for upper, bucket_count in zip(buckets, bucket_counts):
+                lines.append(f"{full_name}_bucket{_format_labels(labels, [('le', _format_value(float(upper)))])} {bucket_count}")
+            lines.append(f"{full_name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(float(total))}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Metrics endpoint: {self.address_string()} {format % args}")
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Serves /metrics on a daemon thread. Returns the server (an already running one is reused)."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logging.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="MetricsServer", daemon=True).start()
+        logging.info(f"Prometheus metrics endpoint listening on http://{host}:{_server.server_address[1]}/metrics")
+        return _server
+
+
+def start_metrics_server_from_env():
+    """Starts the endpoint if TIKTOK_METRICS_PORT is set (TIKTOK_METRICS_HOST defaults to 127.0.0.1)."""
+    port = os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+    try:
+        port = int(port)
+    except ValueError:
+        logging.error(f"Invalid {METRICS_PORT_ENV} value: {port!r}. Metrics endpoint disabled.")
+        return None
+    return start_metrics_server(port, os.environ.get(METRICS_HOST_ENV, "127.0.0.1"))
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
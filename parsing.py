@@ -0,0 +1,161 @@
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+PARSE_CACHE_SIZE = 16384
+
+# --- Counts: "12.3K", "1,2 M", "1.2万", "1 234 567", "3.4亿" ---
+
+# Digit groups split by , . or whitespace (including no-break spaces) are thousands groups only when they are
+# exactly three digits long; any other trailing [.,]digits part is the decimal fraction
+COUNT_RE = re.compile(
+    r"^\s*(\d{1,3}(?:[,.\s]\d{3})+(?!\d)|\d+)(?:[.,](\d+))?\s*([^\d\s.,]*)\s*$"
+)
+# With a K/M/B (or 万, ...) suffix the [.,] part is always the decimal fraction: "1.234K" is 1234, "1,2 M" 1200000
+SUFFIXED_COUNT_RE = re.compile(r"^\s*(\d+)(?:[.,](\d+))?\s*([^\d\s.,]+)\s*$")
+COUNT_SUFFIXES = {
+    "": 1,
+    "k": 1_000, "m": 1_000_000, "b": 1_000_000_000,
+    "mio": 1_000_000, "mrd": 1_000_000_000, # German
+    "千": 1_000, "万": 10_000, "萬": 10_000, "亿": 100_000_000, "億": 100_000_000,
+}
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_count(text):
+    match = SUFFIXED_COUNT_RE.match(text) or COUNT_RE.match(text)
+    if not match:
+        return None
+    whole, fraction, suffix = match.groups()
+    if suffix and re.search(r"[.,]", whole):
+        return None # "1.234.5K": separators are not thousands groups once a suffix is present
+    multiplier = COUNT_SUFFIXES.get(suffix.lower().rstrip("."))
+    if multiplier is None:
+        return None
+    value = int(re.sub(r"\D", "", whole))
+    if fraction:
+        value += int(fraction) / 10 ** len(fraction)
+    return int(round(value * multiplier))
+
+
+def parse_count(text: str) -> int | None:
+    """Parses a displayed count ('10K', '2.5M', '1,2 M', '1.2万', '1,234') into an integer; None if unrecognised."""
+    if not isinstance(text, str):
+        return None
+    count = _parse_count(text)
+    if count is None:
+        logging.debug(f"Could not parse count: '{text}'")
+    return count
+
+
+# --- Dates: "2023-03-18", "3-18", "Mar 18, 2023", "2 hours ago", "5d ago", "3天前", "just now" ---
+
+ISO_DATE_RE = re.compile(r"^\s*(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?")
+MONTH_DAY_RE = re.compile(r"^\s*(\d{1,2})-(\d{1,2})\s*$")
+# "Mar 18, 2023", "March 18", "18 Mar 2023"
+MONTH_NAME_RE = re.compile(
+    r"^\s*(?:(\d{1,2})\s+([A-Za-z]{3,9})\.?|([A-Za-z]{3,9})\.?\s+(\d{1,2}))(?:,?\s+(\d{4}))?\s*$"
+)
+MONTHS = {name: i for i, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+)}
+RELATIVE_RE = re.compile(
+    r"(\d+)\s*(seconds?|secs?|s|minutes?|mins?|m|hours?|hrs?|h|days?|d|weeks?|wks?|w|months?|mos?|years?|yrs?|y)\s+ago\b",
+    re.IGNORECASE
+)
+RELATIVE_CJK_RE = re.compile(r"(\d+)\s*(秒|分钟|分鐘|小时|小時|天|日|周|週|个月|個月|月|年)前")
+NOW_RE = re.compile(r"\b(just now|now)\b|刚刚|剛剛", re.IGNORECASE)
+YESTERDAY_RE = re.compile(r"\byesterday\b|昨天", re.IGNORECASE)
+
+RELATIVE_UNIT_SECONDS = {
+    "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "mo": 30 * 86400, "y": 365 * 86400,
+}
+CJK_UNITS = {
+    "秒": "s", "分钟": "m", "分鐘": "m", "小时": "h", "小時": "h", "天": "d", "日": "d",
+    "周": "w", "週": "w", "个月": "mo", "個月": "mo", "月": "mo", "年": "y",
+}
+
+
+def _english_unit(unit):
+    unit = unit.lower()
+    if unit.startswith("mo"):
+        return "mo"
+    if unit.startswith("mi") or unit == "m":
+        return "m"
+    return unit[0]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _date_spec(text):
+    """
+    The clock-independent reading of a date text, cached: ("absolute", datetime), ("month_day", month, day)
+    or ("ago", seconds). None when the text matches no TikTok date format.
+    """
+    match = ISO_DATE_RE.match(text)
+    if match:
+        year, month, day, hour, minute, second = (int(g) if g else 0 for g in match.groups())
+        try:
+            return ("absolute", datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc))
+        except ValueError:
+            return None
+    match = MONTH_DAY_RE.match(text)
+    if match:
+        month, day = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12 and 1 <= day <= 31:
+            return ("month_day", month, day)
+        return None
+    match = MONTH_NAME_RE.match(text)
+    if match:
+        day_first, month_second, month_first, day_second, year = match.groups()
+        month = MONTHS.get((month_second or month_first)[:3].lower())
+        day = int(day_first or day_second)
+        if month is not None:
+            if not 1 <= day <= 31:
+                return None
+            if not year:
+                return ("month_day", month, day)
+            try:
+                return ("absolute", datetime(int(year), month, day, tzinfo=timezone.utc))
+            except ValueError:
+                return None
+    match = RELATIVE_RE.search(text)
+    if match:
+        return ("ago", int(match.group(1)) * RELATIVE_UNIT_SECONDS[_english_unit(match.group(2))])
+    match = RELATIVE_CJK_RE.search(text)
+    if match:
+        return ("ago", int(match.group(1)) * RELATIVE_UNIT_SECONDS[CJK_UNITS[match.group(2)]])
+    if YESTERDAY_RE.search(text):
+        return ("ago", RELATIVE_UNIT_SECONDS["d"])
+    if NOW_RE.search(text):
+        return ("ago", 0)
+    return None
+
+
+def parse_post_date(text: str, now: datetime | None = None) -> datetime | None:
+    """
+    Parses a TikTok post date as displayed (ISO 'YYYY-MM-DD', 'M-D' for this year, 'Mar 18, 2023', relative
+    'N units ago' in English or Chinese) into a UTC datetime; None if unrecognised. `now` anchors relative dates.
+    """
+    if not isinstance(text, str):
+        return None
+    spec = _date_spec(text)
+    if spec is None:
+        return None
+    now = now or datetime.now(timezone.utc)
+    kind = spec[0]
+    if kind == "absolute":
+        return spec[1]
+    if kind == "ago":
+        return now - timedelta(seconds=spec[1])
+    _, month, day = spec
+    # 'M-D' is shown for posts from the current year; a date still ahead must be from last year
+    for year in (now.year, now.year - 1):
+        try:
+            candidate = datetime(year, month, day, tzinfo=timezone.utc)
+        except ValueError: # Feb 29 outside a leap year
+            continue
+        if candidate <= now:
+            return candidate
+    return None
+
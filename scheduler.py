@@ -0,0 +1,219 @@
+import os
+import math
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import database
+from export import parse_stored_datetime
+from metrics import registry
+
+# A global cap on scrapes per rolling hour (manual, batch and scheduled scrapes all count, via scrape_traces)
+DEFAULT_BUDGET_PER_HOUR = 60
+BUDGET_ENV_VAR = "TIKTOK_REFRESH_BUDGET_PER_HOUR"
+POLL_SECONDS = 60
+MAX_BATCH_PER_TICK = 20 # Keeps one scheduled batch short enough that manual work is not locked out for long
+CLAIM_RETRY_SECONDS = 3600 # A dispatched post that produces no new snapshot (failed scrape) is retried after this
+
+MIN_INTERVAL_SECONDS = 30 * 60
+MAX_INTERVAL_SECONDS = 7 * 24 * 3600
+# (max post age in hours, base refresh interval in seconds); older posts use MAX_INTERVAL_SECONDS
+AGE_INTERVALS = (
+    (24, 3600),
+    (7 * 24, 6 * 3600),
+    (30 * 24, 24 * 3600),
+)
+UNKNOWN_AGE_INTERVAL_SECONDS = 24 * 3600
+
+
+def _iso(dt):
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def budget_from_env():
+    value = os.environ.get(BUDGET_ENV_VAR)
+    if not value:
+        return DEFAULT_BUDGET_PER_HOUR
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logging.warning(f"Ignoring invalid {BUDGET_ENV_VAR}={value!r}; using {DEFAULT_BUDGET_PER_HOUR}.")
+        return DEFAULT_BUDGET_PER_HOUR
+
+
+def refresh_interval(views_per_hour, age_hours):
+    """
+    Seconds until a post should be re-scraped: fresh posts refresh more often, and the base interval for
+    the post's age shrinks logarithmically with its view velocity (~900 views/h halves it, ~9,900/h thirds it).
+    """
+    if age_hours is None:
+        interval = UNKNOWN_AGE_INTERVAL_SECONDS
+    else:
+        interval = next((seconds for max_age, seconds in AGE_INTERVALS if age_hours < max_age), MAX_INTERVAL_SECONDS)
+    if views_per_hour and views_per_hour > 0:
+        interval /= 1 + math.log10(1 + views_per_hour / 100)
+    return int(min(max(interval, MIN_INTERVAL_SECONDS), MAX_INTERVAL_SECONDS))
+
+
+def _views_per_hour(last_at, last_views, prev_at, prev_views):
+    if prev_at is None or last_views is None or prev_views is None:
+        return 0.0
+    last_dt, prev_dt = datetime.fromisoformat(last_at), datetime.fromisoformat(prev_at)
+    hours = (last_dt - prev_dt).total_seconds() / 3600
+    return max((last_views - prev_views) / hours, 0.0) if hours > 0 else 0.0
+
+
+class RefreshScheduler:
+    """
+    Re-scrapes tracked posts on a velocity- and age-dependent cadence. The queue lives in the
+    refresh_schedule table; each tick folds new snapshots into it, then hands the most urgent due posts
+    (bounded by the hourly budget) to `run_batch(links)`. `is_busy()` returning True skips the tick.
+    """
+
+    def __init__(self, run_batch, is_busy=None, budget_per_hour=None, poll_seconds=POLL_SECONDS):
+        self.run_batch = run_batch
+        self.is_busy = is_busy or (lambda: False)
+        self.budget_per_hour = budget_from_env() if budget_per_hour is None else budget_per_hour
+        self.poll_seconds = poll_seconds
+        self._watermark = None # Highest post_snapshots.id already folded into the schedule
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop = threading.Event() # Fresh event, so a previous thread still finishing a tick stays stopped
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="RefreshScheduler", daemon=True)
+        self._thread.start()
+        logging.info(f"Auto-refresh scheduler started (budget {self.budget_per_hour}/hour, poll {self.poll_seconds}s).")
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+        logging.info("Auto-refresh scheduler stopped.")
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Auto-refresh tick failed: {e}", exc_info=True)
+            stop.wait(self.poll_seconds)
+
+    def tick(self, now=None):
+        """Syncs the schedule and dispatches due posts. Returns the links handed to run_batch."""
+        now = now or datetime.now(timezone.utc)
+        self.sync_schedule(now)
+        if self.is_busy():
+            return []
+        remaining = self.budget_remaining(now)
+        registry.set_gauge("refresh_budget_remaining", remaining)
+        if remaining <= 0:
+            return []
+        due = self.claim_due(now, min(remaining, MAX_BATCH_PER_TICK))
+        if due:
+            registry.inc("refresh_dispatched_total", len(due))
+            logging.info(f"Auto-refresh: dispatching {len(due)} posts ({remaining} scrapes left this hour).")
+            self.run_batch(due)
+        return due
+
+    def sync_schedule(self, now):
+        """Adds untracked posts (due now) and reschedules every post that has snapshots newer than the last sync."""
+        conn = sqlite3.connect(database.DB_FILE)
+        try:
+            if self._watermark is None:
+                self._watermark = conn.execute("SELECT COALESCE(MAX(last_snapshot_id), 0) FROM refresh_schedule").fetchone()[0]
+            conn.execute("""
+                INSERT INTO refresh_schedule (video_id, link, next_due)
+                SELECT video_id, link, ? FROM tiktok_posts
+                WHERE video_id NOT IN (SELECT video_id FROM refresh_schedule)
+                  AND video_id NOT IN (SELECT video_id FROM scrape_failures WHERE tombstoned = 1)
+            """, (_iso(now),))
+            rows = conn.execute("""
+                WITH changed AS (
+                    SELECT video_id, MAX(id) AS last_id FROM post_snapshots WHERE id > ? GROUP BY video_id
+                ),
+                ranked AS (
+                    SELECT s.video_id, s.recorded_at, s.views,
+                           ROW_NUMBER() OVER (PARTITION BY s.video_id ORDER BY s.recorded_at DESC) AS rn
+                    FROM post_snapshots s JOIN changed c ON c.video_id = s.video_id
+                )
+                SELECT c.video_id, c.last_id, p.link, p.post_date, r1.recorded_at, r1.views, r2.recorded_at, r2.views
+                FROM changed c
+                JOIN tiktok_posts p ON p.video_id = c.video_id
+                JOIN ranked r1 ON r1.video_id = c.video_id AND r1.rn = 1
+                LEFT JOIN ranked r2 ON r2.video_id = c.video_id AND r2.rn = 2
+            """, (self._watermark,)).fetchall()
+
+            updates = []
+            for video_id, last_id, link, post_date, last_at, last_views, prev_at, prev_views in rows:
+                velocity = _views_per_hour(last_at, last_views, prev_at, prev_views)
+                posted = parse_stored_datetime(post_date)
+                age_hours = (now - posted).total_seconds() / 3600 if posted else None
+                interval = refresh_interval(velocity, age_hours)
+                next_due = datetime.fromisoformat(last_at) + timedelta(seconds=interval)
+                updates.append((video_id, link, _iso(next_due), velocity, interval, last_id))
+            conn.executemany("""
+                INSERT INTO refresh_schedule (video_id, link, next_due, priority, interval_seconds, last_snapshot_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    link = excluded.link, next_due = excluded.next_due, priority = excluded.priority,
+                    interval_seconds = excluded.interval_seconds, last_snapshot_id = excluded.last_snapshot_id
+            """, updates)
+            conn.commit()
+            if rows:
+                self._watermark = max(self._watermark, max(r[1] for r in rows))
+                logging.info(f"Auto-refresh: rescheduled {len(rows)} posts from new snapshots.")
+        except sqlite3.Error as e:
+            logging.error(f"Database error syncing refresh schedule: {e}", exc_info=True)
+        finally:
+            conn.close()
+
+    def budget_remaining(self, now):
+        """Hourly budget minus every scrape (of any kind) started in the last hour."""
+        conn = sqlite3.connect(database.DB_FILE)
+        try:
+            used = conn.execute(
+                "SELECT COUNT(*) FROM scrape_traces WHERE started_at >= ?", (_iso(now - timedelta(hours=1)),)
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Database error reading scrape budget: {e}", exc_info=True)
+            return 0
+        finally:
+            conn.close()
+        return max(self.budget_per_hour - used, 0)
+
+    def claim_due(self, now, limit):
+        """
+        Picks up to `limit` due posts, most urgent first: priority (views/hour) weighted by how overdue the
+        post is, so slow posts still get their turn. Claimed posts are pushed back by CLAIM_RETRY_SECONDS until
+        their new snapshot reschedules them.
+        """
+        conn = sqlite3.connect(database.DB_FILE)
+        try:
+            rows = conn.execute("""
+                SELECT r.video_id, r.link FROM refresh_schedule r
+                JOIN tiktok_posts p ON p.video_id = r.video_id
+                WHERE r.next_due <= ? AND r.link IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM scrape_failures f
+                      WHERE f.video_id = r.video_id AND (f.tombstoned = 1 OR f.next_retry_at > ?)
+                  )
+                ORDER BY (r.priority + 1) * (1 + (julianday(?) - julianday(r.next_due)) * 24) DESC
+                LIMIT ?
+            """, (_iso(now), _iso(now), _iso(now), int(limit))).fetchall()
+            retry_at = _iso(now + timedelta(seconds=CLAIM_RETRY_SECONDS))
+            conn.executemany("UPDATE refresh_schedule SET next_due = ? WHERE video_id = ?",
+                             [(retry_at, video_id) for video_id, _ in rows])
+            conn.commit()
+            return [link for _, link in rows]
+        except sqlite3.Error as e:
+            logging.error(f"Database error claiming due refreshes: {e}", exc_info=True)
+            return []
+        finally:
+            conn.close()
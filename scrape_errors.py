@@ -0,0 +1,92 @@
+import os
+import logging
+from datetime import timedelta
+
+# Structured error codes set by scraper.scrape_post_data in data["error_code"] (data["error"] stays human-readable)
+INVALID_URL = "invalid_url"
+VIDEO_UNAVAILABLE = "video_unavailable" # Deleted, removed or region-blocked video
+PRIVATE_VIDEO = "private_video"
+CAPTCHA = "captcha"
+TIMEOUT = "timeout"
+GRID_FALLBACK_FAILED = "grid_fallback_failed"
+PARTIAL_DATA = "partial_data"
+UNEXPECTED = "unexpected"
+UNRESOLVED_SHORT_LINK = "unresolved_short_link" # vm.tiktok.com / tiktok.com/t/ link that did not redirect to a post
+CANCELLED = "cancelled" # Operator cancelled the batch mid-scrape; traced, but never recorded as a post failure
+
+# Retrying these never helps: the post is tombstoned on the first failure
+PERMANENT_CODES = frozenset({INVALID_URL, VIDEO_UNAVAILABLE, PRIVATE_VIDEO})
+# The scrape worked and its data was saved (e.g. only saves or post_date missing); tagged on the trace only,
+# never counted as a failure, backed off or tombstoned
+NON_FAILURE_CODES = frozenset({PARTIAL_DATA})
+
+DEFAULT_MAX_ATTEMPTS = 5
+MAX_ATTEMPTS_ENV_VAR = "TIKTOK_SCRAPE_MAX_ATTEMPTS"
+
+
+class RetryPolicy:
+    """Exponential backoff: base_seconds * factor ** (attempts - 1), capped at max_seconds."""
+
+    def __init__(self, base_seconds, factor=2.0, max_seconds=24 * 3600, max_attempts=None):
+        self.base_seconds = base_seconds
+        self.factor = factor
+        self.max_seconds = max_seconds
+        self.max_attempts = max_attempts # None -> max_attempts_from_env()
+
+    def delay(self, attempts) -> float:
+        return min(self.base_seconds * self.factor ** max(attempts - 1, 0), self.max_seconds)
+
+
+RETRY_POLICIES = {
+    TIMEOUT: RetryPolicy(5 * 60, max_seconds=6 * 3600),
+    UNEXPECTED: RetryPolicy(10 * 60, max_seconds=12 * 3600),
+    CAPTCHA: RetryPolicy(30 * 60, max_seconds=12 * 3600),
+    GRID_FALLBACK_FAILED: RetryPolicy(30 * 60),
+    UNRESOLVED_SHORT_LINK: RetryPolicy(30 * 60, max_attempts=3),
+}
+
+
+def max_attempts_from_env():
+    value = os.environ.get(MAX_ATTEMPTS_ENV_VAR)
+    if not value:
+        return DEFAULT_MAX_ATTEMPTS
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        logging.warning(f"Ignoring invalid {MAX_ATTEMPTS_ENV_VAR}={value!r}; using {DEFAULT_MAX_ATTEMPTS}.")
+        return DEFAULT_MAX_ATTEMPTS
+
+
+def classify_error(error_text):
+    """Best-effort code for a free-text error (results stored before error codes existed). None for no error."""
+    if not error_text:
+        return None
+    text = error_text.lower()
+    if "invalid tiktok video url" in text:
+        return INVALID_URL
+    if "private" in text:
+        return PRIVATE_VIDEO
+    if "unavailable" in text or "couldn't find" in text:
+        return VIDEO_UNAVAILABLE
+    if "captcha" in text:
+        return CAPTCHA
+    if "grid" in text:
+        return GRID_FALLBACK_FAILED
+    if "timed out" in text or "timeout" in text:
+        return TIMEOUT
+    if "missing data points" in text:
+        return PARTIAL_DATA
+    return UNEXPECTED
+
+
+def retry_decision(error_code, attempts, now):
+    """
+    What to do after the `attempts`-th consecutive failure with `error_code`.
+    Returns (next_retry_at, tombstone): a datetime to retry at, or (None, True) when the post should be given up on.
+    """
+    if error_code in PERMANENT_CODES:
+        return None, True
+    policy = RETRY_POLICIES.get(error_code, RETRY_POLICIES[UNEXPECTED])
+    if attempts >= (policy.max_attempts or max_attempts_from_env()):
+        return None, True
+    return now + timedelta(seconds=policy.delay(attempts)), False
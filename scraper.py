@@ -1,14 +1,25 @@
 import os
-import re
 import sys
 import json
 import asyncio
 import logging
 import random
-from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from dateutil.parser import parse as parse_date
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from cookie_store import cookie_store
+from tracing import ScrapeTrace, NULL_TRACE
+from database import setup_database
+from metrics import registry
+from metrics_server import start_metrics_server_from_env
+import scrape_errors
+from short_links import cached_resolution, is_short_link, resolve_short_link
+from tiktok_urls import sanitize_url, canonicalize, VIDEO_ID_RE
+from grid_cache import grid_cache, video_timestamp
+from headed_session import EscalationBudget
+from browser_pool import BrowserPool
+from selector_registry import selector_registry
+from parsing import parse_count, parse_post_date
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -16,7 +27,10 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(me
 SCRIPT_DIR = Path(__file__).parent.absolute()
 TIKTOK_SESSION_DATA_DIR = "session_data"
 TIKTOK_BROWSER_USER_DATA_DIR = "browser_user_data"
-COOKIE_FILE = Path(SCRIPT_DIR) / "tiktok_cookies.json"
+
+# Async callables run on every new browser context before any page is opened
+# (e.g. the offline benchmark routes tiktok.com to its fixture server from here).
+CONTEXT_SETUP_HOOKS = []
 
 __all__ = [
     'TIKTOK_SESSION_DATA_DIR',
@@ -24,19 +38,16 @@ __all__ = [
     'get_tiktok_video_id_from_url'
 ]
 
-def sanitize_url(url: str) -> str:
-    """Cleans up a URL string by removing extra spaces and stripping."""
-    if not isinstance(url, str):
-        return ""
-    return re.sub(r'\s+@\s+', "@", url).strip()
-
 def get_tiktok_video_id_from_url(url: str) -> str | None:
-    """Extracts the video ID from various TikTok URL formats."""
-    clean_url = sanitize_url(url)
-    match = re.search(r'/video/(\d+)', clean_url)
-    if not match:
-        match = re.search(r'(?:tiktok\.com/@[\w.]+/video/|vm\.tiktok\.com/|tiktok\.com/t/)(\d+)', clean_url)
-    return match.group(1) if match else None
+    """
+    Extracts the video ID from a TikTok post URL. Short links (vm.tiktok.com, tiktok.com/t/) carry an opaque
+    code rather than the ID, so theirs comes from the short-link cache (None until resolved; see short_links.py).
+    """
+    video_id = canonicalize(url)[0]
+    if video_id:
+        return video_id
+    resolved = cached_resolution(sanitize_url(url))
+    return resolved[1] if resolved else None
 
 def build_profile_url(username: str) -> str:
     """Constructs a TikTok profile URL from a username."""
@@ -44,76 +55,16 @@ def build_profile_url(username: str) -> str:
         username = f"@{username}"
     return f"https://www.tiktok.com/{username.replace(' ', '')}"
 
-def parse_count(text: str) -> int | None:
-    """Parses a string count (e.g., '10K', '2.5M') into an integer."""
-    if not isinstance(text, str):
-        return None
-    text = text.upper().replace(',', '').strip()
-    multiplier = 1
-    if text.endswith('K'):
-        multiplier = 1_000
-        text = text[:-1]
-    elif text.endswith('M'):
-        multiplier = 1_000_000
-        text = text[:-1]
-    elif text.endswith('B'):
-        multiplier = 1_000_000_000
-        text = text[:-1]
-    try:
-        return int(float(text) * multiplier)
-    except (ValueError, TypeError):
-        logging.debug(f"Could not parse count: '{text}'")
-        return None
-
-def parse_relative_time(relative_time_str: str) -> datetime | None:
-    """Parses relative time strings (e.g., '2 hours ago', '3 days ago') to datetime."""
-    now = datetime.now(timezone.utc)
-    if "now" in relative_time_str.lower():
-        return now
-    match = re.search(r'(\d+)\s*(second|minute|hour|day|week|month|year)s?\s*ago', relative_time_str, re.IGNORECASE)
-    if match:
-        num, unit = match.groups()
-        num = int(num)
-        if "second" in unit:
-            return now - timedelta(seconds=num)
-        elif "minute" in unit:
-            return now - timedelta(minutes=num)
-        elif "hour" in unit:
-            return now - timedelta(hours=num)
-        elif "day" in unit:
-            return now - timedelta(days=num)
-        elif "week" in unit:
-            return now - timedelta(weeks=num)
-        elif "month" in unit:
-            return now - timedelta(days=num*30)
-        elif "year" in unit:
-            return now - timedelta(days=num*365)
-    return None
-
 async def save_cookies(context):
-    """Saves browser cookies to a JSON file."""
-    try:
-        cookies = await context.cookies()
-        with open(COOKIE_FILE, 'w') as f:
-            json.dump(cookies, f, indent=2)
-        logging.info(f"Cookies saved to {COOKIE_FILE}")
-    except Exception as e:
-        logging.warning(f"Failed to save cookies: {e}")
+    """Hands the context's cookies to the shared cookie store (written to disk only if they changed)."""
+    await cookie_store.capture_from_context(context)
 
 async def load_cookies(context):
-    """Loads browser cookies from a JSON file."""
-    if not COOKIE_FILE.exists():
-        logging.info("Cookie file not found. Starting with fresh session.")
-        return False
-    try:
-        with open(COOKIE_FILE, 'r') as f:
-            cookies = json.load(f)
-        await context.add_cookies(cookies)
-        logging.info(f"Cookies loaded from {COOKIE_FILE}")
-        return True
-    except Exception as e:
-        logging.warning(f"Failed to load cookies: {e}. Session will start fresh.")
-        return False
+    """Loads browser cookies from the shared in-memory cookie store."""
+    loaded = await cookie_store.apply_to_context(context)
+    if loaded:
+        logging.info("Cookies applied to browser context from cookie store.")
+    return loaded
 
 async def apply_stealth(context):
     """Applies Playwright stealth techniques to avoid bot detection."""
@@ -151,16 +102,149 @@ async def is_captcha_present(page):
             continue
     return False
 
+# Page texts (lowercase) TikTok shows instead of a video; they never go away on retry
+UNAVAILABLE_PAGE_MARKERS = {
+    scrape_errors.PRIVATE_VIDEO: ("this video is private", "this account is private"),
+    scrape_errors.VIDEO_UNAVAILABLE: ("video currently unavailable", "this video is unavailable",
+                                      "couldn't find this account", "video not available"),
+}
+
+async def detect_unavailable_post(page):
+    """Returns scrape_errors.PRIVATE_VIDEO / VIDEO_UNAVAILABLE if the page says the video can't be shown, else None."""
+    try:
+        text = (await page.inner_text("body", timeout=5000)).lower()
+    except Exception as e:
+        logging.debug(f"Could not read page text for availability check: {e}")
+        return None
+    for code, markers in UNAVAILABLE_PAGE_MARKERS.items():
+        if any(marker in text for marker in markers):
+            return code
+    return None
+
+def _set_error_code(data, code):
+    """Keeps the first (most specific) error code recorded for a scrape."""
+    data["error_code"] = data["error_code"] or code
+
+# data field -> selector chain extracted from the post page
+POST_FIELD_CHAINS = {
+    "views": "post_views",
+    "likes": "post_likes",
+    "comments": "post_comments",
+    "shares": "post_shares",
+    "saves": "post_saves",
+    "post_date": "post_date",
+}
+
 class GridTimeoutError(Exception):
     """Custom exception for when grid scraping times out."""
     pass
 
-async def scrape_views_and_date_from_grid(page, video_id, max_retries=3):
+# Every grid tile on a profile page, in DOM (newest-first) order, plus the scroll position: one round trip.
+# Takes the "grid_views" selector chain as a CSS selector list.
+GRID_STATE_JS = """
+viewsSelector => ({
+    tiles: Array.from(document.querySelectorAll('a[href*="/video/"]')).map(a => {
+        const views = a.querySelector(viewsSelector);
+        return [a.getAttribute('href'), views ? views.innerText : null];
+    }),
+    scrollY: window.scrollY,
+    scrollHeight: document.documentElement.scrollHeight,
+    viewportHeight: window.innerHeight,
+})
+"""
+GRID_PINNED_TILES = 3 # Pinned posts lead the grid out of date order; age estimates skip them
+GRID_MAX_SCROLLS = 40
+GRID_MAX_JUMP_VIEWPORTS = 6
+GRID_STALL_LIMIT = 3 # Scrolls in a row that load nothing new before the grid counts as exhausted
+
+# navigate_grid_to_video outcomes
+GRID_FOUND = "found"
+GRID_ABSENT = "absent" # The grid is loaded past the target's age and the tile is not there
+GRID_EXHAUSTED = "exhausted"
+
+async def _grid_state(page):
+    """([(video_id, views or None)] in grid order, scroll_y, scroll_height, viewport_height)."""
+    state = await page.evaluate(GRID_STATE_JS, selector_registry.css("grid_views"))
+    tiles, seen = [], set()
+    for href, views_text in state["tiles"]:
+        match = VIDEO_ID_RE.search(href or "")
+        if match and match.group(1) not in seen:
+            seen.add(match.group(1))
+            tiles.append((match.group(1), parse_count(views_text)))
+    return tiles, state["scrollY"], state["scrollHeight"], state["viewportHeight"]
+
+async def harvest_grid_views(page):
+    """video_id -> views for every tile currently loaded in a profile grid."""
+    try:
+        tiles = (await _grid_state(page))[0]
+    except Exception as e:
+        logging.debug(f"Grid harvest failed: {e}")
+        return {}
+    return {video_id: views for video_id, views in tiles if views is not None}
+
+def _grid_jump(tiles, scroll_height, viewport_height, target_ts):
+    """Pixels to scroll next: the target's age gap over the loaded grid's seconds-per-pixel, within limits."""
+    dated = [video_timestamp(video_id) for video_id, _ in tiles[GRID_PINNED_TILES:]] or [None]
+    newest, oldest = dated[0], dated[-1]
+    jump = 2 * viewport_height
+    if newest and oldest and target_ts and newest > oldest and scroll_height > 0:
+        seconds_per_px = (newest - oldest) / scroll_height
+        jump = (oldest - target_ts) / seconds_per_px
+    return int(min(max(jump, viewport_height), GRID_MAX_JUMP_VIEWPORTS * viewport_height))
+
+async def navigate_grid_to_video(page, video_id, owner=None, max_scrolls=GRID_MAX_SCROLLS, trace=None):
+    """
+    Scrolls a profile grid until the tile for `video_id` is loaded. Grids list posts newest first and IDs
+    encode creation time, so each scroll is sized from the remaining age gap (or jumps straight to a depth
+    remembered for this owner), and the search stops as soon as the grid has loaded posts older than the
+    target without it. Every state read is harvested into grid_cache.
+    Returns (views or None, GRID_FOUND | GRID_ABSENT | GRID_EXHAUSTED).
+    """
+    trace = trace or NULL_TRACE
+    target_id, target_ts = int(video_id), video_timestamp(video_id)
+    stalls, last_height = 0, None
+    for step in range(max_scrolls + 1):
+        with trace.span("grid_state", step=step):
+            tiles, scroll_y, scroll_height, viewport_height = await _grid_state(page)
+        grid_cache.store(owner, {vid: views for vid, views in tiles if views is not None})
+        loaded = dict(tiles)
+        if video_id in loaded:
+            registry.observe("grid_scrolls", step, buckets=(0, 1, 2, 4, 8, 16, 32, 64))
+            return loaded[video_id], GRID_FOUND
+
+        ordered = [int(vid) for vid, _ in tiles[GRID_PINNED_TILES:]]
+        if ordered:
+            grid_cache.remember_depth(owner, min(ordered), scroll_y)
+            if min(ordered[-GRID_PINNED_TILES:]) < target_id:
+                logging.info(f"Grid for video ID {video_id} loaded past its post date without it; stopping after {step} scrolls.")
+                return None, GRID_ABSENT
+
+        stalls = stalls + 1 if scroll_height == last_height else 0
+        if stalls >= GRID_STALL_LIMIT or step == max_scrolls:
+            break
+        last_height = scroll_height
+
+        depth = grid_cache.known_depth(owner, video_id)
+        if depth is not None and depth > scroll_y + viewport_height:
+            jump = depth - scroll_y # Remembered from an earlier visit; lazy loading caps it at the loaded height
+        else:
+            jump = _grid_jump(tiles, scroll_height, viewport_height, target_ts)
+        with trace.span("grid_scroll", step=step):
+            await page.mouse.wheel(0, jump)
+            await asyncio.sleep(random.uniform(0.8, 1.6)) # Lets the next page of tiles load
+    logging.warning(f"Grid navigation for video ID {video_id} gave up at {len(tiles)} tiles.")
+    return None, GRID_EXHAUSTED
+
+async def scrape_views_and_date_from_grid(page, video_id, max_retries=3, trace=None, owner=None):
     """
     Scrapes ONLY video views from the user's profile grid.
     This is used as a fallback if direct scraping from the video page fails.
+    The grid is walked by navigate_grid_to_video; with `owner`, every tile seen on the way is harvested
+    into grid_cache for later fallbacks.
     Raises GridTimeoutError if all retries time out.
     """
+    trace = trace or NULL_TRACE
+
     async def simulate_human_behavior_on_profile():
         """Simulates human-like scrolling and mouse movements on a profile page."""
         await page.mouse.move(random.randint(100, 600), random.randint(100, 400), steps=random.randint(5, 25))
@@ -177,23 +261,39 @@ async def scrape_views_and_date_from_grid(page, video_id, max_retries=3):
     for attempt in range(max_retries):
         try:
             logging.info(f"Grid scrape attempt {attempt+1}/{max_retries} for video ID {video_id}")
-            await simulate_human_behavior_on_profile()
+            if attempt == 0: # Later attempts continue from where the previous one scrolled to
+                with trace.span("grid_humanize", attempt=attempt + 1):
+                    await simulate_human_behavior_on_profile()
 
+            with trace.span("grid_navigate", attempt=attempt + 1):
+                views, outcome = await navigate_grid_to_video(page, video_id, owner, trace=trace)
+            if views is not None:
+                logging.info(f"Extracted via grid: views={views}")
+                return views, None
+            if outcome == GRID_ABSENT:
+                return None, None # More scrolling cannot find a post the grid has already passed
+            if outcome == GRID_EXHAUSTED:
+                with trace.span("grid_backoff", attempt=attempt + 1):
+                    await asyncio.sleep(2 ** attempt)
+                continue
+
+            # The tile is loaded but its view count did not parse: fall back to per-element extraction
             grid_selector = f'a[href*="/video/{video_id}"]'
-            await page.wait_for_selector(grid_selector, timeout=25000)
-            grid_item = await page.query_selector(grid_selector)
+            with trace.span("grid_wait_selector", attempt=attempt + 1):
+                await page.wait_for_selector(grid_selector, timeout=25000)
+                grid_item = await page.query_selector(grid_selector)
 
             if not grid_item:
                 logging.warning(f"Grid item for video ID {video_id} not found on attempt {attempt+1}. Scrolling and retrying.")
-                await page.mouse.wheel(0, random.randint(800, 1500))
-                await asyncio.sleep(random.uniform(3, 5))
+                with trace.span("grid_scroll", attempt=attempt + 1):
+                    await page.mouse.wheel(0, random.randint(800, 1500))
+                    await asyncio.sleep(random.uniform(3, 5))
                 continue
 
             # --- Extract Views ---
-            views_elem = await grid_item.query_selector('strong[data-e2e="video-views"]') or \
-                         await grid_item.query_selector('strong[data-e2e="video-play-count"]') or \
-                         await grid_item.query_selector('.tiktok-grid-item-views')
-            views_text = await views_elem.inner_text() if views_elem else None
+            with trace.span("grid_extract", attempt=attempt + 1):
+                views_elem = await selector_registry.query(grid_item, "grid_views")
+                views_text = await views_elem.inner_text() if views_elem else None
             views = parse_count(views_text)
 
             logging.debug(f"DEBUG: Views found in grid scrape attempt {attempt+1}: {views}")
@@ -203,46 +303,88 @@ async def scrape_views_and_date_from_grid(page, video_id, max_retries=3):
                 return views, None # Always return None for date, as it's not scraped here
             else:
                 logging.warning(f"Could not extract views from grid on attempt {attempt+1}. Views: {views}. Retrying.")
-                await asyncio.sleep(2 ** attempt)
+                with trace.span("grid_backoff", attempt=attempt + 1):
+                    await asyncio.sleep(2 ** attempt)
                 continue
 
         except PlaywrightTimeoutError:
             logging.warning(f"Grid scrape timeout (attempt {attempt+1}) for video ID {video_id}.")
             if attempt < max_retries - 1:
-                await asyncio.sleep(2 ** attempt)
+                with trace.span("grid_backoff", attempt=attempt + 1):
+                    await asyncio.sleep(2 ** attempt)
             else:
                 raise GridTimeoutError(f"Grid scrape timed out after {max_retries} attempts for video ID {video_id}")
         except Exception as e:
             logging.error(f"Grid scrape failed unexpectedly on attempt {attempt+1}: {e}", exc_info=True)
             if attempt < max_retries - 1:
-                await asyncio.sleep(2 ** attempt)
+                with trace.span("grid_backoff", attempt=attempt + 1):
+                    await asyncio.sleep(2 ** attempt)
             continue
 
     logging.error(f"Failed to scrape views from grid after {max_retries} attempts for video ID {video_id}.")
     return None, None # If all retries fail, return None for views and None for date
 
 
-async def _launch_browser_session(p, headless_mode: bool, url: str):
+async def _setup_context(browser, trace=None):
+    """New browser context with stealth, cookies and CONTEXT_SETUP_HOOKS applied."""
+    trace = trace or NULL_TRACE
+    with trace.span("context_setup"):
+        context = await browser.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.88 Safari/537.36",
+            viewport={"width": 1280, "height": 800}
+        )
+        try:
+            await apply_stealth(context)
+            await load_cookies(context)
+            for hook in CONTEXT_SETUP_HOOKS:
+                await hook(context)
+        except BaseException:
+            await context.close() # The browser outlives this call (pooled or shared), so do not leak the context
+            raise
+    return context
+
+# A scrape borrows a pooled headless browser, opens its own context and hands the browser back.
+# Headed mode is a shared, rationed member of the same pool: one visible browser per process, reused by
+# every escalation (CAPTCHA solving, headed grid retry), and at most escalation_budget.per_hour per hour
+browser_pool = BrowserPool(_setup_context)
+headed_browser = browser_pool.headed
+escalation_budget = EscalationBudget()
+
+async def _escalate_to_headed(browser, context, url, trace):
+    """
+    Closes this scrape's headless context, returns its browser to the pool and borrows a page of the
+    shared headed browser at `url`. Returns (context, page); release the page with headed_browser.release().
+    """
+    with trace.span("browser_close"):
+        try:
+            if context: await context.close()
+        finally:
+            if browser: browser_pool.release(browser)
+    with trace.span("headed_wait"): # Another post may be holding the headed window
+        return await headed_browser.acquire(url, trace)
+
+async def _open_session(browser, url: str, trace=None):
     """
-    Helper function to launch a browser session, apply stealth, load cookies,
-    and navigate to a URL. Returns (browser, context, page).
+    Opens a new context (stealth, cookies) and page on a pooled headless `browser` and navigates to `url`.
+    Returns (context, page).
     """
-    browser_args = ["--disable-blink-features=AutomationControlled"]
-
-    browser = await p.chromium.launch(headless=headless_mode, args=browser_args)
-    context = await browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.88 Safari/537.36",
-        viewport={"width": 1280, "height": 800}
-    )
-    await apply_stealth(context)
-    await load_cookies(context)
-    page = await context.new_page()
-
-    logging.info(f"Navigating to URL: {url} (Headed: {not headless_mode})")
-    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-    await asyncio.sleep(random.uniform(3, 6))
+    trace = trace or NULL_TRACE
+    context = await _setup_context(browser, trace)
+    try:
+        with trace.span("context_setup"):
+            page = await context.new_page()
+        trace.attach_page(page)
+
+        logging.info(f"Navigating to URL: {url}")
+        with trace.span("goto"):
+            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        with trace.span("post_goto_sleep"):
+            await asyncio.sleep(random.uniform(3, 6))
+    except BaseException:
+        await context.close() # The caller never sees this context; the pooled browser goes back without it
+        raise
     
-    return browser, context, page
+    return context, page
 
 
 async def scrape_post_data(url: str, app_instance=None):
@@ -262,22 +404,32 @@ async def scrape_post_data(url: str, app_instance=None):
         "post_date": None, # post_date will ONLY be set by direct scrape
         "owner": None,
         "engagement_rate": None,
-        "error": None
+        "error": None,
+        "error_code": None # One of the scrape_errors codes whenever "error" is set
     }
     
     clean_url = sanitize_url(url)
+    if is_short_link(clean_url):
+        # Plain HTTP redirect lookup (cached in SQLite); no browser needed to learn the video ID
+        resolved_url = await asyncio.to_thread(resolve_short_link, clean_url)
+        if not resolved_url:
+            data["error"] = f"Could not resolve short link {clean_url} to a TikTok video URL."
+            data["error_code"] = scrape_errors.UNRESOLVED_SHORT_LINK
+            logging.error(data["error"])
+            return data
+        logging.info(f"Short link {clean_url} resolved to {resolved_url}")
+        clean_url = resolved_url
     data["url"] = clean_url
 
-    video_id = get_tiktok_video_id_from_url(clean_url)
+    video_id, owner, _ = canonicalize(clean_url)
     if not video_id:
         data["error"] = "Invalid TikTok video URL format. Could not extract video ID."
+        data["error_code"] = scrape_errors.INVALID_URL
         logging.error(data["error"])
         return data
     data["video_id"] = video_id
 
-    owner_match = re.search(r'/@([^/]+)/video/\d+', clean_url)
-    if owner_match:
-        data["owner"] = owner_match.group(1).replace(' ', '')
+    data["owner"] = owner
     
     logging.info(f"Attempting to scrape data for URL: {clean_url}")
     logging.info(f"Detected Video ID: {video_id}")
@@ -287,30 +439,35 @@ async def scrape_post_data(url: str, app_instance=None):
     browser = None
     context = None
     page = None
-    p_instance = None
+    headed_page = None # Borrowed from headed_browser; the shared context and browser outlive this scrape
+    trace = ScrapeTrace(clean_url, video_id)
 
     try:
-        p_instance = await async_playwright().start()
-
-        # --- Initial Launch in HEADLESS mode ---
-        browser, context, page = await _launch_browser_session(p_instance, headless_mode=True, url=clean_url)
+        # --- Initial session on a pooled HEADLESS browser ---
+        browser = await browser_pool.acquire(trace)
+        context, page = await _open_session(browser, clean_url, trace)
 
         # --- CAPTCHA Check (and potential headed relaunch) ---
-        if await is_captcha_present(page):
-            logging.warning("CAPTCHA detected in headless mode. Relaunching in HEADED mode for manual solving.")
+        with trace.span("captcha_check"):
+            captcha_present = await is_captcha_present(page)
+        if captcha_present:
+            data["error_code"] = scrape_errors.CAPTCHA
+            trace.captcha = True
+            if not escalation_budget.try_acquire("captcha"):
+                data["error"] = "CAPTCHA detected; headed escalation budget for this hour is used up. Will retry later."
+                logging.error(data["error"])
+                return data
+            logging.warning("CAPTCHA detected in headless mode. Switching to the shared HEADED browser for manual solving.")
             data["error"] = "CAPTCHA detected. Please solve manually in the popped-out browser."
-            
-            # Close the current headless session
-            if context: await context.close()
-            if browser: await browser.close()
-            
-            # Launch new browser in HEADED mode for CAPTCHA
-            browser, context, page = await _launch_browser_session(p_instance, headless_mode=False, url=clean_url)
+
+            context, page = await _escalate_to_headed(browser, context, clean_url, trace)
+            browser, headed_page = None, page
 
             logging.info("Browser is visible. Please solve any CAPTCHA manually. Script will wait for 120 seconds.")
             if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
                  app_instance.set_status("CAPTCHA detected! Please solve in browser. Waiting 120s...")
-            await asyncio.sleep(120)
+            with trace.span("captcha_wait"):
+                await asyncio.sleep(120)
             logging.info("Continuing after CAPTCHA wait...")
 
             if await is_captcha_present(page):
@@ -328,87 +485,47 @@ async def scrape_post_data(url: str, app_instance=None):
         
         # Wait for specific elements to ensure page is loaded, or networkidle
         try:
-            await page.wait_for_selector('[data-e2e="like-count"]', timeout=20000)
-            await page.wait_for_load_state("networkidle", timeout=10000)
+            with trace.span("wait_like_count"):
+                await page.wait_for_selector(selector_registry.css("post_likes"), timeout=20000)
+            with trace.span("networkidle"):
+                await page.wait_for_load_state("networkidle", timeout=10000)
         except PlaywrightTimeoutError:
+            # Deleted/private videos never render the counters; fail fast instead of running the grid fallback
+            unavailable_code = await detect_unavailable_post(page)
+            if unavailable_code:
+                data["error"] = f"Video is not available ({unavailable_code.replace('_', ' ')})."
+                data["error_code"] = unavailable_code
+                logging.warning(f"{data['error']} URL: {clean_url}")
+                return data
             logging.warning("Main video page interaction elements did not load quickly. Proceeding with available content.")
 
-        try:
-            # Views: More robust selectors for direct scrape
-            views_elem = await page.query_selector('strong[data-e2e="feed-video-play-count"]') or \
-                         await page.query_selector('strong[data-e2e="video-play-count"]') or \
-                         await page.query_selector('.video-details-container .view-count') or \
-                         await page.query_selector('span.tiktok-share-counter-text[data-e2e="undefined-count"]')
-            if views_elem:
-                views_text = await views_elem.inner_text()
-                data["views"] = parse_count(views_text)
-            logging.info(f"Direct scrape - Views: {data['views']}")
-
-
-            # Likes
-            likes_elem = await page.query_selector('strong[data-e2e="like-count"]')
-            data["likes"] = parse_count(await likes_elem.inner_text()) if likes_elem else None
-            logging.info(f"Direct scrape - Likes: {data['likes']}")
-
-
-            # Comments
-            comments_elem = await page.query_selector('strong[data-e2e="comment-count"]')
-            data["comments"] = parse_count(await comments_elem.inner_text()) if comments_elem else None
-            logging.info(f"Direct scrape - Comments: {data['comments']}")
-
-
-            # Shares
-            shares_elem = await page.query_selector('strong[data-e2e="share-count"]')
-            data["shares"] = parse_count(await shares_elem.inner_text()) if shares_elem else None
-            logging.info(f"Direct scrape - Shares: {data['shares']}")
-
-
-            # Saves
-            saves_elem = await page.query_selector('strong[data-e2e="undefined-count"]') or \
-                         await page.query_selector('strong[data-e2e="collect-count"]') or \
-                         await page.query_selector('strong[data-e2e="favourite-count"]')
-            data["saves"] = parse_count(await saves_elem.inner_text()) if saves_elem else None
-            logging.info(f"Direct scrape - Saves: {data['saves']}")
-
-            # Post Date: ONLY direct page elements (removed og:video:release_date)
-            post_date_found_direct_scrape = False
-            logging.info("Attempting to get post date from direct page elements (excluding meta tag).")
-            # Combined selectors for post date as per your provided script and previous discussions
-            date_span_elem = await page.query_selector('p[data-e2e="video-desc"] + div span:last-child') or \
-                             await page.query_selector('span.video-info-source-text-date') or \
-                             await page.query_selector('span.tiktok-video-publish-date') or \
-                             await page.query_selector('span.tiktok-share-desc-text span:last-child') or \
-                             await page.query_selector('xpath=/html/body/div[1]/div[2]/div[2]/div/div[2]/div[1]/div[1]/div[2]/div[1]/div/a[2]/span[2]/span[3]')
-            
-            if date_span_elem:
-                raw_text = await date_span_elem.inner_text()
-                raw_text = raw_text.strip()
-                post_date_dt = None
-                try:
-                    # Attempt to parse as a full date first (e.g., "2023-03-18")
-                    if re.match(r'^\d{4}-\d{2}-\d{2}$', raw_text):
-                        post_date_dt = parse_date(raw_text)
-                    # Then try relative dates (e.g., "2 hours ago")
-                    elif 'ago' in raw_text.lower():
-                        post_date_dt = parse_relative_time(raw_text)
-                    # Then try month-day format (e.g., "3-18")
-                    elif re.match(r'^\d{1,2}-\d{1,2}$', raw_text):
-                        year = datetime.now().year
-                        post_date_dt = parse_date(f"{year}-{raw_text}", fuzzy=True)
-                    else: # Fallback to general parsing
-                        post_date_dt = parse_date(raw_text, fuzzy=True)
-                    
+        with trace.span("extract_fields"):
+            try:
+                # All field selector chains (tiktok_selectors.json) resolved in one page round trip, parsed here
+                texts = await selector_registry.extract_texts(page, POST_FIELD_CHAINS.values())
+                for field, chain in POST_FIELD_CHAINS.items():
+                    if field != "post_date":
+                        data[field] = parse_count(texts[chain])
+                        logging.info(f"Direct scrape - {field.title()}: {data[field]}")
+
+                # Post Date: ONLY direct page elements (removed og:video:release_date)
+                logging.info("Attempting to get post date from direct page elements (excluding meta tag).")
+                if texts["post_date"] is not None:
+                    raw_text = texts["post_date"].strip()
+                    post_date_dt = parse_post_date(raw_text)
                     if post_date_dt:
                         data["post_date"] = post_date_dt.strftime('%Y-%m-%d %H:%M:%S (UTC)')
                         logging.info(f"Extracted post_date from page element: {data['post_date']}")
-                        post_date_found_direct_scrape = True
-                except Exception as e:
-                    logging.warning(f"Direct scrape date parsing failed for '{raw_text}': {e}")
-            else:
-                logging.warning("No direct page element found for post date.")
-            
-        except Exception as e:
-            logging.warning(f"Error during direct scraping of elements: {e}")
+                    else:
+                        logging.warning(f"Unrecognised post date format: '{raw_text}'")
+                else:
+                    logging.warning("No direct page element found for post date.")
+
+            except Exception as e:
+                logging.warning(f"Error during direct scraping of elements: {e}")
+
+        if data["views"] is not None:
+            trace.path = "direct"
 
         # --- Fallback to profile grid scraping for VIEWS ONLY if views is still missing ---
         if data["views"] is None:
@@ -417,74 +534,91 @@ async def scrape_post_data(url: str, app_instance=None):
                  logging.warning("Owner not found, cannot perform grid fallback scrape for views.")
                  data["error"] = data["error"] or ""
                  data["error"] += " Owner not found, failed grid fallback for views."
+                 _set_error_code(data, scrape_errors.GRID_FALLBACK_FAILED)
+            elif (cached_views := grid_cache.lookup(data["owner"], video_id)) is not None:
+                # An earlier fallback for this owner already loaded the profile grid
+                data["views"] = cached_views
+                trace.path = "grid_cache"
+                logging.info(f"Views obtained from grid cache for @{data['owner']}: {data['views']}")
             else:
                 profile_url = build_profile_url(data["owner"])
                 
                 try:
                     logging.info(f"Navigating to profile URL for grid fallback: {profile_url}")
-                    await page.goto(profile_url, wait_until="domcontentloaded", timeout=60000)
-                    await asyncio.sleep(random.uniform(3, 6))
+                    with trace.span("profile_goto"):
+                        await page.goto(profile_url, wait_until="domcontentloaded", timeout=60000)
+                    with trace.span("post_goto_sleep"):
+                        await asyncio.sleep(random.uniform(3, 6))
 
-                    grid_views_only, _ = await scrape_views_and_date_from_grid(page, video_id)
+                    grid_views_only, _ = await scrape_views_and_date_from_grid(page, video_id, trace=trace, owner=data["owner"])
                     
                     if grid_views_only is not None:
                         data["views"] = grid_views_only
+                        trace.path = "grid"
                         logging.info(f"Views obtained from grid fallback: {data['views']}")
 
                 except GridTimeoutError as gte:
-                    logging.warning(f"Grid scrape for views timed out in current mode: {gte}. Relaunching in HEADED mode for re-attempt.")
                     data["error"] = data["error"] or "" # Initialize error if not already set
-                    data["error"] += " Grid scrape for views timed out. Browser popped up for observation."
-
-                    # Close the current browser session
-                    if context: await context.close()
-                    if browser: await browser.close()
-
-                    # Launch new browser in HEADED mode for re-attempting grid scrape
-                    browser, context, page = await _launch_browser_session(p_instance, headless_mode=False, url=profile_url)
-                    logging.info("Browser is visible to re-attempt grid scrape (for views) after timeout.")
-                    if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
-                         app_instance.set_status("Grid scrape for views timed out! Browser visible. Re-attempting grid scrape...")
+                    _set_error_code(data, scrape_errors.GRID_FALLBACK_FAILED)
+                    if headed_page or not escalation_budget.try_acquire("grid_timeout"):
+                        # Already headed (nothing left to escalate to), or the hourly budget is spent
+                        logging.warning(f"Grid scrape for views timed out: {gte}. Not escalating to headed mode.")
+                        data["error"] += f" Grid scrape for views timed out: {gte}"
+                    else:
+                        logging.warning(f"Grid scrape for views timed out in current mode: {gte}. Switching to the shared HEADED browser for re-attempt.")
+                        data["error"] += " Grid scrape for views timed out. Browser popped up for observation."
+
+                        context, page = await _escalate_to_headed(browser, context, profile_url, trace)
+                        browser, headed_page = None, page
+                        logging.info("Browser is visible to re-attempt grid scrape (for views) after timeout.")
+                        if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
+                             app_instance.set_status("Grid scrape for views timed out! Browser visible. Re-attempting grid scrape...")
                     
-                    # --- Second attempt at grid scrape in HEADED mode ---
-                    try:
-                        grid_views_headed_only, _ = await scrape_views_and_date_from_grid(page, video_id)
+                        # --- Second attempt at grid scrape in HEADED mode ---
+                        try:
+                            grid_views_headed_only, _ = await scrape_views_and_date_from_grid(page, video_id, trace=trace, owner=data["owner"])
                         
-                        if grid_views_headed_only is not None:
-                            data["views"] = grid_views_headed_only
-                            logging.info(f"Views obtained from headed grid re-attempt: {data['views']}")
-                            if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
-                                app_instance.set_status("Grid scrape for views successful in headed mode.")
-                            # CRITICAL FIX: Clear the error if the re-scrape was successful
-                            data["error"] = None # Clear any previous grid timeout error
-                        else:
-                            logging.warning("Grid scrape for views in headed mode still failed to get data.")
-                            data["error"] += " Headed grid scrape for views did not retrieve data."
+                            if grid_views_headed_only is not None:
+                                data["views"] = grid_views_headed_only
+                                trace.path = "headed_grid"
+                                logging.info(f"Views obtained from headed grid re-attempt: {data['views']}")
+                                if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
+                                    app_instance.set_status("Grid scrape for views successful in headed mode.")
+                                # CRITICAL FIX: Clear the error if the re-scrape was successful
+                                data["error"] = None # Clear any previous grid timeout error
+                                data["error_code"] = None
+                            else:
+                                logging.warning("Grid scrape for views in headed mode still failed to get data.")
+                                data["error"] += " Headed grid scrape for views did not retrieve data."
+                                if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
+                                    app_instance.set_status("Headed grid scrape for views incomplete. Browser visible for 30s observation.")
+                                with trace.span("observation_wait"):
+                                    await asyncio.sleep(30)
+                                return data
+
+                        except GridTimeoutError as final_gte:
+                            logging.warning(f"Grid scrape for views timed out again in headed mode: {final_gte}. Observing for 30 seconds.")
+                            data["error"] += f" Headed grid scrape for views also timed out: {final_gte}. Observing."
                             if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
-                                app_instance.set_status("Headed grid scrape for views incomplete. Browser visible for 30s observation.")
-                            await asyncio.sleep(30)
+                                 app_instance.set_status("Headed grid scrape for views timed out! Browser visible for 30s observation.")
+                            with trace.span("observation_wait"):
+                                await asyncio.sleep(30)
                             return data
 
-                    except GridTimeoutError as final_gte:
-                        logging.warning(f"Grid scrape for views timed out again in headed mode: {final_gte}. Observing for 30 seconds.")
-                        data["error"] += f" Headed grid scrape for views also timed out: {final_gte}. Observing."
-                        if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
-                             app_instance.set_status("Headed grid scrape for views timed out! Browser visible for 30s observation.")
-                        await asyncio.sleep(30)
-                        return data
-
-                    except Exception as e_headed:
-                        logging.error(f"Unexpected error during headed grid re-attempt (for views): {e_headed}", exc_info=True)
-                        data["error"] += f" Unexpected error during headed grid re-attempt (for views): {e_headed}"
-                        if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
-                             app_instance.set_status("Error during headed grid scrape (for views). Browser visible for 30s observation.")
-                        await asyncio.sleep(30)
-                        return data
+                        except Exception as e_headed:
+                            logging.error(f"Unexpected error during headed grid re-attempt (for views): {e_headed}", exc_info=True)
+                            data["error"] += f" Unexpected error during headed grid re-attempt (for views): {e_headed}"
+                            if app_instance and hasattr(app_instance, 'set_status'): # Changed to set_status
+                                 app_instance.set_status("Error during headed grid scrape (for views). Browser visible for 30s observation.")
+                            with trace.span("observation_wait"):
+                                await asyncio.sleep(30)
+                            return data
 
                 except Exception as e:
                     logging.warning(f"Error during grid fallback navigation or scrape (before headed relaunch check, for views): {e}", exc_info=True)
                     data["error"] = data["error"] or ""
                     data["error"] += f" Error during grid fallback (for views): {e}"
+                    _set_error_code(data, scrape_errors.GRID_FALLBACK_FAILED)
 
         # --- Calculate Engagement Rate ---
         if all(v is not None for v in [data["likes"], data["comments"]]) and data["views"] is not None and data["views"] > 0:
@@ -499,33 +633,45 @@ async def scrape_post_data(url: str, app_instance=None):
         if missing_fields:
             data["error"] = data["error"] or ""
             data["error"] += f" Missing data points: {', '.join(missing_fields)}."
+            _set_error_code(data, scrape_errors.PARTIAL_DATA)
             logging.warning(f"Final data check: {data['error']}")
 
         # Convert None values to "N/A" for the final output as requested by original structure
         for key, value in data.items():
-            if value is None and key not in ["error", "engagement_rate"]:
+            if value is None and key not in ["error", "error_code", "engagement_rate"]:
                 data[key] = "N/A"
             elif key == "engagement_rate" and value is None:
                 data[key] = "N/A"
 
-        await save_cookies(context)
+        with trace.span("save_cookies"):
+            await save_cookies(context)
 
+    except asyncio.CancelledError:
+        # Batch cancel: the finally block below still closes the page and context and returns the browser
+        data["error"] = "Scrape cancelled."
+        data["error_code"] = scrape_errors.CANCELLED
+        logging.warning(f"Scrape of {clean_url} cancelled; tearing down browser.")
+        raise
     except PlaywrightTimeoutError as e:
         data["error"] = f"A page operation timed out: {str(e)}. This often means elements did not load in time or network issues. Try increasing timeouts or running non-headless."
+        data["error_code"] = scrape_errors.TIMEOUT
         logging.critical(f"Playwright timeout: {e}", exc_info=True)
     except Exception as e:
         data["error"] = f"An unexpected error occurred during scraping: {str(e)}. See logs for details. This might be due to website changes or network issues."
+        data["error_code"] = scrape_errors.UNEXPECTED
         logging.critical(f"Unexpected error during scraping: {e}", exc_info=True)
     finally:
-        if context:
-            await context.close()
-            logging.info("Browser context closed.")
-        if browser:
-            await browser.close()
-            logging.info("Browser closed.")
-        if p_instance:
-            await p_instance.stop()
-            logging.info("Playwright instance stopped.")
+        with trace.span("teardown"):
+            if headed_page:
+                await headed_browser.release(headed_page)
+                logging.info("Shared headed page released.")
+            elif context:
+                await context.close()
+                logging.info("Browser context closed.")
+            if browser:
+                browser_pool.release(browser)
+                logging.info("Browser returned to the pool.")
+        await trace.finish(data["error"], data["error_code"])
     return data
 
 if __name__ == "__main__":
@@ -541,8 +687,16 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        result = asyncio.run(scrape_post_data(url_to_scrape))
+        setup_database()
+        start_metrics_server_from_env()
+        async def _scrape_once():
+            try:
+                return await scrape_post_data(url_to_scrape)
+            finally:
+                await browser_pool.close()
+        result = asyncio.run(_scrape_once())
         print(json.dumps(result, indent=2))
+        cookie_store.flush()
     except Exception as main_e:
         logging.critical(f"An error occurred in the main execution block: {main_e}", exc_info=True)
         print(json.dumps({"error": f"Application failed to run: {main_e}"}, indent=2))
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+
+from metrics import registry
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+SELECTORS_FILE = SCRIPT_DIR / "tiktok_selectors.json"
+SELECTORS_ENV_VAR = "TIKTOK_SELECTORS_FILE"
+RELOAD_CHECK_SECONDS = 30 # How often the config file's mtime is checked for hot-swapped selectors
+DEAD_AFTER_TRIES = 50 # A selector tried this often without a single hit is reported as dead
+SELECTOR_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Used when the config file is missing or unreadable; tiktok_selectors.json ships with the same chains
+DEFAULT_CONFIG = {
+    "version": 1,
+    "chains": {
+        "post_views": [
+            'strong[data-e2e="feed-video-play-count"]',
+            'strong[data-e2e="video-play-count"]',
+            '.video-details-container .view-count',
+            'span.tiktok-share-counter-text[data-e2e="undefined-count"]',
+        ],
+        "post_likes": ['strong[data-e2e="like-count"]'],
+        "post_comments": ['strong[data-e2e="comment-count"]'],
+        "post_shares": ['strong[data-e2e="share-count"]'],
+        "post_saves": [
+            'strong[data-e2e="undefined-count"]',
+            'strong[data-e2e="collect-count"]',
+            'strong[data-e2e="favourite-count"]',
+        ],
+        "post_date": [
+            'p[data-e2e="video-desc"] + div span:last-child',
+            'span.video-info-source-text-date',
+            'span.tiktok-video-publish-date',
+            'span.tiktok-share-desc-text span:last-child',
+            'xpath=/html/body/div[1]/div[2]/div[2]/div/div[2]/div[1]/div[1]/div[2]/div[1]/div/a[2]/span[2]/span[3]',
+        ],
+        "grid_views": [
+            'strong[data-e2e="video-views"]',
+            'strong[data-e2e="video-play-count"]',
+            '.tiktok-grid-item-views',
+        ],
+    },
+}
+
+# Runs every chain in the page in one evaluate: {chain: [selectors]} -> {chain: [matched selector, innerText] or [null, null]}
+EXTRACT_TEXTS_JS = """
+chains => {
+    const find = selector => selector.startsWith('xpath=') || selector.startsWith('/')
+        ? document.evaluate(selector.replace(/^xpath=/, ''), document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+        : document.querySelector(selector);
+    const result = {};
+    for (const [name, selectors] of Object.entries(chains)) {
+        result[name] = [null, null];
+        for (const selector of selectors) {
+            let element = null;
+            try { element = find(selector); } catch (e) { continue; } // Invalid selector counts as a miss
+            if (element) { result[name] = [selector, element.innerText]; break; }
+        }
+    }
+    return result;
+}
+"""
+
+
+class _SelectorStats:
+    __slots__ = ("tries", "hits", "seconds", "reported_dead")
+
+    def __init__(self):
+        self.tries = 0
+        self.hits = 0
+        self.seconds = 0.0
+        self.reported_dead = False
+
+    @property
+    def hit_rate(self):
+        return (self.hits + 1) / (self.tries + 2) # Smoothed, so untried selectors start at 0.5
+
+
+class SelectorRegistry:
+    """
+    Named fallback chains of page selectors, loaded from versioned JSON config (hot-reloaded when the file
+    changes). query() tries a chain in order of observed hit rate, records per-selector hits and latency,
+    and logs selectors that never match.
+    """
+
+    def __init__(self, path=None, reload_check_seconds=RELOAD_CHECK_SECONDS):
+        self.path = Path(path or os.environ.get(SELECTORS_ENV_VAR) or SELECTORS_FILE)
+        self.reload_check_seconds = reload_check_seconds
+        self.version = None
+        self._chains = {}
+        self._stats = {} # (chain, selector) -> _SelectorStats
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read_config(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            chains = config["chains"]
+            if not all(isinstance(v, list) and all(isinstance(s, str) for s in v) for v in chains.values()):
+                raise ValueError("every chain must be a list of selector strings")
+            return config.get("version"), {**DEFAULT_CONFIG["chains"], **chains} # Chains the file omits keep their defaults
+        except FileNotFoundError:
+            logging.info(f"No selector config at {self.path}; using built-in selectors v{DEFAULT_CONFIG['version']}.")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.error(f"Invalid selector config {self.path}: {e}. Keeping the current selectors.")
+            return None
+        return DEFAULT_CONFIG["version"], DEFAULT_CONFIG["chains"]
+
+    def _load(self):
+        try:
+            self._mtime = self.path.stat().st_mtime
+        except OSError:
+            self._mtime = None
+        loaded = self._read_config()
+        if loaded is None:
+            if not self._chains:
+                self.version, self._chains = DEFAULT_CONFIG["version"], dict(DEFAULT_CONFIG["chains"])
+            return
+        version, chains = loaded
+        with self._lock:
+            # Stats survive a reload for selectors that are still configured in the same chain
+            self._stats = {key: stats for key, stats in self._stats.items() if key[1] in chains.get(key[0], ())}
+            self.version, self._chains = version, {name: list(selectors) for name, selectors in chains.items()}
+        registry.set_gauge("selector_config_version", version if isinstance(version, (int, float)) else 0)
+        logging.info(f"Selector config v{version} loaded ({len(chains)} chains).")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_check_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._load()
+
+    def chain(self, name):
+        """The chain's selectors, best observed hit rate first (config order breaks ties)."""
+        self._maybe_reload()
+        with self._lock:
+            selectors = self._chains.get(name)
+            if selectors is None:
+                raise KeyError(f"Unknown selector chain: {name}")
+            order = {selector: i for i, selector in enumerate(selectors)}
+            return sorted(selectors, key=lambda s: (-self._stats_for(name, s).hit_rate, order[s]))
+
+    def _stats_for(self, name, selector):
+        stats = self._stats.get((name, selector))
+        if stats is None:
+            stats = self._stats[(name, selector)] = _SelectorStats()
+        return stats
+
+    def record(self, name, selector, hit, seconds):
+        with self._lock:
+            stats = self._stats_for(name, selector)
+            stats.tries += 1
+            stats.hits += int(hit)
+            stats.seconds += seconds
+            newly_dead = stats.hits == 0 and stats.tries >= DEAD_AFTER_TRIES and not stats.reported_dead
+            if newly_dead:
+                stats.reported_dead = True
+        registry.inc("selector_lookups_total", chain=name, selector=selector, result="hit" if hit else "miss")
+        registry.observe("selector_query_seconds", seconds, buckets=SELECTOR_BUCKETS, chain=name)
+        if newly_dead:
+            logging.warning(f"Selector looks dead: {selector!r} in chain '{name}' matched 0 of {stats.tries} tries "
+                            f"(config v{self.version}).")
+
+    async def query(self, root, name):
+        """First element under `root` (page or element handle) matched by chain `name`, or None."""
+        for selector in self.chain(name):
+            start = time.perf_counter()
+            element = await root.query_selector(selector)
+            self.record(name, selector, element is not None, time.perf_counter() - start)
+            if element is not None:
+                return element
+        return None
+
+    async def extract_texts(self, page, names):
+        """
+        Text of the first match of each named chain, all in a single page.evaluate round trip instead of a
+        query_selector plus inner_text per selector. Returns {name: text or None}; stats are recorded as in query().
+        """
+        chains = {name: self.chain(name) for name in names}
+        start = time.perf_counter()
+        found = await page.evaluate(EXTRACT_TEXTS_JS, chains)
+        elapsed = time.perf_counter() - start
+        tried = {}
+        for name, selectors in chains.items():
+            matched = (found.get(name) or (None, None))[0]
+            tried[name] = selectors[:selectors.index(matched) + 1] if matched in selectors else selectors
+        per_selector = elapsed / max(sum(len(t) for t in tried.values()), 1) # The round trip is shared
+        texts = {}
+        for name, selectors in tried.items():
+            matched, text = found.get(name) or (None, None)
+            for selector in selectors:
+                self.record(name, selector, selector == matched, per_selector)
+            texts[name] = text
+        return texts
+
+    def css(self, name):
+        """The chain as one CSS selector list (for waits and in-page JS); xpath entries are left out."""
+        return ", ".join(s for s in self.chain(name) if not s.startswith(("xpath=", "/")))
+
+    def stats(self):
+        """{chain: [(selector, tries, hits, avg_ms)]} in config order."""
+        result = {}
+        with self._lock: # One snapshot, so a concurrent hot reload cannot drop a chain mid-loop
+            for name, selectors in self._chains.items():
+                result[name] = [
+                    (s, st.tries, st.hits, round(st.seconds / st.tries * 1000, 1) if st.tries else None)
+                    for s in selectors for st in (self._stats_for(name, s),)
+                ]
+        return result
+
+
+selector_registry = SelectorRegistry()
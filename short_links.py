@@ -0,0 +1,110 @@
+import logging
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from database import load_short_links, save_short_links
+from metrics import registry
+from tiktok_urls import canonicalize, short_code
+
+RESOLVE_TIMEOUT_SECONDS = 10
+RESOLVE_WORKERS = 8
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+# In-process copy of cache lookups (None = not resolved yet), so hot paths (table lookups, comparisons)
+# hit SQLite at most once per code; resolve_short_links overwrites the None entries it resolves
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def is_short_link(url):
+    return short_code(url) is not None
+
+
+def _canonical(final_url):
+    """Redirect target -> (https://www.tiktok.com/@owner/video/<id>, id), dropping tracking query strings."""
+    video_id, owner, canonical_url = canonicalize(final_url)
+    return (canonical_url, video_id) if video_id and owner else None
+
+
+def _follow_redirects(url):
+    """Final URL after redirects: HEAD first, GET (body unread) if the server rejects HEAD."""
+    for method in ("HEAD", "GET"):
+        request = urllib.request.Request(url, method=method, headers={"User-Agent": USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=RESOLVE_TIMEOUT_SECONDS) as response:
+                return response.geturl()
+        except urllib.error.HTTPError as e:
+            # The redirect chain already ended on a post URL even if that page answers with an error
+            if _canonical(e.geturl()):
+                return e.geturl()
+            if method == "GET":
+                raise
+    return None
+
+
+def _resolve_one(url):
+    try:
+        resolved = _canonical(_follow_redirects(url))
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        logging.warning(f"Could not resolve short link {url}: {e}")
+        registry.inc("short_link_resolutions_total", result="error")
+        return None
+    registry.inc("short_link_resolutions_total", result="resolved" if resolved else "unresolved")
+    if not resolved:
+        logging.warning(f"Short link {url} did not redirect to a TikTok video URL.")
+    return resolved
+
+
+def cached_resolution(url):
+    """(canonical_url, video_id) for an already-resolved short link, else None. Never touches the network."""
+    code = short_code(url)
+    if not code:
+        return None
+    with _memo_lock:
+        if code in _memo:
+            return _memo[code]
+    found = load_short_links([code]).get(code)
+    with _memo_lock:
+        _memo[code] = found
+    return found
+
+
+def resolve_short_links(urls, max_workers=RESOLVE_WORKERS):
+    """
+    Maps every URL to its canonical post URL. Short links are looked up in the SQLite cache and only the
+    misses are resolved over HTTP, concurrently; other URLs map to themselves. Unresolvable short links map to None.
+    """
+    codes = {url: short_code(url) for url in urls}
+    wanted = {code for code in codes.values() if code}
+    known = {}
+    with _memo_lock:
+        known.update({code: _memo[code] for code in wanted if _memo.get(code)})
+    known.update(load_short_links(wanted - known.keys()))
+    registry.inc("short_link_cache_hits_total", len(known))
+
+    # One request per distinct code, whichever of its URLs comes first
+    misses = {}
+    for url, code in codes.items():
+        if code and code not in known and code not in misses:
+            misses[code] = url
+    if misses:
+        logging.info(f"Resolving {len(misses)} short links ({len(known)} cached).")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as pool:
+            results = dict(zip(misses, pool.map(_resolve_one, misses.values())))
+        fresh = {code: resolved for code, resolved in results.items() if resolved}
+        save_short_links(fresh)
+        known.update(fresh)
+    with _memo_lock:
+        _memo.update(known)
+
+    return {url: (known[code][0] if code in known else None) if code else url for url, code in codes.items()}
+
+
+def resolve_short_link(url):
+    """Canonical URL for one link (see resolve_short_links); the URL itself if it is not a short link."""
+    return resolve_short_links([url])[url]
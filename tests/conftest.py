@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The app is a set of flat top-level modules; make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh, fully set-up SQLite database in tmp_path; returns its path."""
+    db_file = str(tmp_path / "tiktok_analytics.db")
+    monkeypatch.setattr(database, "DB_FILE", db_file)
+    database.setup_database()
+    return db_file
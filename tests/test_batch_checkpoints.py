@@ -0,0 +1,29 @@
+import database
+
+
+def test_resume_requeues_crashed_leases_immediately(temp_db):
+    job_id = database.create_batch_job("CSV import", ["u0", "u1", "u2"])
+    assert database.claim_batch_item(job_id) == (0, "u0") # The run that "crashed" holds this lease
+    database.save_to_database({"link": "u1"}, "1", batch_item=(job_id, 1))
+
+    assert database.requeue_batch_job_leases(job_id) == 1
+    assert database.claim_batch_item(job_id) == (0, "u0") # No wait for the 15-minute lease
+    assert database.claim_batch_item(job_id) == (2, "u2")
+    assert database.claim_batch_item(job_id) is None
+
+
+def test_requeue_fails_items_that_keep_crashing(temp_db):
+    job_id = database.create_batch_job("CSV import", ["u0"])
+    for _ in range(database.BATCH_ITEM_MAX_ATTEMPTS):
+        assert database.claim_batch_item(job_id) == (0, "u0")
+        database.requeue_batch_job_leases(job_id)
+    progress = database.batch_job_progress(job_id)
+    assert (progress["failed"], progress["pending"], progress["in_flight"]) == (1, 0, 0)
+
+
+def test_paused_jobs_are_offered_for_resume(temp_db):
+    job_id = database.create_batch_job("CSV import", ["u0", "u1"])
+    database.set_batch_job_status(job_id, "paused")
+    assert [job["job_id"] for job in database.load_resumable_batch_jobs()] == [job_id]
+    database.set_batch_job_status(job_id, "cancelled")
+    assert database.load_resumable_batch_jobs() == []
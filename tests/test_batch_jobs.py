@@ -0,0 +1,124 @@
+import asyncio
+import concurrent.futures
+import inspect
+import threading
+import time
+
+import pytest
+
+import batch_jobs
+from async_runtime import AsyncRuntime
+from batch_jobs import BatchCancelled, BatchJob
+
+
+@pytest.fixture
+def runtime():
+    rt = AsyncRuntime(name="TestRuntime").start()
+    yield rt
+    rt.stop()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "CONTROL_POLL_SECONDS", 0.01)
+
+
+def test_pause_blocks_checkpoint_until_resume():
+    job = BatchJob(total=3)
+    job.pause()
+    assert job.paused and job.state == batch_jobs.PAUSED
+    passed = threading.Event()
+    worker = threading.Thread(target=lambda: (job.checkpoint(), passed.set()))
+    worker.start()
+    assert not passed.wait(0.1)
+    job.resume()
+    assert passed.wait(1)
+    worker.join(1)
+    assert job.state == batch_jobs.RUNNING
+
+
+def test_cancel_wakes_a_paused_worker():
+    job = BatchJob()
+    job.pause()
+    raised = []
+
+    def work():
+        try:
+            job.checkpoint()
+        except BatchCancelled:
+            raised.append(True)
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    time.sleep(0.05)
+    job.cancel()
+    worker.join(1)
+    assert raised == [True]
+    assert job.state == batch_jobs.CANCELLED
+
+
+def test_sleep_is_cut_short_by_cancel():
+    job = BatchJob()
+    threading.Timer(0.05, job.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(BatchCancelled):
+        job.sleep(10)
+    assert time.monotonic() - start < 2
+
+
+def test_run_returns_the_coroutine_result(runtime):
+    async def scrape():
+        await asyncio.sleep(0.01)
+        return {"views": 1}
+
+    assert BatchJob().run(runtime, scrape()) == {"views": 1}
+
+
+def test_cancel_stops_the_in_flight_scrape_after_teardown(runtime):
+    job = BatchJob()
+    torn_down = threading.Event()
+
+    async def scrape():
+        try:
+            await asyncio.sleep(30)
+        finally:
+            await asyncio.sleep(0.05) # e.g. closing the browser
+            torn_down.set()
+
+    threading.Timer(0.1, job.cancel).start()
+    with pytest.raises(BatchCancelled):
+        job.run(runtime, scrape())
+    assert torn_down.is_set() # run() only returns once the cancelled coroutine finished its cleanup
+
+
+def test_finish_keeps_cancelled_state_and_control_is_idempotent():
+    job = BatchJob()
+    job.cancel()
+    job.finish()
+    job.resume()
+    job.pause()
+    assert job.state == batch_jobs.CANCELLED
+    finished = BatchJob()
+    finished.finish()
+    finished.cancel()
+    assert finished.state == batch_jobs.FINISHED and not finished.cancelled
+
+
+def test_cancel_before_the_scrape_starts_closes_the_coroutine():
+    job = BatchJob()
+
+    class IdleRuntime: # Accepts work but never gets round to running it
+        def submit(self, wrapper):
+            self.wrapper = wrapper
+            return concurrent.futures.Future()
+
+    async def scrape():
+        return {"views": 1}
+
+    coro = scrape()
+    runtime = IdleRuntime()
+    threading.Timer(0.05, job.cancel).start()
+    with pytest.raises(BatchCancelled):
+        job.run(runtime, coro)
+    assert inspect.getcoroutinestate(coro) == inspect.CORO_CLOSED
+    assert asyncio.run(runtime.wrapper) is None # A late start sees the claim taken and leaves coro alone
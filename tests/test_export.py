@@ -0,0 +1,43 @@
+import gzip
+import threading
+
+import pytest
+
+import database
+import export
+from export import ExportCancelled, export_posts_csv
+
+
+def _seed(count):
+    for i in range(1, count + 1):
+        database.save_to_database({"link": f"u{i}", "owner": "alice", "views": str(i * 10)}, str(i))
+
+
+def test_cancelled_export_raises_and_removes_the_partial_file(temp_db, tmp_path):
+    _seed(5)
+    cancel = threading.Event()
+    target = tmp_path / "posts.csv.gz"
+
+    def on_progress(written, total):
+        cancel.set() # Cancel after the first chunk has been written
+
+    with pytest.raises(ExportCancelled):
+        export_posts_csv(target, progress_callback=on_progress, cancel_event=cancel, chunk_size=2)
+    assert not target.exists()
+
+
+def test_gzip_is_inferred_from_the_file_name(temp_db, tmp_path):
+    _seed(3)
+    target = tmp_path / "posts.csv.gz"
+    assert export_posts_csv(target) == 3
+    with gzip.open(target, "rt", encoding="utf-8") as f:
+        assert f.readline().startswith("link,video_id")
+
+
+def test_columnar_fallback_keeps_the_directory_name(temp_db, tmp_path, monkeypatch):
+    _seed(2)
+    monkeypatch.setattr(export, "PYARROW_AVAILABLE", False)
+    folder = tmp_path / "exports.v2"
+    folder.mkdir()
+    path, fmt, written = export.export_posts_columnar(folder / "posts")
+    assert (path, fmt, written) == (str(folder / "posts.csv.gz"), "csv.gz", 2)
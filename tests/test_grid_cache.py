@@ -0,0 +1,24 @@
+import grid_cache
+from grid_cache import GridHarvestCache
+
+
+def test_rows_expire_by_their_own_harvest_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(grid_cache.time, "monotonic", lambda: now[0])
+    cache = GridHarvestCache(ttl_seconds=60)
+    cache.store("Owner", {"1": 100})
+    now[0] += 45
+    cache.store("owner", {"2": 200}) # A later harvest must not refresh row "1"
+    now[0] += 30
+    assert cache.lookup("OWNER", "1") is None
+    assert cache.lookup("owner", "2") == 200
+    cache.store("owner", {"1": 150}) # Re-harvesting a row refreshes it
+    assert cache.lookup("owner", "1") == 150
+
+
+def test_lookup_misses_unknown_owner_and_video():
+    cache = GridHarvestCache()
+    cache.store("owner", {"1": 100})
+    assert cache.lookup("someone", "1") is None
+    assert cache.lookup("owner", "9") is None
+    assert cache.lookup(None, "1") is None
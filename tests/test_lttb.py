@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from analytics import lttb
+
+
+def test_small_series_are_returned_unchanged():
+    x, y = np.arange(5.0), np.array([3.0, 1.0, 4.0, 1.0, 5.0])
+    out_x, out_y = lttb(x, y, 10)
+    assert out_x is x and out_y is y
+    assert lttb(x, y, 2)[0] is x # Fewer than 3 points cannot keep both ends plus a bucket
+
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (100, 7), (1_000, 50), (10_007, 800)])
+def test_downsampled_series_is_a_sorted_subset_keeping_both_ends(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.1, 5.0, n))
+    y = rng.normal(size=n).cumsum()
+    out_x, out_y = lttb(x, y, threshold)
+    assert out_x.size == out_y.size == threshold
+    assert out_x[0] == x[0] and out_x[-1] == x[-1]
+    assert np.all(np.diff(out_x) > 0)
+    indexes = np.searchsorted(x, out_x)
+    assert np.array_equal(x[indexes], out_x) and np.array_equal(y[indexes], out_y)
+
+
+def test_spikes_survive_downsampling():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.zeros_like(x)
+    y[[1_234, 5_000, 8_765]] = [100.0, -80.0, 60.0]
+    out_x, _ = lttb(x, y, 100)
+    assert {1_234, 5_000, 8_765} <= set(out_x.astype(int))
+
+
+def test_straight_line_stays_straight():
+    x = np.linspace(0, 1, 5_000)
+    out_x, out_y = lttb(x, 3 * x + 1, 64)
+    assert np.allclose(out_y, 3 * out_x + 1)
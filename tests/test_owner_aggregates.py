@@ -0,0 +1,103 @@
+import random
+import sqlite3
+
+import pytest
+
+import database
+
+AGGREGATE_COLUMNS = (
+    "owner, post_count, sum_views, views_count, sum_likes, likes_count, sum_engagement, engagement_count, last_scraped"
+)
+
+
+def _aggregates(conn):
+    return {row[0]: row[1:] for row in conn.execute(f"SELECT {AGGREGATE_COLUMNS} FROM owner_aggregates")}
+
+
+def _assert_matches_rebuild(db_file):
+    """The trigger-maintained table must equal a from-scratch rebuild over tiktok_posts."""
+    conn = sqlite3.connect(db_file)
+    try:
+        maintained = _aggregates(conn)
+        database.rebuild_owner_aggregates(conn)
+        rebuilt = _aggregates(conn)
+        conn.rollback()
+    finally:
+        conn.close()
+    assert maintained.keys() == rebuilt.keys()
+    for owner, row in rebuilt.items():
+        assert maintained[owner][:-3] == row[:-3]
+        assert maintained[owner][-3] == pytest.approx(row[-3]) # sum_engagement is a float sum
+        assert maintained[owner][-2:] == row[-2:]
+
+
+def _post(video_id, owner, views, likes, rate, day):
+    return {
+        "link": f"https://www.tiktok.com/@{owner}/video/{video_id}",
+        "owner": owner,
+        "views": views,
+        "likes": likes,
+        "engagement_rate": rate,
+        "last_record": f"2024-01-{day:02d}",
+    }
+
+
+def test_insert_update_delete_keep_aggregates_exact(temp_db):
+    database.save_to_database(_post("1", "alice", 100, 10, 5.0, 1), "1")
+    database.save_to_database(_post("2", "alice", "N/A", 4, "N/A", 3), "2")
+    database.save_to_database(_post("3", "bob", 50, "N/A", 2.5, 2), "3")
+    rows = {r["owner"]: r for r in database.load_owner_aggregates()}
+    assert rows["alice"]["post_count"] == 2
+    assert rows["alice"]["sum_views"] == 100
+    assert rows["alice"]["avg_views"] == 100 # 'N/A' views do not count towards the average
+    assert rows["alice"]["avg_likes"] == 7
+    assert rows["alice"]["last_scraped"] == "2024-01-03"
+    assert rows["bob"]["avg_likes"] is None
+
+    database.save_to_database(_post("1", "bob", 300, 30, 1.0, 4), "1") # Moves post 1 from alice to bob
+    rows = {r["owner"]: r for r in database.load_owner_aggregates()}
+    assert rows["alice"]["post_count"] == 1
+    assert rows["bob"]["post_count"] == 2
+    assert rows["bob"]["sum_views"] == 350
+
+    database.delete_data_from_db("https://www.tiktok.com/@alice/video/2")
+    rows = {r["owner"]: r for r in database.load_owner_aggregates()}
+    assert "alice" not in rows # Owners with no posts left are dropped
+    _assert_matches_rebuild(temp_db)
+
+
+def test_random_writes_match_rebuild(temp_db):
+    rng = random.Random(1234)
+    owners = ["alice", "bob", "carol", "N/A"]
+    for step in range(300):
+        video_id = str(rng.randrange(40))
+        if rng.random() < 0.2:
+            database.delete_data_from_db(f"https://www.tiktok.com/@x/video/{video_id}")
+        else:
+            database.save_to_database(_post(
+                video_id, rng.choice(owners),
+                rng.choice([rng.randrange(10**6), "N/A"]), rng.choice([rng.randrange(10**4), "N/A"]),
+                rng.choice([round(rng.uniform(0, 20), 2), "N/A"]), rng.randrange(1, 29),
+            ), video_id)
+        if step % 50 == 0:
+            _assert_matches_rebuild(temp_db)
+    _assert_matches_rebuild(temp_db)
+
+
+def test_setup_backfills_existing_posts(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "legacy.db")
+    monkeypatch.setattr(database, "DB_FILE", db_file)
+    database.setup_database()
+    conn = sqlite3.connect(db_file)
+    for name in database.OWNER_AGGREGATE_TRIGGERS:
+        conn.execute(f"DROP TRIGGER {name}") # A database from before the triggers existed
+    conn.execute("DELETE FROM owner_aggregates")
+    conn.execute("INSERT INTO tiktok_posts (video_id, owner, views, likes, engagement_rate, last_record) "
+                 "VALUES ('9', 'dave', '70', '7', '1.50%', '2024-02-01')")
+    conn.commit()
+    conn.close()
+
+    database.setup_database()
+    rows = database.load_owner_aggregates()
+    assert [(r["owner"], r["post_count"], r["sum_views"]) for r in rows] == [("dave", 1, 70)]
+    _assert_matches_rebuild(db_file)
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from parsing import parse_count, parse_post_date
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, strategies as st  # noqa: E402
+
+NOW = datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc)
+SUFFIXES = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000, "万": 10_000}
+RELATIVE_UNITS = {
+    "seconds": 1, "minutes": 60, "hours": 3600, "days": 86400, "weeks": 7 * 86400, "d": 86400, "h": 3600,
+}
+CJK_UNITS = {"秒": 1, "分钟": 60, "小时": 3600, "天": 86400}
+
+counts = st.integers(min_value=0, max_value=10**12)
+datetimes = st.datetimes(
+    min_value=datetime(1970, 1, 1), max_value=datetime(2100, 12, 31), timezones=st.just(timezone.utc)
+).map(lambda dt: dt.replace(microsecond=0))
+
+
+@given(counts)
+def test_plain_count_round_trips(n):
+    assert parse_count(str(n)) == n
+
+
+@given(counts, st.sampled_from([",", ".", " ", "\u00a0"]))
+def test_grouped_count_round_trips(n, separator):
+    assert parse_count(f"{n:,}".replace(",", separator)) == n
+
+
+@given(
+    st.integers(min_value=0, max_value=999),
+    st.text(alphabet="0123456789", min_size=1, max_size=3),
+    st.sampled_from(sorted(SUFFIXES)),
+    st.sampled_from([".", ","]),
+    st.sampled_from(["", " "]),
+)
+def test_suffixed_count_reads_separator_as_decimal(whole, fraction, suffix, separator, space):
+    expected = whole * SUFFIXES[suffix] + int(fraction) * SUFFIXES[suffix] // 10 ** len(fraction)
+    assert parse_count(f"{whole}{separator}{fraction}{space}{suffix}") == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.2K", 1200), ("3,456", 3456), ("7.8M", 7_800_000), ("1.234K", 1234), ("1,2 M", 1_200_000),
+    ("12.3k", 12300), ("1 234 567", 1_234_567), ("3.4亿", 340_000_000), ("10K", 10_000),
+])
+def test_known_counts(text, expected):
+    assert parse_count(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "N/A", "abc", "1.234.5K", "12X", None, 5])
+def test_unparseable_counts(text):
+    assert parse_count(text) is None
+
+
+@given(datetimes, st.sampled_from(["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"]))
+def test_absolute_datetime_round_trips(dt, pattern):
+    assert parse_post_date(dt.strftime(pattern), now=NOW) == dt
+
+
+@given(datetimes.map(lambda dt: dt.replace(hour=0, minute=0, second=0)))
+def test_absolute_date_round_trips(dt):
+    assert parse_post_date(dt.strftime("%Y-%m-%d"), now=NOW) == dt
+    assert parse_post_date(f"{dt:%b} {dt.day}, {dt.year}", now=NOW) == dt
+    assert parse_post_date(f"{dt.day} {dt:%B} {dt.year}", now=NOW) == dt
+
+
+@given(st.integers(min_value=0, max_value=10_000), st.sampled_from(sorted(RELATIVE_UNITS)))
+def test_relative_date_round_trips(amount, unit):
+    assert parse_post_date(f"{amount} {unit} ago", now=NOW) == NOW - timedelta(seconds=amount * RELATIVE_UNITS[unit])
+
+
+@given(st.integers(min_value=0, max_value=10_000), st.sampled_from(sorted(CJK_UNITS)))
+def test_cjk_relative_date_round_trips(amount, unit):
+    assert parse_post_date(f"{amount}{unit}前", now=NOW) == NOW - timedelta(seconds=amount * CJK_UNITS[unit])
+
+
+@given(datetimes)
+def test_month_day_resolves_to_latest_past_occurrence(dt):
+    if dt.month == 2 and dt.day == 29:
+        return # Only exists in leap years; covered by the year fallback below
+    parsed = parse_post_date(f"{dt.month}-{dt.day}", now=NOW)
+    assert (parsed.month, parsed.day) == (dt.month, dt.day)
+    assert NOW - timedelta(days=366) < parsed <= NOW
+
+
+def test_month_day_in_the_future_is_last_year():
+    assert parse_post_date("12-31", now=NOW) == datetime(2023, 12, 31, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("text", ["", "soon", "13-45", "2023-02-30", "Foo 3, 2020", None])
+def test_unparseable_dates(text):
+    assert parse_post_date(text, now=NOW) is None
@@ -0,0 +1,142 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import database
+import scheduler
+import scrape_errors
+from scheduler import RefreshScheduler, refresh_interval
+
+NOW = datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def _execute(sql, params=()):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _add_post(video_id, posted_hours_ago=48):
+    posted = (NOW - timedelta(hours=posted_hours_ago)).strftime("%Y-%m-%d %H:%M:%S (UTC)")
+    _execute("INSERT INTO tiktok_posts (video_id, link, post_date, owner) VALUES (?, ?, ?, 'someone')",
+             (video_id, f"https://www.tiktok.com/@someone/video/{video_id}", posted))
+    return f"https://www.tiktok.com/@someone/video/{video_id}"
+
+
+def _add_snapshot(video_id, hours_ago, views):
+    _execute("INSERT INTO post_snapshots (video_id, recorded_at, views) VALUES (?, ?, ?)",
+             (video_id, scheduler._iso(NOW - timedelta(hours=hours_ago)), views))
+
+
+def _next_due(video_id):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return datetime.fromisoformat(
+            conn.execute("SELECT next_due FROM refresh_schedule WHERE video_id = ?", (video_id,)).fetchone()[0]
+        )
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("age_hours", [None, 1, 30, 200, 2000, 10**5])
+def test_refresh_interval_is_clamped_and_shrinks_with_velocity(age_hours):
+    previous = None
+    for views_per_hour in (0, 1, 10, 100, 1_000, 10_000, 10**6, 10**9):
+        interval = refresh_interval(views_per_hour, age_hours)
+        assert scheduler.MIN_INTERVAL_SECONDS <= interval <= scheduler.MAX_INTERVAL_SECONDS
+        if previous is not None:
+            assert interval <= previous
+        previous = interval
+
+
+def test_refresh_interval_base_follows_post_age():
+    assert refresh_interval(0, 1) == 3600
+    assert refresh_interval(0, 48) == 6 * 3600
+    assert refresh_interval(0, 10 * 24) == 24 * 3600
+    assert refresh_interval(0, 365 * 24) == scheduler.MAX_INTERVAL_SECONDS
+    assert refresh_interval(0, None) == scheduler.UNKNOWN_AGE_INTERVAL_SECONDS
+    assert refresh_interval(-50, 1) == 3600 # Negative velocity (deleted views) is treated as none
+
+
+def test_untracked_posts_are_due_immediately_and_claimed_once(temp_db):
+    link = _add_post("1")
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    assert sched.claim_due(NOW, 10) == [link]
+    # A claim pushes the post back until its new snapshot reschedules it
+    assert sched.claim_due(NOW, 10) == []
+    assert _next_due("1") == NOW + timedelta(seconds=scheduler.CLAIM_RETRY_SECONDS)
+
+
+def test_new_snapshots_reschedule_from_velocity(temp_db):
+    _add_post("1", posted_hours_ago=48)
+    _add_snapshot("1", hours_ago=3, views=1_000)
+    _add_snapshot("1", hours_ago=1, views=3_000) # 1,000 views/hour
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    expected = NOW - timedelta(hours=1) + timedelta(seconds=refresh_interval(1_000, 48))
+    assert _next_due("1") == expected
+
+
+def test_claim_due_prefers_fast_posts(temp_db):
+    slow, fast = _add_post("1"), _add_post("2")
+    for video_id, views in (("1", (100, 110)), ("2", (100, 90_100))):
+        _add_snapshot(video_id, hours_ago=30, views=views[0])
+        _add_snapshot(video_id, hours_ago=29, views=views[1])
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    assert sched.claim_due(NOW, 1) == [fast]
+    assert sched.claim_due(NOW, 1) == [slow]
+
+
+def test_claim_due_skips_tombstoned_and_backed_off_posts(temp_db):
+    _add_post("1")
+    _add_post("2")
+    live = _add_post("3")
+    _execute("INSERT INTO scrape_failures (video_id, tombstoned) VALUES ('1', 1)")
+    _execute("INSERT INTO scrape_failures (video_id, next_retry_at) VALUES ('2', ?)",
+             (scheduler._iso(NOW + timedelta(hours=1)),))
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    assert sched.claim_due(NOW, 10) == [live]
+
+
+def test_tick_respects_budget_and_busy_flag(temp_db):
+    for video_id in ("1", "2", "3"):
+        _add_post(video_id)
+    _execute("INSERT INTO scrape_traces (trace_id, started_at) VALUES ('t1', ?)",
+             (scheduler._iso(NOW - timedelta(minutes=10)),))
+    dispatched = []
+    busy = [True]
+    sched = RefreshScheduler(run_batch=dispatched.append, is_busy=lambda: busy[0], budget_per_hour=3)
+
+    assert sched.tick(NOW) == []
+    assert dispatched == []
+
+    busy[0] = False
+    assert len(sched.tick(NOW)) == 2 # 3 per hour, 1 already used by the traced scrape
+    assert len(dispatched) == 1 and len(dispatched[0]) == 2
+
+
+def test_partial_data_scrape_stays_schedulable(temp_db):
+    link = _add_post("1")
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    for _ in range(5): # Well past any failure policy's max_attempts
+        record = database.record_scrape_outcome("1", link, scrape_errors.PARTIAL_DATA, " Missing data points: saves.")
+        assert record is None
+    assert database.load_blocked_video_ids() == {}
+    assert sched.claim_due(NOW, 10) == [link]
+
+
+def test_setup_clears_partial_data_failures_from_older_databases(temp_db):
+    link = _add_post("1")
+    _execute("INSERT INTO scrape_failures (video_id, error_code, tombstoned) VALUES ('1', ?, 1)", (scrape_errors.PARTIAL_DATA,))
+    database.setup_database()
+    sched = RefreshScheduler(run_batch=lambda links: None, budget_per_hour=10)
+    sched.sync_schedule(NOW)
+    assert sched.claim_due(NOW, 10) == [link]
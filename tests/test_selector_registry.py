@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from selector_registry import DEFAULT_CONFIG, SelectorRegistry
+
+
+def _write_config(path, chains, version=2, mtime=None):
+    path.write_text(json.dumps({"version": version, "chains": chains}), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime)) # Reloads are keyed on mtime; make each write distinct
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "selectors.json"
+    _write_config(path, {"views": ["a", "b", "c"]}, version=1, mtime=1_000)
+    return path
+
+
+def test_untried_chain_keeps_config_order(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    assert registry.version == 1
+    assert registry.chain("views") == ["a", "b", "c"]
+
+
+def test_chain_reorders_by_observed_hit_rate(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    for _ in range(5):
+        registry.record("views", "a", False, 0.001)
+        registry.record("views", "c", True, 0.001)
+    assert registry.chain("views") == ["c", "b", "a"]
+
+
+def test_missing_chains_fall_back_to_defaults(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    assert registry.chain("post_likes") == DEFAULT_CONFIG["chains"]["post_likes"]
+    with pytest.raises(KeyError):
+        registry.chain("no_such_chain")
+
+
+def test_hot_reload_keeps_stats_of_surviving_selectors(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    registry.record("views", "b", True, 0.002)
+    registry.record("views", "c", True, 0.002)
+    _write_config(config_path, {"views": ["c", "d"]}, version=3, mtime=2_000)
+    assert registry.chain("views") == ["c", "d"]
+    assert registry.version == 3
+    assert registry.stats()["views"] == [("c", 1, 1, 2.0), ("d", 0, 0, None)]
+
+
+def test_invalid_config_keeps_current_selectors(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    config_path.write_text("{not json", encoding="utf-8")
+    os.utime(config_path, (3_000, 3_000))
+    assert registry.chain("views") == ["a", "b", "c"]
+    assert registry.version == 1
+
+
+def test_stats_survive_a_reload_that_drops_a_chain(config_path):
+    _write_config(config_path, {"views": ["a"], "extra": ["x"]}, mtime=4_000)
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    registry.record("extra", "x", True, 0.001)
+    _write_config(config_path, {"views": ["a"]}, mtime=5_000)
+    registry.chain("views") # Triggers the reload
+    assert "extra" not in registry.stats()
+
+
+class _FakePage:
+    def __init__(self, texts):
+        self.texts = texts # selector -> innerText of its element
+
+    async def evaluate(self, script, chains):
+        result = {}
+        for name, selectors in chains.items():
+            found = next((s for s in selectors if s in self.texts), None)
+            result[name] = [found, self.texts.get(found)]
+        return result
+
+
+def test_extract_texts_returns_first_match_and_records_misses(config_path):
+    registry = SelectorRegistry(config_path, reload_check_seconds=0)
+    page = _FakePage({"b": "1.2K", "c": "ignored"})
+    texts = asyncio.run(registry.extract_texts(page, ["views", "post_likes"]))
+    assert texts == {"views": "1.2K", "post_likes": None}
+    stats = {s: (tries, hits) for s, tries, hits, _ in registry.stats()["views"]}
+    assert stats == {"a": (1, 0), "b": (1, 1), "c": (0, 0)} # Selectors after the match are not tried
+    assert registry.chain("views")[0] == "b"
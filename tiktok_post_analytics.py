@@ -10,6 +10,7 @@ from datetime import datetime
 from ui import TikTokScraperApp
 from database import setup_database, DB_FILE
 from scraper import TIKTOK_SESSION_DATA_DIR, TIKTOK_BROWSER_USER_DATA_DIR # Corrected directory names
+from metrics_server import start_metrics_server_from_env
 
 
 # --- Configuration ---
@@ -61,6 +62,7 @@ def global_exception_handler(exc_type, exc_value, exc_traceback):
 if __name__ == "__main__":
     try:
         setup_database()
+        start_metrics_server_from_env() # Only if TIKTOK_METRICS_PORT is set
 
         root_tk_window = tk.Tk()
         root_tk_window.report_callback_exception = global_exception_handler
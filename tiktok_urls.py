@@ -0,0 +1,48 @@
+import re
+from functools import lru_cache
+
+# All TikTok URL patterns live here, compiled once
+SPACED_AT_RE = re.compile(r'\s+@\s+')
+POST_PATH_RE = re.compile(r'/@([^/?#]+)/video/(\d+)')
+VIDEO_ID_RE = re.compile(r'/video/(\d+)')
+SHORT_LINK_RE = re.compile(r'(?:vm\.tiktok\.com|vt\.tiktok\.com|tiktok\.com/t)/([A-Za-z0-9]+)')
+
+CANONICALIZE_CACHE_SIZE = 65536
+
+
+def sanitize_url(url: str) -> str:
+    """Cleans up a URL string by removing extra spaces and stripping."""
+    if not isinstance(url, str):
+        return ""
+    return SPACED_AT_RE.sub("@", url).strip()
+
+
+@lru_cache(maxsize=CANONICALIZE_CACHE_SIZE)
+def _canonicalize(url):
+    clean_url = sanitize_url(url)
+    match = POST_PATH_RE.search(clean_url)
+    if match:
+        owner = match.group(1).replace(' ', '')
+        video_id = match.group(2)
+        return video_id, owner, f"https://www.tiktok.com/@{owner}/video/{video_id}"
+    match = VIDEO_ID_RE.search(clean_url)
+    if match:
+        return match.group(1), None, clean_url.split("?", 1)[0].split("#", 1)[0]
+    return None, None, clean_url
+
+
+def canonicalize(url):
+    """
+    Parses a TikTok post URL into (video_id, owner, canonical_url), memoized per distinct string.
+    canonical_url is https://www.tiktok.com/@owner/video/<id> without query or fragment when both parts are
+    present. Short links (see short_code) and anything unrecognised come back as (None, None, sanitized_url).
+    """
+    if not isinstance(url, str):
+        return None, None, ""
+    return _canonicalize(url)
+
+
+def short_code(url):
+    """The opaque code of a vm.tiktok.com / vt.tiktok.com / tiktok.com/t/ link, or None for other URLs."""
+    match = SHORT_LINK_RE.search(url) if isinstance(url, str) else None
+    return match.group(1) if match else None
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from database import save_scrape_trace
+from metrics import registry
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_FILE = os.path.join(SCRIPT_DIR, "scrape_traces.jsonl")
+
+_trace_file_lock = threading.Lock()
+
+
+class ScrapeTrace:
+    """
+    Collects timed spans for a single scrape_post_data call, plus which path produced
+    the views (direct, grid or headed_grid) and how many response bytes were transferred.
+    """
+
+    def __init__(self, url, video_id=None):
+        self.trace_id = uuid.uuid4().hex
+        self.url = url
+        self.video_id = video_id
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self.path = None
+        self.captcha = False
+        self.headed_launches = 0
+        self.browser_launches = 0
+        self.bytes_transferred = 0
+        self.outcome = None
+        self.error = None
+        self.error_code = None
+        self.total_ms = None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Times the wrapped block and records it as a named phase (also on exceptions)."""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            end = time.perf_counter()
+            record = {
+                "name": name,
+                "start_ms": round((start - self._t0) * 1000, 1),
+                "duration_ms": round((end - start) * 1000, 1),
+                "status": status,
+            }
+            if attrs:
+                record.update(attrs)
+            self.spans.append(record)
+
+    def attach_page(self, page):
+        """Counts response body sizes (from Content-Length) for every response the page receives."""
+        def _on_response(response):
+            try:
+                length = response.headers.get("content-length")
+                if length:
+                    self.bytes_transferred += int(length)
+            except Exception:
+                pass
+        page.on("response", _on_response)
+
+    def phase_totals(self) -> dict:
+        """Sums span durations by phase name (milliseconds)."""
+        totals = {}
+        for span in self.spans:
+            totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["duration_ms"], 1)
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "url": self.url,
+            "video_id": self.video_id,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": self.total_ms,
+            "path": self.path,
+            "outcome": self.outcome,
+            "captcha": self.captcha,
+            "browser_launches": self.browser_launches,
+            "headed_launches": self.headed_launches,
+            "bytes_transferred": self.bytes_transferred,
+            "phases": self.phase_totals(),
+            "spans": self.spans,
+            "error": self.error,
+            "error_code": self.error_code,
+        }
+
+    async def finish(self, error=None, error_code=None):
+        """
+        Closes the trace and writes it to the JSONL trace file and the scrape_traces table, on a worker
+        thread so the shared event loop keeps serving other scrapes during the file and SQLite writes.
+        """
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+        self.error = error or None
+        self.error_code = error_code if self.error else None
+        if self.outcome is None:
+            self.outcome = "error" if self.error else "success"
+        record = self.to_dict()
+        logging.info(
+            f"Scrape trace {self.trace_id} for {self.video_id}: {self.total_ms}ms, path={self.path}, "
+            f"outcome={self.outcome}, phases={record['phases']}"
+        )
+        self._record_metrics(record)
+        await asyncio.to_thread(_persist_trace, record)
+        return record
+
+    def _record_metrics(self, record):
+        registry.inc("scrapes_total", outcome=self.outcome)
+        if self.error_code:
+            registry.inc("scrape_errors_total", code=self.error_code)
+        registry.inc("scrape_path_total", path=self.path or "none")
+        if self.captcha:
+            registry.inc("scrape_captcha_total")
+        registry.observe("scrape_duration_seconds", self.total_ms / 1000.0)
+        for phase, ms in record["phases"].items():
+            registry.observe("scrape_phase_seconds", ms / 1000.0, phase=phase)
+
+
+class _NullTrace:
+    """Stand-in used when a caller does not pass a trace; every operation is a no-op."""
+
+    path = None
+    captcha = False
+    headed_launches = 0
+    browser_launches = 0
+
+    @contextmanager
+    def span(self, name, **attrs):
+        yield
+
+    def attach_page(self, page):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def _persist_trace(record):
+    _append_trace_line(record)
+    save_scrape_trace(record)
+
+
+def _append_trace_line(record):
+    try:
+        line = json.dumps(record, default=str)
+        with _trace_file_lock:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception as e:
+        logging.warning(f"Failed to append scrape trace to {TRACE_FILE}: {e}")
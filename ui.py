@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import threading
-import asyncio
 import csv
 import logging
 from datetime import datetime, timezone
@@ -17,9 +16,30 @@ import customtkinter as ctk
 
 # Corrected: Import TikTok-specific directories and functions
 # No longer importing specific selenium classes directly here, as scraper handles driver init.
-from scraper import scrape_post_data, get_tiktok_video_id_from_url, TIKTOK_SESSION_DATA_DIR, TIKTOK_BROWSER_USER_DATA_DIR
+from scraper import (
+    scrape_post_data, get_tiktok_video_id_from_url, browser_pool, TIKTOK_SESSION_DATA_DIR, TIKTOK_BROWSER_USER_DATA_DIR
+)
 # Corrected: Import TikTok-specific DB functions and file
-from database import setup_database, DB_FILE, load_data_from_db, save_to_database, delete_data_from_db
+from database import (
+    setup_database, DB_FILE, load_data_from_db, save_to_database, delete_data_from_db, load_owner_aggregates,
+    record_scrape_outcome, load_blocked_video_ids, create_batch_job, claim_batch_item, release_batch_item,
+    requeue_batch_job_leases, set_batch_job_status, batch_job_progress, load_resumable_batch_jobs
+)
+from metrics import registry, throughput_summary
+from scheduler import RefreshScheduler
+import scrape_errors
+from async_runtime import AsyncRuntime, MainThreadPump
+from batch_jobs import BatchJob, BatchCancelled
+from grid_cache import group_by_owner
+from short_links import is_short_link, resolve_short_links
+from export import (
+    export_posts_csv, export_posts_columnar, export_snapshots_csv, export_snapshots_columnar, export_owner_summary_csv,
+    ExportCancelled, DEFAULT_EXPORT_COLUMNS, PYARROW_AVAILABLE
+)
+
+METRICS_REFRESH_MS = 1000 # Metrics panel redraw interval; keeps the panel off the Tk event loop's hot path
+CHART_POLL_MS = 5000 # How often an open chart checks for new snapshots (a cheap MAX/COUNT query)
+CHART_RESIZE_DEBOUNCE_MS = 150
 
 
 # --- CustomTkinter Comprehensive Theme Definition ---
@@ -213,6 +233,10 @@ class TikTokScraperApp: # Renamed class
 
         self.root = root_window
         self.root.title("TikTok Post Analyzer") # Updated title
+        # One asyncio loop for every scrape, and one after() chain carrying worker results back to Tk
+        self.async_runtime = AsyncRuntime().start()
+        self.async_runtime.on_stop(browser_pool.close) # Pooled Chromium (headless and headed) lives on this loop and dies with it
+        self.ui_pump = MainThreadPump(self.root).start()
         self.root.geometry("1000x650")
         
         # Set application icon
@@ -228,6 +252,9 @@ class TikTokScraperApp: # Renamed class
 
 
         self.scraped_data_for_table = [] # Stores data as list of dicts
+        self._data_by_video_id = {} # video_id -> dict in scraped_data_for_table
+        self._row_items = {} # video_id -> Treeview item id
+        self._dirty_video_ids = set() # Rows changed since the last table flush
         
         # Initialize sorting state
         self.sort_column = None
@@ -241,17 +268,33 @@ class TikTokScraperApp: # Renamed class
         self._load_data_from_db_into_ui()
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
         self.is_batch_scraping = False
+        self.batch_job = None # BatchJob of the running batch; its controls live in the batch bar
         
         # Initialize temporary notification label
         self._temp_notification_label = None
         self._temp_notification_after_id = None
         # Initialize overlay attribute
         self.overlay = None 
+        # Metrics panel window (created on demand)
+        self.metrics_window = None
+        self._metrics_label = None
+        self._metrics_after_id = None
+        # Velocity-based auto-refresh (off until toggled; see scheduler.py)
+        self.refresh_scheduler = RefreshScheduler(
+            run_batch=lambda links: self.ui_pump.post(self._start_scheduled_refresh, links),
+            is_busy=lambda: self.is_batch_scraping,
+        )
+        self.root.after(500, self._offer_batch_resume) # Batches interrupted by a crash or exit
 
 
     def _on_closing(self):
         if messagebox.askyesno("Exit", "Are you sure you want to exit?", parent=self.root):
             logging.info("Application exiting by user confirmation.")
+            self.refresh_scheduler.stop()
+            if self.batch_job:
+                self.batch_job.cancel()
+            self.async_runtime.stop() # Also closes browser_pool, headed window included
+            self.ui_pump.stop()
             self.root.destroy()
 
     def _load_data_from_db_into_ui(self):
@@ -317,11 +360,12 @@ class TikTokScraperApp: # Renamed class
                     "views": row_dict.get("views", "N/A"),
                     "engagement_rate": row_dict.get("engagement_rate", "N/A"),
                     "error": row_dict.get("error", None),
-                    "video_id": row_dict.get("video_id", get_tiktok_video_id_from_url(row_dict.get("link", ""))) # Changed to video_id
+                    "video_id": row_dict.get("video_id") or get_tiktok_video_id_from_url(row_dict.get("link", "")) # Changed to video_id
                 }
                 
                 self.scraped_data_for_table.append(post_data_gui)
             
+            self._reindex_table_data()
             self._refresh_table_display()
 
             self.set_status(f"{len(rows)} records loaded. Ready.")
@@ -455,6 +499,32 @@ class TikTokScraperApp: # Renamed class
         )
         self.clear_browser_data_button.pack(side=tk.LEFT, padx=5)
 
+        self.analytics_button = ctk.CTkButton(
+            other_buttons_frame, text="Analytics", command=self.open_analytics_window
+        )
+        self.analytics_button.pack(side=tk.LEFT, padx=5)
+
+        # Metrics panel toggle; deliberately not disabled during scrapes (see _set_buttons_state)
+        self.metrics_button = ctk.CTkButton(
+            other_buttons_frame, text="Metrics", command=self.toggle_metrics_panel
+        )
+        self.metrics_button.pack(side=tk.RIGHT, padx=5)
+
+        # Auto-refresh toggle; like Metrics it stays usable while scrapes run
+        self.auto_refresh_var = tk.BooleanVar(value=False)
+        self.auto_refresh_switch = ctk.CTkSwitch(
+            other_buttons_frame, text="Auto-Refresh", variable=self.auto_refresh_var, command=self.toggle_auto_refresh
+        )
+        self.auto_refresh_switch.pack(side=tk.RIGHT, padx=5)
+
+        # Batch progress and controls; packed only while a batch runs, so the table stays usable meanwhile
+        self.batch_bar = ctk.CTkFrame(input_frame, fg_color="transparent")
+        self.batch_progress_label = ctk.CTkLabel(self.batch_bar, text="")
+        self.batch_progress_label.pack(side=tk.LEFT, padx=5)
+        self.batch_cancel_button = ctk.CTkButton(self.batch_bar, text="Cancel", width=80, command=self.cancel_batch)
+        self.batch_cancel_button.pack(side=tk.RIGHT, padx=5)
+        self.batch_pause_button = ctk.CTkButton(self.batch_bar, text="Pause", width=80, command=self.toggle_batch_pause)
+        self.batch_pause_button.pack(side=tk.RIGHT, padx=5)
 
         self.tree.bind("<Button-3>", self._show_context_menu)
 
@@ -469,15 +539,14 @@ class TikTokScraperApp: # Renamed class
         Updates the status using a temporary, non-blocking overlay notification.
         """
         logging.info(f"STATUS_UPDATE: {message}")
-        if self.root.winfo_exists(): # Safety check
-            self.root.after(0, lambda: self._show_temp_notification(message))
+        # Coalesced: when several messages arrive within one pump tick only the newest is shown (all are logged)
+        self.ui_pump.post_latest("status", self._show_temp_notification, message)
 
     def set_status_from_thread(self, message):
         """
         Updates the status using a temporary, non-blocking overlay notification from a thread.
         """
-        if self.root.winfo_exists(): # Safety check
-            self.root.after(0, lambda: self._show_temp_notification(message))
+        self.ui_pump.post_latest("status", self._show_temp_notification, message)
 
     def _show_temp_notification(self, message, duration_ms=3000):
         """
@@ -512,6 +581,72 @@ class TikTokScraperApp: # Renamed class
         if self._temp_notification_after_id:
             self._temp_notification_after_id = None
 
+    def toggle_metrics_panel(self):
+        """Opens (or closes) the non-modal live throughput panel."""
+        if not self.root.winfo_exists(): return # Safety check
+        if self.metrics_window is not None and self.metrics_window.winfo_exists():
+            self._close_metrics_panel()
+            return
+
+        self.metrics_window = ctk.CTkToplevel(self.root)
+        self.metrics_window.title("Scrape Metrics")
+        self.metrics_window.geometry("420x420")
+        self.metrics_window.attributes("-topmost", True) # Stay visible above the main window and its overlay
+        self.metrics_window.protocol("WM_DELETE_WINDOW", self._close_metrics_panel)
+
+        self._metrics_label = ctk.CTkLabel(
+            self.metrics_window, text="Waiting for scrape data...",
+            font=ctk.CTkFont(family="Courier", size=12), justify=tk.LEFT, anchor="nw"
+        )
+        self._metrics_label.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+        self._refresh_metrics_panel()
+
+    def _close_metrics_panel(self):
+        if self._metrics_after_id:
+            self.root.after_cancel(self._metrics_after_id)
+            self._metrics_after_id = None
+        if self.metrics_window is not None and self.metrics_window.winfo_exists():
+            self.metrics_window.destroy()
+        self.metrics_window = None
+        self._metrics_label = None
+
+    def _refresh_metrics_panel(self):
+        """Redraws the metrics panel from the registry, then re-arms itself at METRICS_REFRESH_MS."""
+        self._metrics_after_id = None
+        if not self.root.winfo_exists() or self.metrics_window is None or not self.metrics_window.winfo_exists():
+            return
+
+        summary = throughput_summary()
+
+        def pct(value):
+            return f"{value * 100:.1f}%" if value is not None else "-"
+
+        def secs(value):
+            return f"{value:.2f}s" if value is not None else "-"
+
+        eta = summary["eta_seconds"]
+        lines = [
+            f"Posts/minute : {summary['posts_per_minute']:.2f}",
+            f"Completed    : {int(summary['total'])}",
+            f"Success rate : {pct(summary['success_rate'])}",
+            f"Fallback rate: {pct(summary['fallback_rate'])}",
+            f"CAPTCHA rate : {pct(summary['captcha_rate'])}",
+            f"Queue depth  : {int(summary['queue_depth'])}",
+            f"ETA          : {time.strftime('%H:%M:%S', time.gmtime(eta)) if eta is not None else '-'}",
+            "",
+            f"{'Phase':<20}{'p50':>9}{'p95':>9}",
+        ]
+        # Slowest phases first, by p95
+        phases = sorted(summary["phases"].items(), key=lambda kv: kv[1][1] or 0, reverse=True)
+        for phase, (p50, p95) in phases[:15]:
+            lines.append(f"{phase[:19]:<20}{secs(p50):>9}{secs(p95):>9}")
+
+        text = "\n".join(lines)
+        if self._metrics_label.cget("text") != text:
+            self._metrics_label.configure(text=text)
+
+        self._metrics_after_id = self.root.after(METRICS_REFRESH_MS, self._refresh_metrics_panel)
+
     def _show_blocking_overlay(self, text="Processing..."):
         """
         Displays a blocking overlay for long-running operations.
@@ -549,11 +684,7 @@ class TikTokScraperApp: # Renamed class
         self._show_blocking_overlay("Recording Single Post...")
         logging.info(f"Record button pressed for URL: {post_url}")
 
-        thread = threading.Thread(
-            target=self._run_tiktok_scrape_in_thread, args=(post_url, False)
-        )
-        thread.daemon = True
-        thread.start()
+        self._start_single_scrape(post_url)
 
     def on_batch_scrape_button_press(self):
         if self.is_batch_scraping:
@@ -568,13 +699,11 @@ class TikTokScraperApp: # Renamed class
             self.set_status("Batch scrape cancelled. No CSV file selected.")
             return
 
-        self.is_batch_scraping = True
-        self._set_buttons_state(tk.DISABLED) 
-        self._show_blocking_overlay(f"Starting Batch Scrape from CSV...")
+        job = self._begin_batch("Batch scrape from CSV")
         logging.info(f"Batch scrape initiated from CSV: {filepath}")
 
         thread = threading.Thread(
-            target=self._run_batch_scrape_in_thread, args=(filepath,)
+            target=self._run_batch_scrape_in_thread, args=(job, filepath)
         )
         thread.daemon = True
         thread.start()
@@ -599,17 +728,119 @@ class TikTokScraperApp: # Renamed class
             self.set_status("Update Warning: No valid items selected for update.")
             return
 
-        self.is_batch_scraping = True 
-        self._set_buttons_state(tk.DISABLED)
-        self._show_blocking_overlay(f"Updating {len(links_to_update)} Selected Posts...")
+        job = self._begin_batch("Updating selected posts", len(links_to_update))
         logging.info(f"Update selected initiated for {len(links_to_update)} posts.")
 
+        # An explicit update retries tombstoned posts too; success clears their tombstone
+        thread = threading.Thread(
+            target=self._run_batch_scrape_in_thread, args=(job, None, links_to_update, False)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _offer_batch_resume(self):
+        """Offers to resume the oldest checkpointed batch that did not finish (the app crashed or was closed)."""
+        if not self.root.winfo_exists() or self.is_batch_scraping: return # Safety check
+        jobs = load_resumable_batch_jobs()
+        if not jobs:
+            return
+        pending = jobs[0]
+        answer = messagebox.askyesnocancel(
+            "Resume Batch",
+            f"'{pending['description']}' (started {pending['created_at']}) stopped with {pending['remaining']} of "
+            f"{pending['total']} URLs left ({pending['done']} done, {pending['failed']} failed).\n\n"
+            "Yes: resume it now\nNo: discard it\nCancel: ask again next time",
+            parent=self.root
+        )
+        if answer is None:
+            return
+        if not answer:
+            set_batch_job_status(pending["job_id"], "cancelled")
+            self.set_status(f"Discarded unfinished batch job {pending['job_id']}.")
+            return
+        job = self._begin_batch(pending["description"] or "Resumed batch", pending["total"])
         thread = threading.Thread(
-            target=self._run_batch_scrape_in_thread, args=(None, links_to_update)
+            target=self._run_batch_scrape_in_thread, args=(job,), kwargs={"resume_job_id": pending["job_id"]}
         )
         thread.daemon = True
         thread.start()
 
+    def _begin_batch(self, description, total=0):
+        """Main thread: marks a batch as running and shows its progress bar with pause/cancel controls."""
+        self.batch_job = BatchJob(total, description)
+        self.is_batch_scraping = True
+        self._set_buttons_state(tk.DISABLED)
+        self.batch_pause_button.configure(text="Pause", state=tk.NORMAL)
+        self.batch_cancel_button.configure(state=tk.NORMAL)
+        self._update_batch_progress(self.batch_job)
+        self.batch_bar.pack(fill=tk.X, pady=(5, 0))
+        return self.batch_job
+
+    def _update_batch_progress(self, job):
+        if not self.root.winfo_exists() or job is not self.batch_job: return # Safety check
+        text = f"{job.description}: {job.done}/{job.total or '?'}"
+        if job.failed:
+            text += f" ({job.failed} failed)"
+        if job.cancelled:
+            text += " - cancelling..."
+        elif job.paused:
+            text += " - paused"
+        self.batch_progress_label.configure(text=text)
+
+    def toggle_batch_pause(self):
+        job = self.batch_job
+        if not job or job.cancelled:
+            return
+        if job.paused:
+            job.resume()
+            self.batch_pause_button.configure(text="Pause")
+            self.set_status("Batch resumed.")
+        else:
+            job.pause()
+            self.batch_pause_button.configure(text="Resume")
+            self.set_status("Batch will pause after the current post.")
+        self._update_batch_progress(job)
+
+    def cancel_batch(self):
+        job = self.batch_job
+        if not job or job.cancelled:
+            return
+        job.cancel()
+        self.batch_pause_button.configure(state=tk.DISABLED)
+        self.batch_cancel_button.configure(state=tk.DISABLED)
+        self.set_status("Cancelling batch; closing the browser of the post in progress...")
+        self._update_batch_progress(job)
+
+    def _end_batch(self, job):
+        """Main thread counterpart of _finish_batch."""
+        if not self.root.winfo_exists(): return # Safety check
+        if job is not self.batch_job:
+            return
+        self.batch_job = None
+        self.is_batch_scraping = False
+        self.batch_bar.pack_forget()
+        self._set_buttons_state(tk.NORMAL)
+
+    def toggle_auto_refresh(self):
+        if self.auto_refresh_var.get():
+            self.refresh_scheduler.start()
+            self.set_status(f"Auto-refresh on (budget {self.refresh_scheduler.budget_per_hour} scrapes/hour).")
+        else:
+            self.refresh_scheduler.stop()
+            self.set_status("Auto-refresh off.")
+
+    def _start_scheduled_refresh(self, links):
+        """Runs posts handed over by the refresh scheduler through the normal batch path (main thread)."""
+        if not self.root.winfo_exists(): return # Safety check
+        if self.is_batch_scraping or not self.auto_refresh_var.get():
+            return # Their claims expire and the scheduler offers them again later
+        job = self._begin_batch("Auto-refresh", len(links))
+        self.set_status(f"Auto-refresh: updating {len(links)} posts...")
+        logging.info(f"Auto-refresh batch initiated for {len(links)} posts.")
+        thread = threading.Thread(target=self._run_batch_scrape_in_thread, args=(job, None, links))
+        thread.daemon = True
+        thread.start()
+
     def on_delete_selected(self):
         """Deletes selected items from the Treeview and the database."""
         selections = list(self.tree.selection())
@@ -638,18 +869,16 @@ class TikTokScraperApp: # Renamed class
             if not self.root.winfo_exists(): return # Safety check
             try:
                 for link in links_to_delete:
-                    # Remove from in-memory list first
-                    self.scraped_data_for_table = [item for item in self.scraped_data_for_table if item.get("link") != link]
                     delete_data_from_db(link) # Call the database function to delete
-                self.root.after(0, self._refresh_table_display) # Refresh UI from updated in-memory list
-                self.root.after(0, lambda: self.set_status(f"Deleted {len(links_to_delete)} items. Table refreshed."))
+                self.ui_pump.post(self._remove_links_from_table, links_to_delete) # In-memory list is main-thread only
+                self.ui_pump.post(lambda: self.set_status(f"Deleted {len(links_to_delete)} items. Table refreshed."))
                 logging.info(f"Successfully deleted {len(links_to_delete)} items.")
             except Exception as e:
-                self.root.after(0, lambda: self.set_status(f"Error during deletion: {e}"))
+                self.ui_pump.post(lambda e=e: self.set_status(f"Error during deletion: {e}"))
                 logging.error(f"Error during deletion: {e}", exc_info=True)
             finally:
                 if self.root.winfo_exists(): # Safety check
-                    self.root.after(0, self._set_buttons_state, tk.NORMAL)
+                    self.ui_pump.post(self._set_buttons_state, tk.NORMAL)
         
         self._set_buttons_state(tk.DISABLED)
         threading.Thread(target=delete_task, daemon=True).start()
@@ -668,9 +897,10 @@ class TikTokScraperApp: # Renamed class
         # Now, find the full data entry in self.scraped_data_for_table using the link
         link_from_tree = item_dict_from_display.get("link")
         if link_from_tree:
+            # Parse the selected link once; per-entry IDs come from the memoized canonicalizer
+            target_id = get_tiktok_video_id_from_url(link_from_tree)
             for data_entry in self.scraped_data_for_table:
-                # Use get_tiktok_video_id_from_url for robust comparison
-                if get_tiktok_video_id_from_url(data_entry.get("link", "")) == get_tiktok_video_id_from_url(link_from_tree):
+                if get_tiktok_video_id_from_url(data_entry.get("link", "")) == target_id:
                     return data_entry
         return None
 
@@ -698,7 +928,8 @@ class TikTokScraperApp: # Renamed class
                 logging.error(f"Error clearing TikTok browser data: {e}", exc_info=True)
 
 
-    def _run_batch_scrape_in_thread(self, filepath=None, urls_to_scrape_list=None):
+    def _collect_batch_urls(self, filepath=None, urls_to_scrape_list=None, skip_blocked=True):
+        """Reads, resolves, dedupes and filters a new batch's URLs. Returns (urls, source_desc), or None on error."""
         urls_to_scrape = []
         if urls_to_scrape_list:
             urls_to_scrape = urls_to_scrape_list
@@ -718,95 +949,195 @@ class TikTokScraperApp: # Renamed class
             except FileNotFoundError:
                 self.set_status_from_thread(f"Error: CSV file not found at {filepath}")
                 logging.error(f"CSV file not found: {filepath}", exc_info=True)
-                self.is_batch_scraping = False
-                if self.root.winfo_exists():
-                    self._set_buttons_state(tk.NORMAL)
-                    self._hide_blocking_overlay()
-                return
+                return None
             except Exception as e:
                 self.set_status_from_thread(f"Error reading CSV file: {e}")
                 logging.error(f"Error reading CSV from {filepath}: {e}", exc_info=True)
-                self.is_batch_scraping = False
-                if self.root.winfo_exists():
-                    self._set_buttons_state(tk.NORMAL)
-                    self._hide_blocking_overlay()
-                return
+                return None
         else:
             self.set_status_from_thread("Error: No URLs provided for batch scrape.")
-            self.is_batch_scraping = False
-            if self.root.winfo_exists():
-                self._set_buttons_state(tk.NORMAL)
-                self._hide_blocking_overlay()
-            return
+            return None
 
+        if any(is_short_link(url) for url in urls_to_scrape):
+            # Resolve short links up front (cached, concurrent HTTP) so they dedupe against full URLs
+            self.set_status_from_thread("Resolving short links...")
+            resolved = resolve_short_links(urls_to_scrape)
+            unresolved = [url for url in urls_to_scrape if resolved[url] is None]
+            if unresolved:
+                logging.warning(f"Batch: {len(unresolved)} short links could not be resolved and will be skipped.")
+            seen = set()
+            deduped = []
+            for url in urls_to_scrape:
+                canonical = resolved[url]
+                key = get_tiktok_video_id_from_url(canonical) if canonical else None
+                if canonical and (key or canonical) not in seen:
+                    seen.add(key or canonical)
+                    deduped.append(canonical)
+            urls_to_scrape = deduped
+
+        if skip_blocked and urls_to_scrape:
+            # Tombstoned posts and posts still in retry backoff would only burn browser time
+            blocked = load_blocked_video_ids()
+            kept = [url for url in urls_to_scrape if get_tiktok_video_id_from_url(url) not in blocked]
+            if len(kept) < len(urls_to_scrape):
+                logging.info(f"Batch: skipping {len(urls_to_scrape) - len(kept)} tombstoned or backing-off URLs.")
+                self.set_status_from_thread(f"Skipping {len(urls_to_scrape) - len(kept)} dead or backing-off posts.")
+            urls_to_scrape = kept
+
+        # Same-owner posts back to back, so their grid fallbacks share one profile load (grid_cache)
+        return group_by_owner(urls_to_scrape), source_desc
+
+    def _run_batch_scrape_in_thread(self, job, filepath=None, urls_to_scrape_list=None, skip_blocked=True, resume_job_id=None):
+        """
+        Batch worker. A new batch is checkpointed in SQLite (batch_jobs / batch_job_items) before the first
+        scrape and each URL is leased while it runs, so after a crash resume_job_id picks up where it stopped.
+        """
+        if resume_job_id is None:
+            collected = self._collect_batch_urls(filepath, urls_to_scrape_list, skip_blocked)
+            if collected is None:
+                self._finish_batch(job)
+                return
+            urls_to_scrape, source_desc = collected
+            if not urls_to_scrape:
+                self.set_status_from_thread(f"No URLs found to scrape from {source_desc}.")
+                self._finish_batch(job)
+                return
+            job.job_id = create_batch_job(job.description, urls_to_scrape)
+            if job.job_id is None:
+                self.set_status_from_thread("Error: could not checkpoint the batch; see logs.")
+                self._finish_batch(job)
+                return
+            self.set_status_from_thread(f"Starting batch scrape from {source_desc}. Found {len(urls_to_scrape)} URLs...")
+            logging.info(f"Batch scrape initiated from {source_desc}. Found {len(urls_to_scrape)} URLs.")
+        else:
+            job.job_id = resume_job_id
+            self.set_status_from_thread(f"Resuming batch job {resume_job_id}...")
+            logging.info(f"Resuming checkpointed batch job {resume_job_id}.")
+            requeue_batch_job_leases(resume_job_id) # The crashed run's leases would otherwise block for up to 15 min
+            set_batch_job_status(resume_job_id, "running")
+
+        progress = batch_job_progress(job.job_id) or {}
+        job.done = progress.get("done", 0) + progress.get("failed", 0)
+        job.failed = progress.get("failed", 0)
+        job.total = job.done + progress.get("pending", 0) + progress.get("in_flight", 0)
+        self.ui_pump.post_latest("batch_progress", self._update_batch_progress, job)
+
+        position = None
+        try:
+            while True:
+                job.checkpoint() # Waits here while paused
+                claimed = claim_batch_item(job.job_id)
+                if claimed is None:
+                    progress = batch_job_progress(job.job_id)
+                    if not progress or not progress["in_flight"] or not progress["next_lease_expiry"]:
+                        break
+                    # Another worker still holds a lease; wait for it to finish or expire
+                    expires = datetime.fromisoformat(progress["next_lease_expiry"])
+                    job.sleep(min(max((expires - datetime.now(timezone.utc)).total_seconds(), 1), 60))
+                    continue
+                position, url = claimed
+                registry.set_gauge("batch_queue_depth", job.total - job.done)
+                self.set_status_from_thread(f"Batch: Scraping {job.done + 1}/{job.total}: {url}...")
+                logging.info(f"Batch: Processing URL {job.done + 1}/{job.total} (job {job.job_id}, item {position}): {url}")
+                try:
+                    scraped_data_dict = job.run(self.async_runtime, scrape_post_data(url, self))
+                except BatchCancelled:
+                    raise
+                except Exception as e:
+                    logging.error(f"Error in batch scrape for {url}: {e}", exc_info=True)
+                    scraped_data_dict = {"error": str(e), "url": url}
+                # Each result is persisted, together with its checkpoint, as soon as it arrives
+                gui_data, message = self._record_scrape_result(scraped_data_dict, url, batch_item=(job.job_id, position))
+                position = None
+                self.ui_pump.post(self._apply_scrape_result, gui_data, message)
+                job.done += 1
+                if gui_data["error"]:
+                    job.failed += 1
+                self.ui_pump.post_latest("batch_progress", self._update_batch_progress, job)
+                if job.done < job.total:
+                    # Introduce a random delay between scrapes to reduce bot detection
+                    job.sleep(random.uniform(3, 8)) # Sleep between 3 and 8 seconds
+        except BatchCancelled:
+            if position is not None:
+                release_batch_item(job.job_id, position)
+            set_batch_job_status(job.job_id, "cancelled")
+            self.set_status_from_thread(f"Batch cancelled. {job.done} of {job.total} URLs were scraped and saved.")
+            logging.info(f"Batch scrape cancelled after {job.done}/{job.total} URLs.")
+        except Exception as e:
+            # e.g. a database error: keep the checkpoint resumable and give the UI back
+            logging.error(f"Batch job {job.job_id} stopped by an error after {job.done}/{job.total} URLs: {e}", exc_info=True)
+            if position is not None:
+                release_batch_item(job.job_id, position)
+            set_batch_job_status(job.job_id, "paused")
+            self.set_status_from_thread(f"Batch stopped by an error after {job.done} of {job.total} URLs; it can be resumed on restart. See logs.")
+        else:
+            set_batch_job_status(job.job_id, "finished")
+            self.set_status_from_thread(f"Batch scrape complete. Processed {job.total} URLs.")
+            logging.info("Batch scrape successfully completed.")
+        finally:
+            registry.set_gauge("batch_queue_depth", 0)
+            self._finish_batch(job)
 
-        if not urls_to_scrape:
-            self.set_status_from_thread(f"No URLs found to scrape from {source_desc}.")
-            self.is_batch_scraping = False
-            if self.root.winfo_exists():
-                self._set_buttons_state(tk.NORMAL)
-                self._hide_blocking_overlay()
-            return
 
-        self.set_status_from_thread(f"Starting batch scrape from {source_desc}. Found {len(urls_to_scrape)} URLs...")
-        logging.info(f"Batch scrape initiated from {source_desc}. Found {len(urls_to_scrape)} URLs.")
-
-        for i, url in enumerate(urls_to_scrape):
-            self.set_status_from_thread(f"Batch: Scraping {i+1}/{len(urls_to_scrape)}: {url}...")
-            logging.info(f"Batch: Processing URL {i+1}/{len(urls_to_scrape)}: {url}")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            scraped_data_dict = loop.run_until_complete(scrape_post_data(url, self)) 
-            loop.close()
-            self._handle_scrape_result(scraped_data_dict, url) 
-            # Introduce a random delay between scrapes to reduce bot detection
-            time.sleep(random.uniform(3, 8)) # Sleep between 3 and 8 seconds
-
-        self.set_status_from_thread(f"Batch scrape complete. Processed {len(urls_to_scrape)} URLs.")
-        logging.info("Batch scrape successfully completed.")
-        self.is_batch_scraping = False
-        if self.root.winfo_exists():
-            self._set_buttons_state(tk.NORMAL)
-            self._hide_blocking_overlay()
+    def _finish_batch(self, job):
+        """Called from the batch worker thread when it ends; UI state is restored on the Tk thread."""
+        job.finish()
+        self.ui_pump.post(self._end_batch, job)
 
+    def _start_single_scrape(self, post_url):
+        """Submits one scrape to the app's asyncio runtime; the result comes back on the Tk thread via the UI pump."""
+        future = self.async_runtime.submit(scrape_post_data(post_url, self))
+        self.ui_pump.post_future_result(
+            future, lambda data, error: self._on_single_scrape_done(post_url, data, error)
+        )
 
-    def _run_tiktok_scrape_in_thread(self, post_url, is_batch=True): # Renamed function
-        scraped_data_dict = {"error": "Scraping failed unexpectedly.", "url": post_url}
-        loop = None 
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            scraped_data_dict = loop.run_until_complete(scrape_post_data(post_url, self)) 
-        except Exception as e:
-            logging.error(f"Error in single scrape thread execution for {post_url}: {e}", exc_info=True)
-            scraped_data_dict = {"error": str(e), "url": post_url}
-        finally:
-            if not is_batch: 
-                if self.root.winfo_exists(): # Safety check
-                    self.root.after(
-                        0, lambda data=scraped_data_dict: self._handle_scrape_result(data, post_url) # Renamed handler
-                    )
-                    self.root.after(0, self._set_buttons_state, tk.NORMAL)
-                    self.root.after(0, self._hide_blocking_overlay)
-            if loop and not loop.is_closed():
-                loop.close()
+    def _on_single_scrape_done(self, post_url, scraped_data_dict, error):
+        if error is not None:
+            logging.error(f"Error in single scrape for {post_url}: {error}", exc_info=error)
+            scraped_data_dict = {"error": str(error), "url": post_url}
+        self._handle_scrape_result(scraped_data_dict, post_url)
+        self._set_buttons_state(tk.NORMAL)
+        self._hide_blocking_overlay()
 
     def _handle_scrape_result(self, scraped_data_dict, post_url): # Renamed handler
+        """Main-thread handling of a single scrape: persist it, update its row and clear the URL entry on success."""
         if not self.root.winfo_exists(): return # Safety check
+        gui_data, message = self._record_scrape_result(scraped_data_dict, post_url)
+        self._apply_scrape_result(gui_data, message)
+        if not gui_data["error"]:
+            self.url_entry.delete(0, tk.END) # Clear input on successful scrape
 
+    def _record_scrape_result(self, scraped_data_dict, post_url, batch_item=None):
+        """
+        Persists one scrape result (post row, snapshot, retry state) without touching Tk, so batch workers can
+        call it directly. Returns (gui_data, status_message) for _apply_scrape_result on the main thread.
+        """
+
+        if is_short_link(post_url) and scraped_data_dict.get("video_id"):
+            post_url = scraped_data_dict.get("url") or post_url # Store the resolved URL, not the short link
         video_id = get_tiktok_video_id_from_url(post_url) or "unknown_post" # Changed to video_id
         current_timestamp_str = datetime.now().strftime("%Y-%m-%d") 
 
         has_error = scraped_data_dict.get("error") is not None and scraped_data_dict.get("error") != ""
+        partial = scraped_data_dict.get("error_code") in scrape_errors.NON_FAILURE_CODES
+
+        failure = record_scrape_outcome(
+            video_id, scraped_data_dict.get("link", post_url),
+            scraped_data_dict.get("error_code"), scraped_data_dict.get("error") if has_error else None
+        )
 
-        if has_error:
+        if has_error and partial:
+            status_message = f"Scrape: Data for {video_id} recorded with gaps -{scraped_data_dict['error']}"
+            logging.warning(f"Scrape of {video_id} recorded with missing fields:{scraped_data_dict['error']}")
+        elif has_error:
             error_message = scraped_data_dict.get("error", "Unknown error")
-            self.set_status(f"Scrape: Failed for {video_id} - {error_message}")
+            if failure and failure["tombstoned"]:
+                error_message += f" [{failure['error_code']}: will not be retried automatically]"
+            status_message = f"Scrape: Failed for {video_id} - {error_message}"
             logging.error(f"Handling scrape failure for {video_id}: {error_message}")
         else:
-            self.set_status(f"Scrape: Data for {video_id} recorded successfully.")
+            status_message = f"Scrape: Data for {video_id} recorded successfully."
             logging.info(f"Scrape: Data for {video_id} successfully handled and recorded.")
-            self.url_entry.delete(0, tk.END) # Clear input on successful scrape
 
 
         formatted_post_date = "N/A"
@@ -839,34 +1170,66 @@ class TikTokScraperApp: # Renamed class
             "error": scraped_data_dict.get("error", None),
         }
 
-        existing_index = -1
-        for i, item in enumerate(self.scraped_data_for_table):
-            if item.get("video_id") == video_id: # Changed to video_id
-                existing_index = i
-                break
-
-        if existing_index != -1:
-            self.scraped_data_for_table[existing_index].update({
-                "link": gui_data["link"],
-                "post_date": gui_data["post_date"],
-                "last_record": gui_data["last_record"],
-                "owner": gui_data["owner"],
-                "likes": gui_data["likes"],
-                "comments": gui_data["comments"],
-                "shares": gui_data["shares"],
-                "saves": gui_data["saves"], # Updated 'saves' here
-                "views": gui_data["views"],
-                "engagement_rate": gui_data["engagement_rate"],
-                "error": gui_data["error"]
-            })
+        save_to_database(gui_data, video_id, batch_item) # Changed to video_id
+        return gui_data, status_message
+
+    def _apply_scrape_result(self, gui_data, status_message):
+        """Main thread: merges a recorded result into the in-memory table and queues its row for the next flush."""
+        if not self.root.winfo_exists(): return # Safety check
+        video_id = gui_data["video_id"]
+        existing = self._data_by_video_id.get(video_id)
+        if existing is not None:
+            existing.update({key: value for key, value in gui_data.items() if key != "video_id"})
             logging.info(f"Updated existing record for {video_id} in in-memory table.")
         else:
             self.scraped_data_for_table.append(gui_data)
+            self._data_by_video_id[video_id] = gui_data
             logging.info(f"Added new record for {video_id} to in-memory table.")
+        self._dirty_video_ids.add(video_id)
+        # However many results land in one pump tick, the table is touched once, for the changed rows only
+        self.ui_pump.post_latest("table_rows", self._flush_table_updates)
+        self.set_status(status_message)
+
+    def _reindex_table_data(self):
+        self._data_by_video_id = {item.get("video_id"): item for item in self.scraped_data_for_table}
+
+    def _remove_links_from_table(self, links):
+        removed = set(links)
+        self.scraped_data_for_table = [item for item in self.scraped_data_for_table if item.get("link") not in removed]
+        self._reindex_table_data()
+        self._refresh_table_display()
 
-        save_to_database(gui_data, video_id) # Changed to video_id
-        
-        self.root.after(0, self._refresh_table_display)
+    def _row_values(self, post_data):
+        """Treeview values and tags for one in-memory record."""
+        values = []
+        for col in self.columns: # self.columns now includes "saves"
+            value = post_data.get(col, "N/A")
+            if col == "engagement_rate":
+                if isinstance(value, (int, float)) and value != "N/A":
+                    values.append(f"{value:.2f}%")
+                elif isinstance(value, str) and value.endswith('%'):
+                    values.append(value)
+                else:
+                    values.append("N/A")
+            else:
+                values.append(value)
+        tag = "failed" if (post_data.get("error") is not None and post_data.get("error") != "") else ""
+        return values, ((tag,) if tag else ())
+
+    def _flush_table_updates(self):
+        """Applies queued row changes in place (update or append) instead of rebuilding the whole table."""
+        if not self.root.winfo_exists(): return # Safety check
+        dirty, self._dirty_video_ids = self._dirty_video_ids, set()
+        for video_id in dirty:
+            post_data = self._data_by_video_id.get(video_id)
+            if post_data is None:
+                continue
+            values, tags = self._row_values(post_data)
+            item_id = self._row_items.get(video_id)
+            if item_id is not None and self.tree.exists(item_id):
+                self.tree.item(item_id, values=values, tags=tags)
+            else:
+                self._row_items[video_id] = self.tree.insert("", tk.END, values=values, tags=tags)
 
     def _set_buttons_state(self, state):
         if not self.root.winfo_exists(): return # Safety check
@@ -879,77 +1242,420 @@ class TikTokScraperApp: # Renamed class
 
     def _refresh_table_display(self):
         if not self.root.winfo_exists(): return # Safety check
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
+        self._row_items = {}
+        self._dirty_video_ids.clear()
         
         for post_data in self.scraped_data_for_table:
-            values = []
-            for col in self.columns: # self.columns now includes "saves"
-                value = post_data.get(col, "N/A")
-                if col == "engagement_rate":
-                    if isinstance(value, (int, float)) and value != "N/A":
-                        values.append(f"{value:.2f}%")
-                    elif isinstance(value, str) and value.endswith('%'):
-                        values.append(value)
-                    else:
-                        values.append("N/A")
-                else:
-                    values.append(value)
-
-            tag = "failed" if (post_data.get("error") is not None and post_data.get("error") != "") else ""
-            self.tree.insert("", tk.END, values=values, tags=(tag,) if tag else ())
+            values, tags = self._row_values(post_data)
+            self._row_items[post_data.get("video_id")] = self.tree.insert("", tk.END, values=values, tags=tags)
         
         self.set_status("Table display refreshed.")
 
 
     def export_to_csv(self):
+        """Opens the export options dialog; the export itself streams from SQLite on a worker thread."""
         if not self.root.winfo_exists(): return # Safety check
         if not self.scraped_data_for_table:
             messagebox.showinfo("No Data", "There is no data to export.", parent=self.root)
             return
-        filepath = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            title="Save Scraped Data As"
-        )
-        if not filepath:
+
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title("Export Data")
+        dialog.geometry("420x600")
+        dialog.transient(self.root)
+
+        dataset_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        dataset_frame.pack(fill=tk.X, padx=15, pady=(10, 0))
+        ctk.CTkLabel(dataset_frame, text="Data:").pack(side=tk.LEFT)
+        dataset_var = tk.StringVar(value="Posts")
+        # Snapshot history has a fixed column set and filters on recorded_at; the column and date column choices apply to posts
+        ctk.CTkOptionMenu(dataset_frame, values=["Posts", "Snapshot history"], variable=dataset_var).pack(side=tk.LEFT, padx=5)
+
+        ctk.CTkLabel(dialog, text="Columns", font=ctk.CTkFont(weight="bold")).pack(anchor="w", padx=15, pady=(10, 0))
+        columns_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        columns_frame.pack(fill=tk.X, padx=15)
+        column_vars = {}
+        for i, col in enumerate(DEFAULT_EXPORT_COLUMNS):
+            var = tk.BooleanVar(value=True)
+            column_vars[col] = var
+            ctk.CTkCheckBox(columns_frame, text=col.replace("_", " ").title(), variable=var).grid(
+                row=i // 2, column=i % 2, sticky="w", padx=5, pady=2
+            )
+
+        filters_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        filters_frame.pack(fill=tk.X, padx=15, pady=(10, 0))
+        ctk.CTkLabel(filters_frame, text="Owners (comma-separated, blank = all):").grid(row=0, column=0, columnspan=2, sticky="w")
+        owners_entry = ctk.CTkEntry(filters_frame)
+        owners_entry.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        ctk.CTkLabel(filters_frame, text="Date column:").grid(row=2, column=0, sticky="w")
+        date_column_var = tk.StringVar(value="post_date")
+        ctk.CTkOptionMenu(filters_frame, values=["post_date", "last_record"], variable=date_column_var).grid(row=2, column=1, sticky="ew")
+        ctk.CTkLabel(filters_frame, text="From (YYYY-MM-DD):").grid(row=3, column=0, sticky="w", pady=(5, 0))
+        date_from_entry = ctk.CTkEntry(filters_frame)
+        date_from_entry.grid(row=3, column=1, sticky="ew", pady=(5, 0))
+        ctk.CTkLabel(filters_frame, text="To (YYYY-MM-DD):").grid(row=4, column=0, sticky="w", pady=(5, 0))
+        date_to_entry = ctk.CTkEntry(filters_frame)
+        date_to_entry.grid(row=4, column=1, sticky="ew", pady=(5, 0))
+        filters_frame.grid_columnconfigure(1, weight=1)
+
+        format_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        format_frame.pack(fill=tk.X, padx=15, pady=(10, 0))
+        ctk.CTkLabel(format_frame, text="Format:").pack(side=tk.LEFT)
+        format_var = tk.StringVar(value="CSV")
+        # Parquet stays selectable without pyarrow; export_posts_columnar then falls back to gzipped CSV
+        ctk.CTkOptionMenu(
+            format_frame, values=["CSV", "Parquet" if PYARROW_AVAILABLE else "Parquet (needs pyarrow)"], variable=format_var
+        ).pack(side=tk.LEFT, padx=5)
+
+        gzip_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(dialog, text="Compress CSV (gzip)", variable=gzip_var).pack(anchor="w", padx=15, pady=10)
+
+        def on_export():
+            snapshots = dataset_var.get() == "Snapshot history"
+            columns = [c for c, var in column_vars.items() if var.get()]
+            if not columns and not snapshots:
+                messagebox.showerror("Export Error", "Select at least one column.", parent=dialog)
+                return
+            date_from = date_from_entry.get().strip() or None
+            date_to = date_to_entry.get().strip() or None
+            for label, value in (("From", date_from), ("To", date_to)):
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showerror("Export Error", f"{label} date must be YYYY-MM-DD.", parent=dialog)
+                        return
+            owners = [o.strip().lstrip("@") for o in owners_entry.get().split(",") if o.strip()] or None
+            compress = gzip_var.get()
+            columnar = format_var.get().startswith("Parquet")
+
+            if columnar:
+                defaultextension = ".parquet"
+                filetypes = [("Parquet files", "*.parquet"), ("Arrow IPC files", "*.arrow"), ("All files", "*.*")]
+            elif compress:
+                defaultextension = ".csv.gz"
+                filetypes = [("Gzipped CSV", "*.csv.gz")]
+            else:
+                defaultextension = ".csv"
+                filetypes = [("CSV files", "*.csv"), ("All files", "*.*")]
+            filepath = filedialog.asksaveasfilename(
+                parent=dialog, defaultextension=defaultextension, filetypes=filetypes, title="Save Scraped Data As"
+            )
+            if not filepath:
+                return
+            if compress and not columnar and not filepath.lower().endswith(".gz"):
+                filepath += ".gz" # Never write gzip bytes under a plain .csv name
+            dialog.destroy()
+            options = dict(owners=owners, date_from=date_from, date_to=date_to)
+            if not snapshots:
+                options.update(columns=columns, date_column=date_column_var.get())
+            self._start_export(filepath, columnar, compress, options, snapshots=snapshots)
+
+        ctk.CTkButton(dialog, text="Export", command=on_export).pack(pady=(0, 15))
+
+    def _start_export(self, filepath, columnar, compress, options, snapshots=False):
+        """
+        Runs the posts (or, with `snapshots`, the snapshot history) CSV / columnar export on a worker thread
+        with throttled progress notifications. Until it finishes, the Export button cancels it instead.
+        """
+        export_csv = export_snapshots_csv if snapshots else export_posts_csv
+        export_columnar = export_snapshots_columnar if snapshots else export_posts_columnar
+        cancel_event = threading.Event()
+        self.export_button.configure(text="Cancel Export", command=cancel_event.set)
+        self.set_status(f"Exporting to {os.path.basename(filepath)}...")
+        last_report = [0.0]
+
+        def on_progress(written, total):
+            now = time.monotonic()
+            if now - last_report[0] >= 0.5: # Throttle: at most two status updates per second
+                last_report[0] = now
+                self.set_status_from_thread(f"Exporting... {written:,}/{total:,} rows")
+
+        def export_task():
+            # Runs off the Tk thread: the outcome is handed to the main thread through the UI pump, never Tk calls here
+            try:
+                if columnar:
+                    path_written, fmt, written = export_columnar(filepath, progress_callback=on_progress,
+                                                                 cancel_event=cancel_event, **options)
+                else:
+                    written = export_csv(filepath, compress=compress, progress_callback=on_progress,
+                                         cancel_event=cancel_event, **options)
+                    path_written, fmt = filepath, "csv.gz" if compress else "csv"
+                logging.info(f"Data exported ({fmt}): {path_written}")
+                self.ui_pump.post(self._finish_export, (path_written, fmt, written, columnar), None)
+            except ExportCancelled as e:
+                logging.info(f"{e} Partial file removed.")
+                self.ui_pump.post(self._finish_export, None, e)
+            except Exception as e:
+                logging.error(f"Error exporting data: {e}", exc_info=True)
+                self.ui_pump.post(self._finish_export, None, e)
+
+        threading.Thread(target=export_task, daemon=True).start()
+
+    def _finish_export(self, result, error):
+        """Main-thread end of _start_export: reports the outcome and turns Cancel Export back into Export CSV."""
+        if not self.root.winfo_exists():
             return
-        try:
-            with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
-                # Use the full internal columns for CSV export, including video_id and saves
-                full_export_columns = [
-                    "link", "video_id", "post_date", "last_record", # Include video_id for CSV export
-                    "owner", "likes", "comments", "shares", "saves", "views", "engagement_rate", "error" # Added 'saves'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=full_export_columns)
-                writer.writeheader()
-                for row_data_dict in self.scraped_data_for_table:
-                    export_data = {}
-                    for k in full_export_columns: # Iterate through all columns for export
-                        v = row_data_dict.get(k, "N/A") # Get value, default to "N/A"
-                        if k == "engagement_rate" and isinstance(v, (int, float)) and v != "N/A":
-                            export_data[k] = f"{v:.2f}%"
-                        else:
-                            export_data[k] = v
-                    writer.writerow(export_data)
-            self.set_status(f"Data exported to CSV: {filepath}")
-            messagebox.showinfo("Export Successful", f"Data successfully exported to\n{filepath}", parent=self.root)
-            logging.info(f"Data exported to CSV: {filepath}")
-        except Exception as e:
-            self.set_status(f"Error exporting data: {e}")
-            messagebox.showerror("Export Error", f"Could not export data: {e}", parent=self.root)
-            logging.error(f"Error exporting data to CSV: {e}", exc_info=True)
+        self.export_button.configure(state=tk.NORMAL, text="Export CSV", command=self.export_to_csv)
+        if isinstance(error, ExportCancelled):
+            self.set_status(f"{error} The partial file was removed.")
+            return
+        if error is not None:
+            self.set_status(f"Error exporting data: {error}")
+            messagebox.showerror("Export Error", f"Could not export data: {error}", parent=self.root)
+            return
+        path_written, fmt, written, columnar = result
+        note = "\n\npyarrow is not installed, so a gzipped CSV was written instead." if columnar and fmt == "csv.gz" else ""
+        self.set_status(f"Data exported ({fmt}): {path_written}")
+        messagebox.showinfo("Export Successful", f"{written:,} rows successfully exported to\n{path_written}{note}", parent=self.root)
+
+    def open_analytics_window(self):
+        """
+        Shows per-owner aggregates straight from the materialized owner_aggregates table (O(owners)),
+        then fills in dataset-wide percentiles and outliers once analytics finish on a worker thread
+        (cached until post_snapshots changes; Refresh recomputes).
+        """
+        if not self.root.winfo_exists(): return # Safety check
+        window = ctk.CTkToplevel(self.root)
+        window.title("Analytics")
+        window.geometry("900x520")
+
+        def fmt(value, pattern="{:,.0f}"):
+            if value is None or (isinstance(value, float) and value != value): # None or NaN
+                return "N/A"
+            return pattern.format(value)
+
+        summary_label = ctk.CTkLabel(window, text="Computing dataset analytics...", justify=tk.LEFT, anchor="w")
+        summary_label.pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        columns = ("owner", "post_count", "sum_views", "avg_views", "sum_likes", "avg_likes", "avg_engagement_rate", "last_scraped")
+        table_frame = ctk.CTkFrame(window, fg_color="transparent")
+        table_frame.pack(expand=True, fill=tk.BOTH, padx=10)
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="extended")
+        sort_state = {"column": "sum_views", "descending": True}
+
+        def fill_table(max_rows=1000):
+            rows = load_owner_aggregates(sort_state["column"], sort_state["descending"], limit=max_rows)
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert("", tk.END, values=(
+                    row["owner"], row["post_count"], fmt(row["sum_views"]), fmt(row["avg_views"]), fmt(row["sum_likes"]),
+                    fmt(row["avg_likes"]), fmt(row["avg_engagement_rate"], "{:.2f}%"), (row["last_scraped"] or "N/A")[:10]
+                ))
+
+        def sort_by(column):
+            # First click sorts descending (owner ascending); clicking the same header again flips it
+            if sort_state["column"] == column:
+                sort_state["descending"] = not sort_state["descending"]
+            else:
+                sort_state.update(column=column, descending=column != "owner")
+            fill_table()
+
+        for col in columns:
+            tree.heading(col, text=col.replace("_", " ").title(), command=lambda c=col: sort_by(c))
+            tree.column(col, width=140 if col == "owner" else 95, anchor=tk.W if col == "owner" else tk.CENTER)
+        fill_table()
+        tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        vsb = ctk.CTkScrollbar(table_frame, command=tree.yview, orientation="vertical", width=8)
+        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.configure(yscrollcommand=vsb.set)
+
+        analytics_state = {"result": None}
+
+        def on_export_summary():
+            filepath = filedialog.asksaveasfilename(
+                parent=window, defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")], title="Save Owner Summary As"
+            )
+            if not filepath:
+                return
+            try:
+                count = export_owner_summary_csv(filepath, analytics_state["result"])
+                self.set_status(f"Owner summary exported ({count} owners): {filepath}")
+            except Exception as e:
+                logging.error(f"Error exporting owner summary: {e}", exc_info=True)
+                messagebox.showerror("Export Error", f"Could not export owner summary: {e}", parent=window)
+
+        def on_chart_owners():
+            owners = [tree.item(item_id, "values")[0] for item_id in tree.selection()]
+            if not owners:
+                messagebox.showinfo("Chart", "Select one or more owners to chart.", parent=window)
+                return
+            self.open_chart_window(owners=owners, title=owners[0] if len(owners) == 1 else f"{len(owners)} owners")
+
+        buttons_frame = ctk.CTkFrame(window, fg_color="transparent")
+        buttons_frame.pack(pady=10)
+        ctk.CTkButton(buttons_frame, text="Chart Selected Owners", command=on_chart_owners).pack(side=tk.LEFT, padx=5)
+        export_button = ctk.CTkButton(buttons_frame, text="Export Owner Summary", command=on_export_summary, state=tk.DISABLED)
+        export_button.pack(side=tk.LEFT, padx=5)
+        refresh_button = ctk.CTkButton(buttons_frame, text="Refresh", command=lambda: start_compute(refresh=True), state=tk.DISABLED)
+        refresh_button.pack(side=tk.LEFT, padx=5)
+
+        def show_summary(result):
+            if not window.winfo_exists(): return
+            analytics_state["result"] = result
+            views_p = result["percentiles"]["views"]
+            er_p = result["percentiles"]["engagement_rate"]
+            summary_label.configure(text=(
+                f"Posts: {result['posts']['video_id'].size:,}   Owners: {len(result['owners']['owner']):,}   "
+                f"Views p50/p90/p99: {fmt(views_p.get(50))} / {fmt(views_p.get(90))} / {fmt(views_p.get(99))}   "
+                f"Engagement p50/p90: {fmt(er_p.get(50), '{:.2f}%')} / {fmt(er_p.get(90), '{:.2f}%')}   "
+                f"View outliers: {int(result['outliers']['views_outlier'].sum()):,}"
+            ))
+            export_button.configure(state=tk.NORMAL)
+            refresh_button.configure(state=tk.NORMAL)
+            self.set_status("Analytics ready.")
+
+        def show_error(error):
+            if window.winfo_exists():
+                refresh_button.configure(state=tk.NORMAL)
+            self.set_status(f"Error computing analytics: {error}")
+
+        def compute_task(refresh):
+            # Worker thread: results go back through the UI pump
+            try:
+                import analytics
+                result = analytics.cached_compute_all(refresh=refresh) # Recomputes only when post_snapshots changed
+                self.ui_pump.post(show_summary, result)
+            except Exception as e:
+                logging.error(f"Error computing analytics: {e}", exc_info=True)
+                self.ui_pump.post(show_error, e)
+
+        def start_compute(refresh=False):
+            if refresh:
+                fill_table()
+            refresh_button.configure(state=tk.DISABLED)
+            self.set_status("Computing analytics...")
+            threading.Thread(target=compute_task, args=(refresh,), daemon=True).start()
+
+        start_compute()
 
     def _show_context_menu(self, event):
         """Displays the right-click context menu for the Treeview."""
         if not self.root.winfo_exists(): return # Safety check
         menu = tk.Menu(self.tree, tearoff=0)
         menu.add_command(label="Select All", command=self._select_all_items)
+        menu.add_command(label="Chart Selected Posts", command=self._chart_selected_posts)
         try:
             menu.tk_popup(event.x_root, event.y_root)
         finally:
             menu.grab_release()
 
+    def _chart_selected_posts(self):
+        if not self.root.winfo_exists(): return # Safety check
+        video_ids = []
+        for item_id in self.tree.selection():
+            item = self._get_item_data_from_tree_selection(item_id)
+            video_id = get_tiktok_video_id_from_url(item.get("link", "")) if item else None
+            if video_id:
+                video_ids.append(video_id)
+        if not video_ids:
+            messagebox.showinfo("Chart", "Select one or more posts to chart.", parent=self.root)
+            return
+        title = f"Post {video_ids[0]}" if len(video_ids) == 1 else f"{len(video_ids)} posts"
+        self.open_chart_window(video_ids=video_ids, title=title)
+
+    def open_chart_window(self, video_ids=None, owners=None, title="All posts"):
+        """
+        Plots views, likes or engagement over time from post_snapshots for the selected posts/owners.
+        Series are LTTB-downsampled to the canvas width on a worker thread (analytics.chart_series caches
+        them), and the chart re-checks for new snapshots every CHART_POLL_MS.
+        """
+        if not self.root.winfo_exists(): return # Safety check
+        import analytics # NumPy is only needed once a chart is opened
+
+        window = ctk.CTkToplevel(self.root)
+        window.title(f"Chart - {title}")
+        window.geometry("820x460")
+        metric_var = tk.StringVar(value="views")
+        ctk.CTkSegmentedButton(
+            window, values=list(analytics.SERIES_METRICS), variable=metric_var, command=lambda _: schedule_draw(0)
+        ).pack(pady=(10, 5))
+        canvas = tk.Canvas(window, background="white", highlightthickness=0)
+        canvas.pack(expand=True, fill=tk.BOTH, padx=10, pady=(0, 10))
+        state = {"after_id": None, "poll_id": None, "generation": 0, "points": None, "busy": False}
+        margin_left, margin_right, margin_top, margin_bottom = 70, 15, 15, 30
+
+        def render(points, metric):
+            canvas.delete("all")
+            width, height = canvas.winfo_width(), canvas.winfo_height()
+            x, y = points
+            if x.size == 0:
+                canvas.create_text(width // 2, height // 2, text="No snapshot history for this selection yet.")
+                return
+            x_min, x_max = float(x.min()), float(x.max())
+            y_min, y_max = float(y.min()), float(y.max())
+            x_span, y_span = (x_max - x_min) or 1.0, (y_max - y_min) or 1.0
+            plot_w = max(width - margin_left - margin_right, 1)
+            plot_h = max(height - margin_top - margin_bottom, 1)
+            px = margin_left + (x - x_min) / x_span * plot_w
+            py = margin_top + plot_h - (y - y_min) / y_span * plot_h
+            canvas.create_rectangle(margin_left, margin_top, margin_left + plot_w, margin_top + plot_h, outline="#cccccc")
+            label = "{:.2f}%" if metric == "engagement_rate" else "{:,.0f}"
+            canvas.create_text(margin_left - 5, margin_top, text=label.format(y_max), anchor="ne")
+            canvas.create_text(margin_left - 5, margin_top + plot_h, text=label.format(y_min), anchor="se")
+            for value, anchor in ((x_min, "nw"), (x_max, "ne")):
+                canvas.create_text(
+                    margin_left + (value - x_min) / x_span * plot_w, margin_top + plot_h + 5, anchor=anchor,
+                    text=datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+                )
+            if x.size == 1:
+                canvas.create_oval(px[0] - 3, py[0] - 3, px[0] + 3, py[0] + 3, fill="#1f6aa5", outline="")
+            else:
+                canvas.create_line(*[c for pair in zip(px.tolist(), py.tolist()) for c in pair], fill="#1f6aa5", width=2)
+
+        def load(generation, metric, width):
+            try:
+                points = analytics.chart_series(metric, width, video_ids, owners)
+                error = None
+            except Exception as e:
+                logging.error(f"Error loading chart series: {e}", exc_info=True)
+                points, error = None, e
+
+            def apply():
+                state["busy"] = False
+                if not window.winfo_exists() or generation != state["generation"]:
+                    return
+                if error is not None:
+                    self.set_status(f"Error loading chart: {error}")
+                elif points is not state["points"]: # Same cached object -> nothing new to draw
+                    state["points"] = points
+                    render(points, metric)
+
+            if self.root.winfo_exists():
+                self.ui_pump.post(apply)
+
+        def draw():
+            state["after_id"] = None
+            if not window.winfo_exists() or state["busy"]:
+                return
+            state["busy"] = True
+            width = max(canvas.winfo_width() - margin_left - margin_right, 10)
+            threading.Thread(target=load, args=(state["generation"], metric_var.get(), width), daemon=True).start()
+
+        def schedule_draw(delay=CHART_RESIZE_DEBOUNCE_MS):
+            state["generation"] += 1
+            state["points"] = None
+            state["busy"] = False
+            if state["after_id"]:
+                window.after_cancel(state["after_id"])
+            state["after_id"] = window.after(delay, draw)
+
+        def poll():
+            state["poll_id"] = window.after(CHART_POLL_MS, poll)
+            draw() # chart_series returns the cached points unless new snapshots arrived
+
+        def on_close():
+            for key in ("after_id", "poll_id"):
+                if state[key]:
+                    window.after_cancel(state[key])
+            window.destroy()
+
+        canvas.bind("<Configure>", lambda e: schedule_draw())
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        state["poll_id"] = window.after(CHART_POLL_MS, poll)
+
     def _select_all_items(self):
         """Selects all items currently visible in the Treeview."""
         if not self.root.winfo_exists(): return # Safety check